@@ -0,0 +1,108 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Background refreshes of stale entries, shared by every cache
+_refresher = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+
+
+class _Entry:
+    __slots__ = ("value", "error", "stored_at")
+
+    def __init__(self, value, error, stored_at):
+        self.value = value
+        self.error = error
+        self.stored_at = stored_at
+
+    def result(self):
+        if self.error is not None:
+            # Drop the traceback of the original failure so it does not grow on every hit
+            raise self.error.with_traceback(None)
+        return self.value
+
+
+class TTLCache:
+    """
+    Thread-safe, size-bounded LRU cache of loaded values.
+
+    An entry is fresh for `ttl` seconds. For `stale_ttl` seconds after that
+    it is still served while one background refresh reloads it; past that it
+    is loaded again on the spot. Concurrent misses for the same key share a
+    single load. Failures for which `is_negative(error)` holds (e.g. an
+    upstream 404) are cached for `negative_ttl` seconds and raised again on
+    every hit; other failures are not cached, and a failed refresh keeps the
+    stale value.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60.0, stale_ttl=None, negative_ttl=30.0,
+                 is_negative=lambda error: False, clock=time.monotonic, executor=_refresher):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = ttl if stale_ttl is None else stale_ttl
+        self.negative_ttl = negative_ttl
+        self.is_negative = is_negative
+        self.clock = clock
+        self.executor = executor
+
+        self.entries = OrderedDict()
+        # Loads in flight, misses and refreshes alike
+        self.loading = {}
+        self.lock = threading.Lock()
+        self.hits = self.stale_hits = self.misses = 0
+
+    def get(self, key, loader):
+        """Return the value cached for key, calling loader() to load it when needed."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                age = self.clock() - entry.stored_at
+                if age < (self.negative_ttl if entry.error is not None else self.ttl):
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry.result()
+                if entry.error is None and age < self.ttl + self.stale_ttl:
+                    self.entries.move_to_end(key)
+                    self.stale_hits += 1
+                    if key not in self.loading:
+                        future = self.loading[key] = Future()
+                        self.executor.submit(self._load, key, loader, future)
+                    return entry.value
+
+            self.misses += 1
+            future = self.loading.get(key)
+            if future is not None:
+                waiting = True
+            else:
+                waiting = False
+                future = self.loading[key] = Future()
+
+        if waiting:
+            return future.result()
+        return self._load(key, loader, future)
+
+    def _load(self, key, loader, future):
+        try:
+            value = loader()
+        except Exception as error:
+            with self.lock:
+                if self.is_negative(error):
+                    self._store(key, _Entry(None, error, self.clock()))
+                self.loading.pop(key, None)
+            future.set_exception(error)
+            raise
+        with self.lock:
+            self._store(key, _Entry(value, None, self.clock()))
+            self.loading.pop(key, None)
+        future.set_result(value)
+        return value
+
+    def _store(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
@@ -0,0 +1,71 @@
+import numpy as np
+from haversine import Unit
+from haversine.haversine import get_avg_earth_radius
+
+# Same radius as the haversine package, so vectorized and scalar distances agree
+EARTH_RADIUS_KM = get_avg_earth_radius(Unit.KILOMETERS)
+
+# The API rounds distances to 2 decimals, moving them by less than 0.01 km;
+# candidates this much farther than a cut-off may still rank inside it
+RANKING_SLACK_KM = 0.011
+
+
+class Positions:
+    """
+    Coordinates of many points as contiguous float64 arrays: degrees as given,
+    and the radians and cosine of latitude every distance pass needs.
+    """
+
+    def __init__(self, latitudes, longitudes):
+        self.latitudes = np.ascontiguousarray(latitudes, dtype=np.float64)
+        self.longitudes = np.ascontiguousarray(longitudes, dtype=np.float64)
+        self.lat_radians = np.radians(self.latitudes)
+        self.lon_radians = np.radians(self.longitudes)
+        self.cos_lat = np.cos(self.lat_radians)
+
+    def __len__(self):
+        return len(self.latitudes)
+
+    def __getitem__(self, index):
+        """Positions at a slice or index array, sharing the precomputed arrays."""
+        subset = Positions.__new__(Positions)
+        for name in ("latitudes", "longitudes", "lat_radians", "lon_radians", "cos_lat"):
+            setattr(subset, name, getattr(self, name)[index])
+        return subset
+
+
+def haversine_km(lat, lon, positions):
+    """Great-circle distances in km from (lat, lon) to every position, in one vectorized pass."""
+    lat, lon = np.radians(lat), np.radians(lon)
+    # The haversine package's formula, on arrays
+    d = (np.sin((positions.lat_radians - lat) * 0.5) ** 2
+         + np.cos(lat) * positions.cos_lat * np.sin((positions.lon_radians - lon) * 0.5) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(d))
+
+
+def nearest(lat, lon, positions, distance, k=None, radius_km=None):
+    """
+    [(index, distance_km)] of the k positions nearest to (lat, lon), or of all
+    positions at most radius_km away, or of the k nearest within radius_km.
+
+    Positions are ranked by `distance(lat1, lon1, lat2, lon2)`, the scalar
+    distance the API reports, then by index. The vectorized pass and a
+    partial selection narrow the positions down to the few that can rank
+    within the cut-off; only those go through `distance`.
+    """
+    distances = haversine_km(lat, lon, positions)
+    candidates = np.arange(len(distances))
+    if radius_km is not None:
+        candidates = np.flatnonzero(distances <= radius_km + RANKING_SLACK_KM)
+    if k is not None and k < len(candidates):
+        candidate_distances = distances[candidates]
+        kth = candidate_distances[np.argpartition(candidate_distances, k - 1)[k - 1]]
+        candidates = candidates[candidate_distances <= kth + RANKING_SLACK_KM]
+
+    latitudes, longitudes = positions.latitudes, positions.longitudes
+    ranked = sorted(
+        (distance(lat, lon, float(latitudes[i]), float(longitudes[i])), i) for i in candidates.tolist()
+    )
+    if radius_km is not None:
+        ranked = [(distance_km, i) for distance_km, i in ranked if distance_km <= radius_km]
+    return [(i, distance_km) for distance_km, i in ranked[:k]]
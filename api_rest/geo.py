@@ -0,0 +1,144 @@
+import heapq
+import math
+
+import numpy as np
+
+try:
+    from api_rest import distance as distances
+except ImportError:  # Run as a script: python api_rest/main.py
+    import distance as distances
+
+
+def unit_vectors(positions):
+    """Points on the unit sphere for Positions, as a (3, n) array of x, y and z rows."""
+    return np.stack((
+        positions.cos_lat * np.cos(positions.lon_radians),
+        positions.cos_lat * np.sin(positions.lon_radians),
+        np.sin(positions.lat_radians),
+    ))
+
+
+def chord_length(distance_km):
+    """Straight-line distance between unit vectors distance_km apart on the surface."""
+    return 2 * math.sin(min(distance_km / distances.EARTH_RADIUS_KM, math.pi) / 2)
+
+
+# Margin on chord bounds for floating point error, about 6 mm on the surface
+CHORD_EPSILON = 1e-9
+
+
+class KDTree:
+    """
+    k-d tree over a roster's positions, built with NumPy.
+
+    Positions are mapped to unit vectors, and nodes split on the axis of
+    widest spread at the median down to leaves of at most LEAF_SIZE
+    positions. Positions are reordered so that every leaf is a contiguous
+    slice, and a query computes the distances of a whole leaf in one
+    vectorized haversine pass. Since the chord between unit vectors grows
+    with the great-circle distance, a subtree beyond a splitting plane
+    farther than the chord of a cut-off holds nothing within it.
+    """
+
+    LEAF_SIZE = 256
+
+    def __init__(self, positions):
+        self.order = np.arange(len(positions))
+        self.points = unit_vectors(positions)
+        self.root = self._build(0, len(positions))
+        self.positions = positions[self.order]
+
+    def _build(self, start, end):
+        # A leaf is a slice of self.order, a node an (axis, split, left, right) tuple;
+        # order and points are permuted together so every subtree stays contiguous
+        if end - start <= self.LEAF_SIZE:
+            return slice(start, end)
+        points = self.points[:, start:end]
+        axis = int(np.argmax(points.max(axis=1) - points.min(axis=1)))
+        middle = (end - start) // 2
+        partition = np.argpartition(points[axis], middle)
+        self.points[:, start:end] = points[:, partition]
+        self.order[start:end] = self.order[start:end][partition]
+        split = float(self.points[axis, start + middle])
+        return (axis, split, self._build(start, start + middle), self._build(start + middle, end))
+
+    def candidates(self, lat, lon, k=None, radius_km=None):
+        """
+        Indices, in increasing order, of the positions that can rank within
+        the cut-off: radius_km or the k-th smallest distance, whichever is
+        smaller, plus RANKING_SLACK_KM for the API's rounding. Every position
+        at most that far from (lat, lon) is included.
+        """
+        lat_radians, lon_radians = math.radians(lat), math.radians(lon)
+        point = (
+            math.cos(lat_radians) * math.cos(lon_radians),
+            math.cos(lat_radians) * math.sin(lon_radians),
+            math.sin(lat_radians),
+        )
+        cut_off_km = radius_km if radius_km is not None else math.inf
+        best = np.empty(0)
+        found, found_distances = [], []
+        # Nodes nearest first, as (lower bound on the squared chord, tie-breaker, node)
+        pending = [(0.0, 0, self.root)]
+        pushed = 1
+        while pending:
+            bound, _, node = heapq.heappop(pending)
+            if cut_off_km < math.inf and bound > (chord_length(cut_off_km + distances.RANKING_SLACK_KM) + CHORD_EPSILON) ** 2:
+                break
+            if isinstance(node, slice):
+                leaf_distances = distances.haversine_km(lat, lon, self.positions[node])
+                keep = np.flatnonzero(leaf_distances <= cut_off_km + distances.RANKING_SLACK_KM)
+                found.append(keep + node.start)
+                found_distances.append(leaf_distances[keep])
+                if k is not None:
+                    best = np.concatenate((best, leaf_distances))
+                    if len(best) > k:
+                        best = np.partition(best, k - 1)[:k]
+                    if len(best) == k:
+                        cut_off_km = min(cut_off_km, float(best.max()))
+                continue
+            axis, split, left, right = node
+            offset = point[axis] - split
+            near, far = (left, right) if offset < 0 else (right, left)
+            heapq.heappush(pending, (bound, pushed, near))
+            heapq.heappush(pending, (max(bound, offset * offset), pushed + 1, far))
+            pushed += 2
+
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        found, found_distances = np.concatenate(found), np.concatenate(found_distances)
+        found = found[found_distances <= cut_off_km + distances.RANKING_SLACK_KM]
+        return np.sort(self.order[found])
+
+
+class TechnicianIndex:
+    """
+    Nearest-technician queries over one roster.
+
+    Results are ranked the way the API always ranked them: by the rounded
+    distance that `distance(lat1, lon1, lat2, lon2)` returns, then by roster
+    order. The tree narrows the roster down to the technicians that can rank
+    within the cut-off, then distance.nearest ranks those candidates only.
+    version identifies the roster the index was built from.
+    """
+
+    def __init__(self, technicians, distance, version=None):
+        self.technicians = list(technicians)
+        self.distance = distance
+        self.version = version
+        self.positions = distances.Positions(
+            [float(t["latitude"]) for t in self.technicians],
+            [float(t["longitude"]) for t in self.technicians],
+        )
+        self.tree = KDTree(self.positions)
+
+    def nearest(self, lat, lon, k=None, radius_km=None):
+        """
+        [(technician, distance_km)] of the k nearest technicians to (lat, lon),
+        or of all technicians at most radius_km away (rounded), or of the k
+        nearest within radius_km when both are given.
+        """
+        candidates = self.tree.candidates(lat, lon, k, radius_km)
+        # Candidates keep roster order, so ties still rank by roster position
+        found = distances.nearest(lat, lon, self.positions[candidates], self.distance, k, radius_km)
+        return [(self.technicians[candidates[i]], distance_km) for i, distance_km in found]
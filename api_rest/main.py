@@ -1,7 +1,20 @@
 from flask import Flask, jsonify, request
 import requests
+import hashlib
 from haversine import haversine as calculate_distance
 import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+try:
+    from api_rest.cache import TTLCache
+    from api_rest.geo import TechnicianIndex
+    from api_rest.upstream import UpstreamClient
+except ImportError:  # Run as a script: python api_rest/main.py
+    from cache import TTLCache
+    from geo import TechnicianIndex
+    from upstream import UpstreamClient
 
 
 # Legacy ERP API Base URL
@@ -10,23 +23,146 @@ LEGACY_ERP_BASE_URL = (
 )
 app = Flask(__name__)
 
-@app.route("/api/products", methods=["GET"])
+# Concurrent ERP lookups of batch requests. The ERP has no bulk endpoint, only
+# /parts/{id} and /stock/{type}, so a batch costs one call per distinct id. The
+# pool takes a whole batch in one round, bounded by ERP_MAX_CONCURRENCY: the most
+# calls this service has in flight to the ERP at once, across all requests.
+# Threads are started on demand, so an idle pool costs nothing
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", 1000))
+ERP_MAX_CONCURRENCY = int(os.environ.get("ERP_MAX_CONCURRENCY", MAX_BATCH_SIZE))
+BATCH_WORKERS = min(int(os.environ.get("BATCH_WORKERS", MAX_BATCH_SIZE)), ERP_MAX_CONCURRENCY)
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="erp-batch")
+
+# Pooled keep-alive connections, timeouts and retries for every legacy ERP call;
+# the pool holds a connection per batch worker
+erp = UpstreamClient(LEGACY_ERP_BASE_URL, pool_size=BATCH_WORKERS)
+
+
+def is_not_found(error):
+    return isinstance(error, requests.HTTPError) and error.response is not None and error.response.status_code == 404
+
+
+# Part metadata hardly ever changes; stock is shared by every part of a type.
+# Stale entries are served while they are refreshed in the background, and
+# unknown parts (404) are remembered for a while too
+parts_cache = TTLCache(
+    maxsize=int(os.environ.get("PARTS_CACHE_SIZE", 4096)),
+    ttl=float(os.environ.get("PARTS_CACHE_TTL", 3600)),
+    negative_ttl=float(os.environ.get("PARTS_NEGATIVE_TTL", 300)),
+    is_negative=is_not_found,
+)
+stock_cache = TTLCache(
+    maxsize=int(os.environ.get("STOCK_CACHE_SIZE", 1024)),
+    ttl=float(os.environ.get("STOCK_CACHE_TTL", 30)),
+    negative_ttl=float(os.environ.get("STOCK_NEGATIVE_TTL", 30)),
+    is_negative=is_not_found,
+)
+
+
+def fetch_json(path):
+    response = erp.get(path)
+    response.raise_for_status()
+    return response.json()
+
+
+def lookup_part(part_id):
+    return parts_cache.get(part_id, lambda: fetch_json(f'/parts/{part_id}'))
+
+
+def lookup_stock(part_type):
+    return stock_cache.get(part_type, lambda: fetch_json(f'/stock/{part_type}'))
+
+
+def error_message(e):
+    if isinstance(e, requests.RequestException):
+        return str(e)
+    if isinstance(e, KeyError):
+        return f"Missing key in response: {str(e)}"
+    return f"Unexpected error: {str(e)}"
+
+
+def settled(lookup, key):
+    # (value, None) or (None, error), so one failed lookup does not fail the batch
+    try:
+        return lookup(key), None
+    except Exception as e:
+        return None, e
+
+
+def parse_part_id(part_id):
+    """The int value of an ASCII decimal part id, or None; str.isdigit alone also accepts '²' or '１'."""
+    return int(part_id) if part_id and part_id.isascii() and part_id.isdigit() else None
+
+
+def get_products(part_ids):
+    """
+    Look up several parts at once: every distinct part concurrently, then
+    the stock of every distinct type among them concurrently, once per type.
+    Returns one result or error per requested id, in request order.
+    """
+    # (part_id, int id or None): only ASCII decimal ids are looked up
+    parsed = [(part_id, parse_part_id(part_id)) for part_id in part_ids]
+    valid_ids = list(dict.fromkeys(part_id for part_id, number in parsed if number is not None))
+    parts = dict(zip(valid_ids, batch_executor.map(partial(settled, lookup_part), valid_ids)))
+    part_types = list(dict.fromkeys(
+        product_data["type"] for product_data, error in parts.values() if error is None and "type" in product_data
+    ))
+    stocks = dict(zip(part_types, batch_executor.map(partial(settled, lookup_stock), part_types)))
+
+    results = []
+    for part_id, number in parsed:
+        if number is None:
+            results.append({"id": part_id, "error": "Invalid part_id"})
+            continue
+        try:
+            product_data, error = parts[part_id]
+            if error is not None:
+                raise error
+            stock_data, error = stocks[product_data["type"]]
+            if error is not None:
+                raise error
+            results.append({
+                "id": number,
+                "type": product_data["type"],
+                "stock": stock_data["stock"],
+                "status": product_data["status"]
+            })
+        except Exception as e:
+            results.append({"id": number, "error": error_message(e)})
+    return results
+
+
+def get_products_batch(part_ids):
+    if not part_ids:
+        return jsonify({"error": "Invalid part_id"}), 400
+    if len(part_ids) > MAX_BATCH_SIZE:
+        return jsonify({"error": f"At most {MAX_BATCH_SIZE} part ids per request"}), 400
+    return jsonify(get_products(part_ids)), 200
+
+
+@app.route("/api/products", methods=["GET", "POST"])
 def get_product():
+    # Batches: ?part_id=1,2,3 or a POST body {"part_ids": [1, 2, 3]}
+    if request.method == "POST":
+        body = request.get_json(silent=True) or {}
+        part_ids = body.get("part_ids") if isinstance(body, dict) else None
+        if not isinstance(part_ids, list):
+            return jsonify({"error": "Expected a JSON body with a part_ids list"}), 400
+        return get_products_batch([str(part_id).strip() for part_id in part_ids])
+
     part_id = request.args.get('part_id')
-    if not part_id or not part_id.isdigit():
+    if part_id and "," in part_id:
+        return get_products_batch([p.strip() for p in part_id.split(",")])
+    number = parse_part_id(part_id)
+    if number is None:
         return jsonify({"error": "Invalid part_id"}), 400
 
     try:
-        product_response = requests.get(f'{LEGACY_ERP_BASE_URL}/parts/{part_id}')
-        product_response.raise_for_status()
-        product_data = product_response.json()
-
-        stock_response = requests.get(f'{LEGACY_ERP_BASE_URL}/stock/{product_data["type"]}')
-        stock_response.raise_for_status()
-        stock_data = stock_response.json()
+        product_data = lookup_part(part_id)
+        stock_data = lookup_stock(product_data["type"])
 
         return jsonify({
-            "id": int(part_id),
+            "id": number,
             "type": product_data["type"],
             "stock": stock_data["stock"],
             "status": product_data["status"]
@@ -38,6 +174,7 @@ def get_product():
     except Exception as e:
         return jsonify({"error": f"Unexpected error: {str(e)}"}), 500
 
+
 # Haversine formula to calculate the great-circle distance between two points
 def haversine(lat1, lon1, lat2, lon2):
     pos_1 = (lat1, lon1) # (lat, lon)
@@ -56,6 +193,26 @@ def haversine(lat1, lon1, lat2, lon2):
         # Truncate to 2 decimal places without rounding
         return math.floor(distance * 100) / 100
 
+
+# Distance index of the last roster the ERP returned, rebuilt when it changes
+technician_index = None
+
+
+def roster_version(response):
+    """ETag of a roster response, or else a digest of its body."""
+    return response.headers.get("ETag") or hashlib.blake2b(response.content, digest_size=16).hexdigest()
+
+
+def index_technicians(response):
+    # The roster is only parsed and indexed when its version changes
+    global technician_index
+    version = roster_version(response)
+    index = technician_index
+    if index is None or index.version != version:
+        index = technician_index = TechnicianIndex(response.json(), haversine, version)
+    return index
+
+
 @app.route("/api/technicians/nearest", methods=["GET"])
 def get_nearest_technicians():
     try:
@@ -63,24 +220,37 @@ def get_nearest_technicians():
         lon = float(request.args.get('lon'))
     except (TypeError, ValueError):
         return jsonify({"error": "Invalid latitude or longitude"}), 400
+    # Comparisons are False for NaN, so it is rejected along with inf
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return jsonify({"error": "Invalid latitude or longitude"}), 400
+
+    # k nearest (2 by default), or everyone within radius_km; both combine
+    k = request.args.get('k')
+    radius_km = request.args.get('radius_km')
+    try:
+        k = int(k) if k is not None else None if radius_km is not None else 2
+        radius_km = float(radius_km) if radius_km is not None else None
+    except ValueError:
+        return jsonify({"error": "Invalid k or radius_km"}), 400
+    if (k is not None and k < 1) or (radius_km is not None and not 0 <= radius_km < math.inf):
+        return jsonify({"error": "Invalid k or radius_km"}), 400
 
     try:
-        response = requests.get(f'{LEGACY_ERP_BASE_URL}/technicians/available')
+        response = erp.get('/technicians/available')
         response.raise_for_status()
-        technicians = response.json()
+        index = index_technicians(response)
 
         # Handle empty technician list
-        if not technicians:
+        if not index.technicians:
             return jsonify({"error": "No technicians available"}), 500
 
-        technicians = sorted(technicians, key=lambda x: haversine(lat, lon, float(x["latitude"]), float(x["longitude"])))
-        nearest_technicians = technicians[:2]
+        nearest_technicians = index.nearest(lat, lon, k, radius_km)
 
         result = [{
             "id": int(t["id"]),
             "name": t["name"],
-            "distance_km": haversine(lat, lon, float(t["latitude"]), float(t["longitude"]))
-        } for t in nearest_technicians]
+            "distance_km": distance_km
+        } for t, distance_km in nearest_technicians]
 
         return jsonify(result), 200
     except requests.RequestException as e:
@@ -0,0 +1,56 @@
+import random
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Upstream statuses worth another attempt; anything else is returned as is
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+class UpstreamClient:
+    """
+    Shared HTTP client for the legacy ERP.
+
+    One requests.Session with a pooled adapter keeps connections alive across
+    requests and Flask worker threads (the urllib3 pool is thread-safe and the
+    session holds no per-request state). Every call has a (connect, read)
+    timeout. Connection failures and RETRY_STATUSES are retried up to
+    `retries` times with full-jitter exponential backoff; read timeouts are
+    not, so a slow ERP costs at most one read timeout per call.
+    """
+
+    def __init__(self, base_url, pool_size=32, connect_timeout=3.05, read_timeout=10.0,
+                 retries=2, backoff=0.1, backoff_max=2.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, pool_block=False)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _sleep_before_retry(self, attempt):
+        time.sleep(random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt)))
+
+    def get(self, path, timeout=None):
+        """GET base_url + path, retrying transient failures; returns the last response."""
+        url = f"{self.base_url}{path}"
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session.get(url, timeout=timeout or self.timeout)
+            except requests.ConnectionError:
+                # Includes connect timeouts, but not read timeouts
+                if attempt == self.retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    return response
+                response.close()
+            self._sleep_before_retry(attempt)
+
+    def close(self):
+        self.session.close()
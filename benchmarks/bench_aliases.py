@@ -0,0 +1,99 @@
+"""
+Microbenchmark: compiled alias plans and the shape cache vs. the original
+per-record alias walk.
+
+Run from the repository root:
+    python -m benchmarks.bench_aliases [--repeat 5] [--number 20000]
+"""
+import argparse
+import json
+import timeit
+from pathlib import Path
+
+from data_transformation.main import ConfigLoader, ItemDetail, Transaction, map_aliases
+
+CONFIG_PATH = Path("data_transformation/config.yml")
+RECORDS_PATH = Path("data_transformation/inputs/records.json")
+
+
+def legacy_apply_aliases(alias_map, values):
+    """The alias resolution loop as it was before compile_alias_map."""
+    mapped_values = {}
+    for field_name, aliases in alias_map.items():
+        for alias in aliases:
+            if '.' in alias:
+                nested_keys = alias.split('.')
+                nested_value = values
+                try:
+                    for key in nested_keys:
+                        nested_value = nested_value[key]
+                    mapped_values[field_name] = nested_value
+                    break
+                except (TypeError, KeyError):
+                    continue
+            elif alias in values:
+                mapped_values[field_name] = values[alias]
+                break
+
+        if field_name not in mapped_values and field_name in values:
+            mapped_values[field_name] = values[field_name]
+
+    return mapped_values
+
+
+def build_samples(config):
+    """One record per alias variant of every mapped field in config.yml."""
+    with RECORDS_PATH.open("r", encoding="utf-8") as f:
+        records = json.load(f)
+
+    transactions = list(records)
+    for field_key in ("id_fields", "name_fields", "date_fields", "amount_fields"):
+        base = dict(records[0])
+        for alias in config.get(field_key, []):
+            record = {k: v for k, v in base.items() if k not in config.get(field_key, [])}
+            head, _, tail = alias.partition(".")
+            record[head] = {tail: "Jane Doe"} if tail else base.get("customer", "x")
+            transactions.append(record)
+
+    items = [item for record in records for item in record["items"]]
+    return transactions, items
+
+
+def run(model, samples, repeat, number):
+    legacy = min(timeit.repeat(
+        lambda: [legacy_apply_aliases(model.alias_map, s) for s in samples], repeat=repeat, number=number))
+    compiled = min(timeit.repeat(
+        lambda: [map_aliases(s, model.alias_plan) for s in samples], repeat=repeat, number=number))
+    cached = min(timeit.repeat(
+        lambda: [model.shape_cache.map(s) for s in samples], repeat=repeat, number=number))
+
+    for sample in samples:
+        expected = legacy_apply_aliases(model.alias_map, sample)
+        assert map_aliases(sample, model.alias_plan) == expected
+        assert model.shape_cache.map(sample) == expected
+
+    calls = number * len(samples)
+    print(f"{model.__name__:<12} {len(samples):>8} {legacy / calls * 1e9:>10.0f} "
+          f"{compiled / calls * 1e9:>10.0f} {cached / calls * 1e9:>10.0f} {legacy / cached:>8.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Alias resolution microbenchmark")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    config = ConfigLoader(CONFIG_PATH)
+    Transaction.set_config(config)
+    ItemDetail.set_config(config)
+    transactions, items = build_samples(config)
+
+    print(f"{'model':<12} {'variants':>8} {'legacy ns':>10} {'compiled':>10} {'cached':>10} {'speedup':>9}")
+    run(Transaction, transactions, args.repeat, args.number)
+    run(ItemDetail, items, args.repeat, args.number)
+    print(f"shape cache: Transaction {Transaction.shape_cache.cache_info()}")
+    print(f"shape cache: ItemDetail {ItemDetail.shape_cache.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
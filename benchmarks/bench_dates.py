@@ -0,0 +1,67 @@
+"""
+Microbenchmark: DateParser vs. the original in-order strptime loop.
+
+Run from the repository root:
+    python -m benchmarks.bench_dates [--records 200000] [--distinct 365]
+"""
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from data_transformation.main import ConfigLoader, DateParser
+
+CONFIG_PATH = Path("data_transformation/config.yml")
+
+
+def legacy_parse(value, date_formats):
+    """The purchase_date loop as it was before DateParser."""
+    for fmt in date_formats:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Unable to parse '{value}' as a date")
+
+
+def build_workload(date_formats, records, distinct, seed=42):
+    """Dates drawn from a small pool of days rendered in every configured format."""
+    rng = random.Random(seed)
+    days = [date(2024, 1, 1) + timedelta(days=i) for i in range(distinct)]
+    return [rng.choice(days).strftime(rng.choice(date_formats)) for _ in range(records)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Date parsing microbenchmark")
+    parser.add_argument("--records", type=int, default=200000)
+    parser.add_argument("--distinct", type=int, default=365, help="distinct days in the workload")
+    args = parser.parse_args()
+
+    date_formats = ConfigLoader(CONFIG_PATH).get("date_formats", [])
+    values = build_workload(date_formats, args.records, args.distinct)
+
+    started = time.perf_counter()
+    expected = [legacy_parse(value, date_formats) for value in values]
+    legacy = time.perf_counter() - started
+
+    cold = DateParser(date_formats, cache_size=0)
+    started = time.perf_counter()
+    planned = [cold.parse(value) for value in values]
+    uncached = time.perf_counter() - started
+
+    warm = DateParser(date_formats)
+    started = time.perf_counter()
+    memoized = [warm.parse(value) for value in values]
+    cached = time.perf_counter() - started
+
+    assert planned == expected and memoized == expected
+    per_record = 1e9 / len(values)
+    print(f"{'legacy loop':<24} {legacy * per_record:>10.0f} ns/date")
+    print(f"{'planned, no memo':<24} {uncached * per_record:>10.0f} ns/date  {legacy / uncached:>6.2f}x")
+    print(f"{'planned + memo':<24} {cached * per_record:>10.0f} ns/date  {legacy / cached:>6.2f}x")
+    print(f"memo cache: {warm.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Microbenchmark: throughput and memory of the dedupe store backends.
+
+Run from the repository root:
+    python -m benchmarks.bench_dedupe [--keys 1000000] [--duplicates 0.2]
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from data_transformation import main as pipeline
+
+STATUSES = ("Completed", "Pending")
+
+
+def build_keys(size, duplicates, seed=42):
+    """Dedupe keys as write_records builds them, with a share of repeats."""
+    rng = random.Random(seed)
+    start = date(2020, 1, 1)
+    keys = []
+    for _ in range(size):
+        if keys and rng.random() < duplicates:
+            keys.append(rng.choice(keys))
+            continue
+        keys.append((
+            ("purchase_date", start + timedelta(days=rng.randrange(2000))),
+            ("total_amount", rng.randint(100, 10000000) / 100),
+            ("status", rng.choice(STATUSES)),
+        ))
+    return keys
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dedupe store microbenchmark")
+    parser.add_argument("--keys", type=int, default=1000000)
+    parser.add_argument("--duplicates", type=float, default=0.2)
+    args = parser.parse_args()
+
+    keys = build_keys(args.keys, args.duplicates)
+    expected = None
+    for backend in pipeline.DEDUPE_BACKENDS:
+        config = pipeline.ConfigLoader.__new__(pipeline.ConfigLoader)
+        config.config = {"dedupe": {"backend": backend, "bloom_capacity": args.keys}}
+        store = pipeline.create_dedupe_store(config)
+        try:
+            started = time.perf_counter()
+            added = [store.add(key) for key in keys]
+            elapsed = time.perf_counter() - started
+            if expected is None:
+                expected = added
+            assert added == expected, f"{backend} disagrees with the tuple store"
+            print(f"{backend:<8} {elapsed * 1e9 / len(keys):>8.0f} ns/key  {pipeline.report_dedupe_store(store)}")
+        finally:
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+End-to-end ingestion benchmark: records/sec and peak RSS of parse_json_to_csv
+over generated inputs of increasing size.
+
+Each run happens in a fresh interpreter so its peak RSS is its own. Results
+are appended to a JSON Lines file together with the commit and Python
+version, and each row is compared with the previous result of the same
+configuration.
+
+Run from the repository root:
+    python -m benchmarks.bench_ingest [--sizes 10000 100000 1000000] [--modes models columnar] [--workers 1]
+"""
+import argparse
+import json
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from data_transformation import main as pipeline
+from benchmarks.generate_records import write_input
+
+RESULTS = Path("benchmarks/results/ingest.jsonl")
+
+
+def _peak_rss_bytes(who):
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak = resource.getrusage(who).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_child(args):
+    """Ingest one input in this process and print the measurements as JSON."""
+    config = pipeline.ConfigLoader(args.config)
+    work_dir = Path(args.work_dir)
+    config.config["quality"] = dict(config.get("quality", {}) or {}, quarantine=str(work_dir / "quarantine.jsonl"))
+    logger = pipeline.logging.getLogger(pipeline.__name__)
+    logger.setLevel(pipeline.logging.ERROR)
+
+    started = time.perf_counter()
+    with open(args.input, "r", encoding="utf-8") as file:
+        pipeline.parse_json_to_csv(
+            pipeline.iter_json_records(file), work_dir / "transactions.csv", work_dir / "details.csv", config,
+            workers=args.workers, validation=args.mode,
+        )
+    seconds = time.perf_counter() - started
+    print(json.dumps({
+        "seconds": seconds,
+        "peak_rss_bytes": _peak_rss_bytes(resource.RUSAGE_SELF),
+        "worker_peak_rss_bytes": _peak_rss_bytes(resource.RUSAGE_CHILDREN),
+    }))
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _previous_results(path):
+    previous = {}
+    if path.exists():
+        for line in path.read_text(encoding="utf-8").splitlines():
+            result = json.loads(line)
+            previous[(result["records"], result["mode"], result["workers"], result["format"], result["dirty"])] = result
+    return previous
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end ingestion benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--modes", nargs="+", choices=("models", "columnar"), default=["models", "columnar"])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1])
+    parser.add_argument("--format", choices=("json", "ndjson"), default="json")
+    parser.add_argument("--dirty", type=float, default=0.05)
+    parser.add_argument("--config", type=Path, default=Path("data_transformation/config.yml"))
+    parser.add_argument("--inputs", type=Path, default=Path(tempfile.gettempdir()) / "ingest-bench",
+                        help="where generated inputs are kept between runs")
+    parser.add_argument("--results", type=Path, default=RESULTS)
+    # Internal: a single measured run
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--input", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    parser.add_argument("--work-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        args.workers = args.workers[0]
+        run_child(args)
+        return
+
+    config = pipeline.ConfigLoader(args.config)
+    previous = _previous_results(args.results)
+    args.results.parent.mkdir(parents=True, exist_ok=True)
+    commit = _commit()
+    print(f"{'records':>10} {'mode':<9} {'workers':>7} {'records/s':>12} {'peak RSS':>10} {'vs last':>8}")
+
+    for size in args.sizes:
+        # Generation is deterministic, so an input of the same parameters is reused
+        input_file = args.inputs / f"records-{size}-{args.dirty}.{args.format}"
+        if not input_file.exists():
+            write_input(input_file, size, config, args.dirty, args.format)
+
+        for mode in args.modes:
+            for workers in args.workers:
+                with tempfile.TemporaryDirectory() as work_dir:
+                    child = subprocess.run(
+                        [sys.executable, "-m", "benchmarks.bench_ingest", "--child", "--input", str(input_file),
+                         "--mode", mode, "--workers", str(workers), "--work-dir", work_dir, "--config", str(args.config)],
+                        capture_output=True, text=True, check=True,
+                    )
+                measured = json.loads(child.stdout.strip().splitlines()[-1])
+                result = {
+                    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "commit": commit,
+                    "python": platform.python_version(),
+                    "records": size,
+                    "mode": mode,
+                    "workers": workers,
+                    "format": args.format,
+                    "dirty": args.dirty,
+                    "seconds": measured["seconds"],
+                    "records_per_second": size / measured["seconds"],
+                    "peak_rss_bytes": measured["peak_rss_bytes"],
+                    "worker_peak_rss_bytes": measured["worker_peak_rss_bytes"],
+                }
+                with args.results.open("a", encoding="utf-8") as file:
+                    file.write(json.dumps(result) + "\n")
+
+                last = previous.get((size, mode, workers, args.format, args.dirty))
+                change = f"{result['records_per_second'] / last['records_per_second']:>7.2f}x" if last else f"{'-':>8}"
+                print(f"{size:>10} {mode:<9} {workers:>7} {result['records_per_second']:>12.0f} "
+                      f"{result['peak_rss_bytes'] / 2 ** 20:>8.1f}MB {change}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Microbenchmark: /api/technicians/nearest rankings over large rosters, the
+k-d tree index (with vectorized leaf distances) and the plain vectorized
+distance pass, against the full sort the endpoint used before.
+
+Run from the repository root:
+    python -m benchmarks.bench_nearest [--sizes 10000 100000 1000000] [--queries 20] [--k 2]
+"""
+import argparse
+import random
+import time
+
+from api_rest import distance
+from api_rest.geo import TechnicianIndex
+from api_rest.main import haversine
+
+
+def build_roster(size, seed=42):
+    """Technicians as the ERP returns them, in a few dense clusters."""
+    rng = random.Random(seed)
+    centres = [(rng.uniform(-60, 60), rng.uniform(-180, 180)) for _ in range(20)]
+    roster = []
+    for i in range(size):
+        lat, lon = rng.choice(centres)
+        roster.append({
+            "id": i, "name": f"Technician {i}",
+            "latitude": max(-90.0, min(90.0, lat + rng.gauss(0, 2))),
+            "longitude": (lon + rng.gauss(0, 2) + 180) % 360 - 180,
+        })
+    return roster
+
+
+def full_sort(roster, lat, lon, k):
+    """The endpoint before the index: rank everyone, then take k."""
+    ranked = sorted(roster, key=lambda t: haversine(lat, lon, float(t["latitude"]), float(t["longitude"])))
+    return [(t["id"], haversine(lat, lon, float(t["latitude"]), float(t["longitude"]))) for t in ranked[:k]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nearest-technician microbenchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--k", type=int, default=2)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    print(f"{'technicians':>11} {'full sort':>12} {'build':>10} {'index':>10} {'vectorized':>12} {'speed-up':>9}")
+    for size in args.sizes:
+        roster = build_roster(size)
+        queries = [(rng.uniform(-60, 60), rng.uniform(-180, 180)) for _ in range(args.queries)]
+
+        started = time.perf_counter()
+        index = TechnicianIndex(roster, haversine)
+        build = time.perf_counter() - started
+
+        started = time.perf_counter()
+        found = [index.nearest(lat, lon, args.k) for lat, lon in queries]
+        indexed = (time.perf_counter() - started) / len(queries)
+
+        started = time.perf_counter()
+        scanned = [distance.nearest(lat, lon, index.positions, haversine, args.k) for lat, lon in queries]
+        vectorized = (time.perf_counter() - started) / len(queries)
+
+        # The full sort is slow on large rosters; a few queries are enough
+        sampled = queries[:max(1, min(len(queries), 1000000 // size))]
+        started = time.perf_counter()
+        expected = [full_sort(roster, lat, lon, args.k) for lat, lon in sampled]
+        sort = (time.perf_counter() - started) / len(sampled)
+
+        for ranked, linear, reference in zip(found, scanned, expected):
+            assert [(t["id"], d) for t, d in ranked] == reference, "indexed ranking disagrees with the full sort"
+            assert [(roster[i]["id"], d) for i, d in linear] == reference, "vectorized ranking disagrees with the full sort"
+        print(
+            f"{size:>11} {sort * 1e3:>10.2f}ms {build * 1e3:>8.2f}ms {indexed * 1e3:>8.3f}ms"
+            f" {vectorized * 1e3:>10.3f}ms {sort / indexed:>8.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Microbenchmark: batch format_prices vs. the original scalar format_price.
+
+Run from the repository root:
+    python -m benchmarks.bench_prices [--values 1000000] [--distinct 5000]
+"""
+import argparse
+import random
+import re
+import time
+
+from data_transformation import main as pipeline
+
+TEMPLATES = ("{:.2f}", "{:,.2f}€", "€{:,.2f}", "{:.2f} EUR")
+
+
+def legacy_format_price(value):
+    """format_price as it was before the batch API."""
+    try:
+        if isinstance(value, (float, int)):
+            return round(float(value), 2)
+        if isinstance(value, str):
+            value = re.sub(r"[^\d,\.]", "", value)
+            last_dot = value.rfind('.')
+            last_comma = value.rfind(',')
+            if last_dot > last_comma:
+                value = value.replace(',', '')
+            elif last_comma > last_dot:
+                value = value.replace('.', '').replace(',', '.')
+            elif last_comma == last_dot == -1:
+                return float(value)
+            return round(float(value), 2)
+    except (ValueError, TypeError):
+        return 0.0
+    return 0.0
+
+
+def build_column(size, distinct, seed=42):
+    """Item prices drawn from a catalogue of distinct prices in mixed locales."""
+    rng = random.Random(seed)
+    catalogue = []
+    for _ in range(distinct):
+        price = rng.randint(100, 500000) / 100
+        if rng.random() < 0.2:
+            catalogue.append(price)
+        else:
+            literal = rng.choice(TEMPLATES).format(price)
+            if literal.startswith("€"):
+                literal = literal.replace(",", " ").replace(".", ",").replace(" ", ".")
+            catalogue.append(literal)
+    return [rng.choice(catalogue) for _ in range(size)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Price normalization microbenchmark")
+    parser.add_argument("--values", type=int, default=1000000)
+    parser.add_argument("--distinct", type=int, default=5000)
+    args = parser.parse_args()
+
+    column = build_column(args.values, args.distinct)
+
+    started = time.perf_counter()
+    expected = [legacy_format_price(value) for value in column]
+    legacy = time.perf_counter() - started
+
+    pipeline._price_cache.clear()
+    started = time.perf_counter()
+    scalar = [pipeline.format_price(value) for value in column]
+    delegated = time.perf_counter() - started
+
+    pipeline._price_cache.clear()
+    started = time.perf_counter()
+    batch = pipeline.format_prices(column)
+    batched = time.perf_counter() - started
+
+    assert scalar == expected and batch == expected
+    per_value = 1e9 / len(column)
+    print(f"{'legacy format_price':<22} {legacy * per_value:>8.0f} ns/value")
+    print(f"{'format_price':<22} {delegated * per_value:>8.0f} ns/value  {legacy / delegated:>6.2f}x")
+    print(f"{'format_prices':<22} {batched * per_value:>8.0f} ns/value  {legacy / batched:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Deterministic synthetic input for the ingestion pipeline.
+
+Records cycle through every alias in config.yml (nested ones included),
+every configured date format, prices in several locales and every status
+variation; a share of them carries one dirty value (missing field,
+unparseable amount or price, invalid quantity or item, rejected id or
+date, null items). The same arguments always produce the same file.
+
+Run from the repository root:
+    python -m benchmarks.generate_records OUTPUT [--records 1000000] [--dirty 0.05] [--format json|ndjson]
+"""
+import argparse
+import json
+import random
+from datetime import date, timedelta
+from pathlib import Path
+
+from data_transformation import main as pipeline
+
+FIRST_NAMES = ("John", "Jane", "Bob", "Alice", "Carlos", "Mei", "Olga", "Tariq", "Ana", "Lukas")
+LAST_NAMES = ("Doe", "Smith", "Jackson", "Brown", "Mendez", "Chen", "Ivanova", "Haddad", "Silva", "Weber")
+ITEMS = ("Laptop", "Tablet", "Smartphone", "Monitor", "Keyboard", "Mouse", "Headphones", "Printer", "Webcam", "Dock")
+PRICE_TEMPLATES = ("{:.2f}", "{:,.2f}€", "€{:,.2f}", "{:.2f} EUR", "${:,.2f}")
+DIRTY_KINDS = (
+    "missing_field", "bad_amount", "bad_price", "bad_quantity", "bad_item", "bad_id", "bad_date", "null_items",
+)
+
+
+def price_literal(rng, value):
+    """value as a float, an int or a string in one of the supported locales."""
+    roll = rng.random()
+    if roll < 0.15:
+        return value
+    if roll < 0.2:
+        return int(value)
+    literal = rng.choice(PRICE_TEMPLATES).format(value)
+    if literal.startswith("€"):
+        # European grouping: 1.234,56
+        literal = literal.replace(",", " ").replace(".", ",").replace(" ", ".")
+    return literal
+
+
+def _set_alias(record, alias, value):
+    """Store value under alias, creating the parent object of a nested alias."""
+    if "." in alias:
+        parent, child = alias.split(".", 1)
+        record.setdefault(parent, {})[child] = value
+    else:
+        record[alias] = value
+
+
+class RecordGenerator:
+    """Builds records from the aliases, date formats and status mapping of a config."""
+
+    def __init__(self, config, dirty=0.05, seed=42):
+        self.rng = random.Random(seed)
+        self.dirty = dirty
+        self.id_fields = config.get("id_fields", ["transaction_id"])
+        self.name_fields = config.get("name_fields", ["customer_name"])
+        self.date_fields = config.get("date_fields", ["purchase_date"])
+        self.amount_fields = config.get("amount_fields", ["total_amount"])
+        self.status_fields = config.get("status_fields", ["status"])
+        self.quantity_fields = config.get("quantity_fields", ["quantity"])
+        self.date_formats = config.get("date_formats", ["%Y-%m-%d"])
+        self.statuses = [variation for variations in config.get("status_mapping", {}).values() for variation in variations]
+        self.start = date(2020, 1, 1)
+
+    def record(self, number):
+        rng = self.rng
+        record = {}
+
+        transaction_id = number + 1
+        id_style = rng.random()
+        _set_alias(record, rng.choice(self.id_fields),
+                   transaction_id if id_style < 0.5 else f"{transaction_id:06d}" if id_style < 0.8 else f"TX-{transaction_id}")
+
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        name_alias = rng.choice(self.name_fields)
+        if name_alias == "client" and rng.random() < 0.5:
+            _set_alias(record, name_alias, {"first_name": first, "last_name": last})
+        else:
+            _set_alias(record, name_alias, rng.choice((f"{first} {last}", f"  {first}   {last} ", f"{first}-{last}")))
+
+        purchase_date = self.start + timedelta(days=rng.randrange(2000))
+        _set_alias(record, rng.choice(self.date_fields), purchase_date.strftime(rng.choice(self.date_formats)))
+
+        items = []
+        for _ in range(rng.choice((0, 1, 1, 2, 3, 4))):
+            quantity = rng.randint(1, 5)
+            price = rng.randint(100, 300000) / 100
+            items.append({"item": rng.choice(ITEMS), rng.choice(self.quantity_fields): quantity, "price": price_literal(rng, price)})
+        total = round(sum(float(pipeline.format_price(item["price"])) for item in items), 2) or rng.randint(100, 300000) / 100
+        _set_alias(record, rng.choice(self.amount_fields), price_literal(rng, total))
+
+        status = rng.choice(self.statuses)
+        _set_alias(record, rng.choice(self.status_fields), status + " " if rng.random() < 0.1 else status)
+        if items or rng.random() < 0.5:
+            record["items"] = items
+
+        if rng.random() < self.dirty:
+            self._soil(record, rng.choice(DIRTY_KINDS))
+        return record
+
+    def _soil(self, record, kind):
+        rng = self.rng
+        items = record.get("items") or []
+        if kind == "missing_field":
+            del record[rng.choice([key for key in record if key != "items"])]
+        elif kind == "bad_amount":
+            record[rng.choice(self.amount_fields)] = rng.choice(("n/a", "TBD", "--"))
+        elif kind == "bad_price" and items:
+            rng.choice(items)["price"] = rng.choice(("free", "N/A"))
+        elif kind == "bad_quantity" and items:
+            item = rng.choice(items)
+            item[next(key for key in item if key in self.quantity_fields)] = rng.choice(("many", "two", None))
+        elif kind == "bad_item" and items:
+            rng.choice(items)["item"] = rng.choice((404, None))
+        elif kind == "bad_id":
+            for alias in self.id_fields:
+                record.pop(alias, None)
+            record[self.id_fields[0]] = "unknown"
+        elif kind == "bad_date":
+            for alias in self.date_fields:
+                record.pop(alias, None)
+            record[self.date_fields[0]] = "31/31/2024"
+        elif kind == "null_items":
+            record["items"] = None
+
+    def __iter__(self):
+        number = 0
+        while True:
+            yield self.record(number)
+            number += 1
+
+
+def write_input(path, records, config, dirty=0.05, fmt="json", seed=42):
+    """Stream the first records generated records to path as a JSON array or NDJSON."""
+    generator = iter(RecordGenerator(config, dirty, seed))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as file:
+        if fmt == "json":
+            file.write("[\n")
+        for number in range(records):
+            line = json.dumps(next(generator), ensure_ascii=False)
+            if fmt == "json":
+                file.write(line + (",\n" if number < records - 1 else "\n"))
+            else:
+                file.write(line + "\n")
+        if fmt == "json":
+            file.write("]\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic ingestion input generator")
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--records", type=int, default=1000000)
+    parser.add_argument("--dirty", type=float, default=0.05)
+    parser.add_argument("--format", choices=("json", "ndjson"), default="json")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--config", type=Path, default=Path("data_transformation/config.yml"))
+    args = parser.parse_args()
+
+    config = pipeline.ConfigLoader(args.config)
+    write_input(args.output, args.records, config, args.dirty, args.format, args.seed)
+    print(f"Wrote {args.records} records to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
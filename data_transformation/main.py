@@ -1,14 +1,37 @@
+import hashlib
+import io
 import json
+import math
+import multiprocessing
+import os
+import shutil
+import signal
+import sqlite3
+import sys
+import tempfile
+import threading
+import tracemalloc
 import yaml
 import logging
-from typing import List, Dict, Any, Optional, ClassVar
-from pydantic import BaseModel, model_validator, field_validator
+from typing import List, Dict, Any, Optional, ClassVar, Iterable, Iterator, TextIO, Tuple, Callable
+from pydantic import BaseModel, ValidationError, model_validator, field_validator
 from datetime import date, datetime
+from array import array
+from collections import Counter, OrderedDict, deque
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from queue import Full, Queue
+from functools import lru_cache
+from itertools import groupby, islice
+from operator import itemgetter
 from pathlib import Path
 import time
 import re
 import csv
 
+import numpy as np
+
 # Setup Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -18,31 +41,722 @@ logger = logging.getLogger(__name__)
 # ------------------------------
 
 
+# Bump when the cached JSON layout or CompiledConfig changes so stale cache files are ignored
+_CONFIG_CACHE_VERSION = 2
+
+
+def _config_fingerprint(raw: Any) -> Optional[str]:
+    """Hash of a config dict's content, or None when it cannot be serialized canonically."""
+    try:
+        dumped = json.dumps(raw, sort_keys=True, default=str)
+    except (TypeError, ValueError):
+        return None
+    return hashlib.sha256(dumped.encode("utf-8")).hexdigest()
+
+
 class ConfigLoader:
-    """Loads and stores configuration from a YAML file."""
+    """
+    Loads and stores configuration from a YAML file.
+
+    The parsed config and its compiled form (see CompiledConfig) are cached
+    as JSON in a __pycache__ directory next to the file, keyed by the hash of
+    its content, so later runs skip both the YAML parse and the compilation.
+    A single CompiledConfig is shared by both models and rebuilt whenever
+    config.config no longer matches the dict it was compiled from.
+    """
 
-    def __init__(self, yaml_file: Path):
+    def __init__(self, yaml_file: Path, cache: bool = True):
         try:
-            with yaml_file.open("r", encoding="utf-8") as file:
-                self.config = yaml.safe_load(file)
+            data = yaml_file.read_bytes()
         except FileNotFoundError:
             logger.error(f"Configuration file not found: {yaml_file}")
             raise
+
+        digest = hashlib.sha256(str(_CONFIG_CACHE_VERSION).encode("ascii") + data).hexdigest()[:16]
+        cache_file = yaml_file.parent / "__pycache__" / f"{yaml_file.stem}.{digest}.json"
+        self._compiled: Optional[CompiledConfig] = None
+        if cache and self._load_cache(cache_file):
+            return
+
+        try:
+            self.config = yaml.safe_load(data)
         except yaml.YAMLError as e:
             logger.error(f"Error parsing YAML file: {e}")
             raise
+        if cache:
+            self._save_cache(cache_file)
+
+    def _load_cache(self, cache_file: Path) -> bool:
+        try:
+            with cache_file.open("r", encoding="utf-8") as file:
+                cached = json.load(file)
+            if cached["version"] != _CONFIG_CACHE_VERSION or cached["fingerprint"] != _config_fingerprint(cached["config"]):
+                raise ValueError("fingerprint mismatch")
+            self.config = cached["config"]
+            self._compiled = CompiledConfig.from_json(cached["compiled"], cached["fingerprint"])
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable config cache {cache_file}: {e}")
+            return False
+        return True
+
+    def _save_cache(self, cache_file: Path):
+        try:
+            # YAML-only types (dates, non-string keys) would not survive the round trip
+            if json.loads(json.dumps(self.config)) != self.config:
+                return
+        except (TypeError, ValueError):
+            return
+        try:
+            cache_file.parent.mkdir(exist_ok=True)
+            tmp_path = cache_file.with_name(cache_file.name + ".tmp")
+            cached = {
+                "version": _CONFIG_CACHE_VERSION,
+                "fingerprint": _config_fingerprint(self.config),
+                "config": self.config,
+                "compiled": self.compiled.to_json(),
+            }
+            with tmp_path.open("w", encoding="utf-8") as file:
+                json.dump(cached, file)
+            os.replace(tmp_path, cache_file)
+            # Entries for earlier versions of this file are never read again; names of
+            # other configs sharing a prefix (config.prod.yml) never match the pattern
+            entry = re.compile(re.escape(cache_file.stem.rsplit(".", 1)[0]) + r"\.[0-9a-f]{16}\.json")
+            for stale in cache_file.parent.iterdir():
+                if stale != cache_file and entry.fullmatch(stale.name):
+                    stale.unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning(f"Unable to write config cache {cache_file}: {e}")
+
+    @property
+    def compiled(self) -> "CompiledConfig":
+        """Lookup tables derived from the current config dict, compiled once per content."""
+        fingerprint = _config_fingerprint(self.config)
+        compiled = getattr(self, "_compiled", None)
+        if compiled is None or fingerprint is None or compiled.fingerprint != fingerprint:
+            compiled = self._compiled = CompiledConfig(self.config, fingerprint)
+        return compiled
 
     def get(self, key: str, default: Any = None) -> Any:
         """Retrieve a value from the config."""
         return self.config.get(key, default)
 
+# ------------------------------
+#      Alias Resolution
+# ------------------------------
+
+# Sentinel for "no alias matched", since None is a legitimate input value
+_MISSING = object()
+
+# (field_name, steps, has_nested): a step is a plain key or a pre-split nested path
+AliasPlan = Tuple[Tuple[str, Tuple[Any, ...], bool], ...]
+
+
+def _resolve_path(values: Any, path: Tuple[str, ...]) -> Any:
+    """Walk a pre-split nested alias such as ('buyer', 'full_name')."""
+    for key in path:
+        if isinstance(values, dict):
+            if key not in values:
+                return _MISSING
+            values = values[key]
+        else:
+            try:
+                values = values[key]
+            except (TypeError, KeyError):
+                return _MISSING
+    return values
+
+
+def compile_alias_map(alias_map: Dict[str, List[str]]) -> AliasPlan:
+    """
+    Compile an alias map into a dispatch table consumed by map_aliases.
+    Dotted aliases are split once here, and the field name itself is appended
+    as the last candidate so a record already using it is still mapped.
+    """
+    plan = []
+    for field_name, aliases in alias_map.items():
+        paths = [tuple(alias.split('.')) for alias in aliases]
+        if (field_name,) not in paths:
+            paths.append((field_name,))
+        steps = tuple(path[0] if len(path) == 1 else path for path in paths)
+        plan.append((field_name, steps, any(len(path) > 1 for path in paths)))
+    return tuple(plan)
+
+
+def map_aliases(values: Dict[str, Any], alias_plan: AliasPlan) -> Dict[str, Any]:
+    """Map a raw record onto model field names using a compiled alias plan."""
+    mapped_values = {}
+    for field_name, steps, has_nested in alias_plan:
+        if not has_nested:
+            for key in steps:
+                if key in values:
+                    mapped_values[field_name] = values[key]
+                    break
+            continue
+
+        for step in steps:
+            if step.__class__ is str:
+                if step in values:
+                    mapped_values[field_name] = values[step]
+                    break
+            else:
+                value = _resolve_path(values, step)
+                if value is not _MISSING:
+                    mapped_values[field_name] = value
+                    break
+    return mapped_values
+
+
+class ShapeCache:
+    """
+    Bounded LRU of alias resolution plans keyed by a record's key set.
+    Exports only come in a handful of layouts, so the alias lookup for a
+    layout is resolved once and replayed for every later record sharing it.
+    """
+
+    def __init__(self, alias_plan: AliasPlan, maxsize: int = 128):
+        self.alias_plan = alias_plan
+        self._plan_for_shape = lru_cache(maxsize=maxsize)(self._resolve_shape)
+
+    def _resolve_shape(self, keys: frozenset) -> Tuple[Tuple[str, Optional[str], Tuple[Any, ...]], ...]:
+        # Each entry is (field_name, key, steps): a direct key when the shape
+        # settles the lookup, otherwise the nested paths still to be walked.
+        plan = []
+        for field_name, steps, _ in self.alias_plan:
+            remaining = []
+            for step in steps:
+                if step.__class__ is str:
+                    if step in keys:
+                        remaining.append(step)
+                        break
+                elif step[0] in keys:
+                    remaining.append(step)
+
+            if len(remaining) == 1 and remaining[0].__class__ is str:
+                plan.append((field_name, remaining[0], ()))
+            elif remaining:
+                plan.append((field_name, None, tuple(remaining)))
+        return tuple(plan)
+
+    def map(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        """Map a raw record onto model field names using its shape's plan."""
+        if not isinstance(values, dict):
+            return map_aliases(values, self.alias_plan)
+
+        mapped_values = {}
+        for field_name, key, steps in self._plan_for_shape(frozenset(values)):
+            if key is not None:
+                mapped_values[field_name] = values[key]
+                continue
+            for step in steps:
+                if step.__class__ is str:
+                    mapped_values[field_name] = values[step]
+                    break
+                value = _resolve_path(values, step)
+                if value is not _MISSING:
+                    mapped_values[field_name] = value
+                    break
+        return mapped_values
+
+    def cache_info(self):
+        """Hit/miss counters of the shape plan cache (functools.lru_cache info)."""
+        return self._plan_for_shape.cache_info()
+
+    def cache_clear(self):
+        self._plan_for_shape.cache_clear()
+
+# ------------------------------
+#        Date Parsing
+# ------------------------------
+
+_ASCII_DIGITS = frozenset("0123456789")
+# strptime directives that only ever consume digits
+_NUMERIC_DIRECTIVES = frozenset("YmdyHMSfjUWwIGVu")
+
+
+def _analyze_date_format(fmt: str) -> Tuple[frozenset, bool]:
+    """Return the (casefolded) literal characters of a format and whether it is digits-only."""
+    literals = set()
+    numeric = True
+    i = 0
+    while i < len(fmt):
+        char = fmt[i]
+        if char == "%" and i + 1 < len(fmt):
+            directive = fmt[i + 1]
+            if directive == "%":
+                literals.add("%")
+            elif directive not in _NUMERIC_DIRECTIVES:
+                numeric = False
+            i += 2
+            continue
+        if not char.isspace():
+            literals.add(char.lower())
+        i += 1
+    return frozenset(literals), numeric
+
+
+class DateParser:
+    """
+    Memoized equivalent of trying each configured strptime format in order.
+
+    Formats overlap ('10/02/24' parses with both '%d/%m/%y' and '%d/%m/%Y'),
+    so the configured order decides the result and is never reordered.
+    Instead, formats that cannot match are pruned up front: strptime needs
+    every literal of a format to appear in the input, and a digits-only format
+    cannot consume any other character. The surviving candidates are planned
+    once per character signature of the input, ISO and dd/mm/yy strings take a
+    precompiled regex path when that format is the first candidate, and parsed
+    values are cached per distinct string.
+    """
+
+    _FAST_PATHS = {
+        "%Y-%m-%d": (re.compile(r"(\d{4})-(\d{2})-(\d{2})", re.ASCII), "-"),
+        "%d/%m/%y": (re.compile(r"(\d{2})/(\d{2})/(\d{2})", re.ASCII), "/"),
+    }
+
+    def __init__(self, date_formats: List[str], cache_size: int = 4096, analysis: Optional[Tuple[Tuple[frozenset, bool], ...]] = None):
+        self.formats = tuple(date_formats)
+        # The per-format analysis can be precomputed, see CompiledConfig
+        self._analysis = analysis if analysis is not None else tuple(_analyze_date_format(fmt) for fmt in self.formats)
+        self.hits = dict.fromkeys(self.formats, 0)
+        self._candidates = lru_cache(maxsize=256)(self._plan_candidates)
+        self.parse = lru_cache(maxsize=cache_size)(self._parse)
+
+        self._fast_paths = []
+        for fmt, (pattern, separator) in self._FAST_PATHS.items():
+            candidates = self._candidates(frozenset(separator))
+            if candidates and candidates[0] == fmt:
+                self._fast_paths.append((fmt, pattern))
+
+    def _plan_candidates(self, signature: frozenset) -> Tuple[str, ...]:
+        if any(char.isdecimal() for char in signature):
+            return self.formats  # Non-ASCII digits: keep every format to stay exact
+        candidates = []
+        for fmt, (literals, numeric) in zip(self.formats, self._analysis):
+            if not literals <= signature:
+                continue
+            if numeric and any(not char.isspace() and char not in literals for char in signature):
+                continue
+            candidates.append(fmt)
+        return tuple(candidates)
+
+    def _parse(self, value: str) -> date:
+        for fmt, pattern in self._fast_paths:
+            match = pattern.fullmatch(value)
+            if match:
+                first, month, last = (int(part) for part in match.groups())
+                if fmt == "%d/%m/%y":
+                    first, last = last + (2000 if last <= 68 else 1900), first
+                try:
+                    parsed = date(first, month, last)
+                except ValueError:
+                    break  # Out of range: let the generic scan decide
+                self.hits[fmt] += 1
+                return parsed
+
+        for fmt in self._candidates(frozenset(value.lower()) - _ASCII_DIGITS):
+            try:
+                parsed = datetime.strptime(value, fmt).date()
+            except ValueError:
+                continue
+            self.hits[fmt] += 1
+            return parsed
+        raise ValueError(f"Unable to parse '{value}' as a date")
+
+    def cache_info(self):
+        """Hit/miss counters of the parsed value cache (functools.lru_cache info)."""
+        return self.parse.cache_info()
+
+# ------------------------------
+#    Compiled Configuration
+# ------------------------------
+
+
+class CompiledConfig:
+    """
+    Lookup tables derived once from a config dict: the alias map and
+    pre-split alias plan of each model, the status mapping inverted into a
+    variation -> standard status dictionary (case-folded when status_casefold
+    is set) and the per-format analysis behind the DateParser plan.
+    fingerprint identifies the dict it was compiled from.
+    """
+
+    def __init__(self, raw: Dict[str, Any], fingerprint: Optional[str] = None):
+        self.fingerprint = fingerprint
+        self.alias_maps = {
+            model.__name__: {field: raw.get(key, []) for field, key in model.alias_fields.items()}
+            for model in (Transaction, ItemDetail)
+        }
+        self.alias_plans = {name: compile_alias_map(alias_map) for name, alias_map in self.alias_maps.items()}
+
+        self.status_mapping = raw.get("status_mapping", {})
+        self.status_casefold = bool(raw.get("status_casefold", False))
+        self.status_lookup = self._invert_status_mapping(self.status_mapping, self.status_casefold)
+
+        self.date_formats = tuple(raw.get("date_formats", []))
+        self.date_analysis = tuple(_analyze_date_format(fmt) for fmt in self.date_formats)
+
+    def to_json(self) -> Dict[str, Any]:
+        """JSON-serializable form of the tables, read back by from_json."""
+        return {
+            "alias_maps": self.alias_maps,
+            "alias_plans": self.alias_plans,
+            "status_mapping": self.status_mapping,
+            "status_casefold": self.status_casefold,
+            "status_lookup": self.status_lookup,
+            "date_formats": self.date_formats,
+            "date_analysis": [(sorted(literals), numeric) for literals, numeric in self.date_analysis],
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any], fingerprint: Optional[str] = None) -> "CompiledConfig":
+        compiled = cls.__new__(cls)
+        compiled.fingerprint = fingerprint
+        compiled.alias_maps = data["alias_maps"]
+        # JSON turns the plan tuples into lists; map_aliases tells nested paths from keys by type
+        compiled.alias_plans = {
+            name: tuple(
+                (field_name, tuple(step if isinstance(step, str) else tuple(step) for step in steps), has_nested)
+                for field_name, steps, has_nested in plan
+            )
+            for name, plan in data["alias_plans"].items()
+        }
+        compiled.status_mapping = data["status_mapping"]
+        compiled.status_casefold = data["status_casefold"]
+        compiled.status_lookup = data["status_lookup"]
+        compiled.date_formats = tuple(data["date_formats"])
+        compiled.date_analysis = tuple((frozenset(literals), numeric) for literals, numeric in data["date_analysis"])
+        return compiled
+
+    @staticmethod
+    def _invert_status_mapping(status_mapping: Dict[str, Any], casefold: bool) -> Optional[Dict[str, str]]:
+        # Anything but plain lists (e.g. an empty mapping) keeps the original scan
+        if not status_mapping or not all(isinstance(variations, list) for variations in status_mapping.values()):
+            return None
+        lookup = {}
+        for standard_status, variations in status_mapping.items():
+            for variation in variations:
+                if isinstance(variation, str):
+                    # The first standard status listing a variation wins, as in the scan
+                    lookup.setdefault(variation.casefold() if casefold else variation, standard_status)
+        return lookup
+
+
+# ------------------------------
+#         Data Quality
+# ------------------------------
+
+
+class DataQuality:
+    """
+    Per (model, field, reason) counters of defaulted and rejected values.
+    Only the first log_first occurrences of each counter and then one in
+    log_every are logged. Rejected records are appended to a JSONL
+    quarantine file together with their error and the id of the run that
+    rejected them, or re-raised when on_error is "raise".
+    """
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+        self.on_error = "quarantine"
+        self.log_first = 5
+        self.log_every = 10000
+        self.quarantine_path: Optional[Path] = None
+        self.quarantine: Optional[TextIO] = None
+        self.run_id: Optional[str] = None
+        # While set, counts are collected here to be replayed later instead of recorded
+        self.deferred: Optional[List[Tuple[Any, ...]]] = None
+
+    def configure(self, config: ConfigLoader):
+        settings = config.get("quality", {}) or {}
+        self.on_error = settings.get("on_error", "quarantine")
+        if self.on_error not in ("quarantine", "raise"):
+            raise ValueError(f"Unknown on_error policy: '{self.on_error}'")
+        self.log_first = settings.get("log_first", 5)
+        self.log_every = settings.get("log_every", 10000)
+        self.counts = Counter()
+
+    def count(self, model: str, field: str, reason: str, value: Any = None):
+        if self.deferred is not None:
+            self.deferred.append((model, field, reason, value))
+            return
+        key = (model, field, reason)
+        self.counts[key] += 1
+        seen = self.counts[key]
+        if seen <= self.log_first or seen % self.log_every == 0:
+            logger.warning(f"{model}.{field} {reason}: {value!r} ({seen} so far)")
+
+    def reject(self, model: str, record: Any, error: Exception):
+        """Count a record that failed validation and quarantine it, or raise under on_error: raise."""
+        if self.on_error == "raise":
+            raise error
+        fields = [e["loc"][0] for e in error.errors() if e["loc"]] if isinstance(error, ValidationError) else []
+        for field in dict.fromkeys(fields) or ["record"]:
+            self.count(model, field, "rejected", str(error))
+        if self.quarantine_path is not None:
+            if self.quarantine is None:
+                # Only created once something is rejected
+                self.quarantine_path.parent.mkdir(parents=True, exist_ok=True)
+                self.quarantine = self.quarantine_path.open("a", encoding="utf-8")
+            entry = {"run": self.run_id, "model": model, "error": str(error), "record": record}
+            self.quarantine.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+
+    def open_quarantine(self, path: Path, size: Optional[int] = None):
+        """
+        Append the rejects of a new run to the quarantine file. Earlier runs'
+        entries are kept; when resuming from a checkpoint, only what was
+        written past its size bytes is dropped, as it will be rejected again.
+        """
+        if size is not None and path.exists() and path.stat().st_size > size:
+            with path.open("ab") as file:
+                file.truncate(size)
+        self.quarantine_path = path
+        self.run_id = f"{datetime.now().strftime('%Y%m%dT%H%M%S.%f')}-{os.getpid()}"
+
+    def quarantine_bytes(self) -> int:
+        """Flush the quarantine file to disk and return its size."""
+        if self.quarantine is not None:
+            self.quarantine.flush()
+            os.fsync(self.quarantine.fileno())
+        return self.quarantine_path.stat().st_size if self.quarantine_path is not None and self.quarantine_path.exists() else 0
+
+    def close_quarantine(self):
+        if self.quarantine is not None:
+            self.quarantine.close()
+        self.quarantine = None
+        self.quarantine_path = None
+        self.run_id = None
+
+    def defer(self) -> List[Tuple[Any, ...]]:
+        """Collect counts instead of recording them until resume(); returns the collected list."""
+        self.deferred = []
+        return self.deferred
+
+    def resume(self):
+        self.deferred = None
+
+    def drain(self) -> Counter:
+        """Hand over the counters collected so far (in a worker) and start again from zero."""
+        counts, self.counts = self.counts, Counter()
+        return counts
+
+    def merge(self, counts: Counter):
+        self.counts.update(counts)
+
+    def summary(self) -> str:
+        if not self.counts:
+            return "Data quality: no values defaulted or rejected"
+        lines = [f"  {model}.{field} {reason}: {seen}" for (model, field, reason), seen in sorted(self.counts.items())]
+        return "Data quality:\n" + "\n".join(lines)
+
+
+data_quality = DataQuality()
+
+# ------------------------------
+#       Instrumentation
+# ------------------------------
+
+
+class PipelineProfile:
+    """
+    Wall time, CPU time and call counts per pipeline stage (decode, alias,
+    validation, dedupe, write), plus the optional tracemalloc peak. Stages
+    nest: time spent in an inner stage, such as the decoding pulled by
+    validation, is only charged to the inner one, so the stages add up to
+    the instrumented total. Stages measured in worker processes are
+    reported separately with a " (workers)" suffix, and the writes of the
+    staged pipeline's writer thread, which overlap the other stages, as
+    "write (writer thread)".
+    """
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.stats: Dict[str, List[float]] = {}
+        # Nesting is tracked per thread; the writer thread charges its own stage
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.started: Optional[Tuple[float, float]] = None
+        self.elapsed: Tuple[float, float] = (0.0, 0.0)
+        self.memory_peak: Optional[int] = None
+        self.tracing = False
+
+    @classmethod
+    def from_config(cls, config: ConfigLoader) -> Optional["PipelineProfile"]:
+        settings = config.get("profile", {}) or {}
+        if not settings.get("enabled", False):
+            return None
+        return cls(settings.get("tracemalloc", False))
+
+    def start(self):
+        if self.started is not None:
+            return
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.tracing = True
+        self.started = (time.perf_counter(), time.process_time())
+
+    def stop(self):
+        if self.started is None:
+            return
+        self.elapsed = (time.perf_counter() - self.started[0], time.process_time() - self.started[1])
+        self.started = None
+        if self.trace_memory and tracemalloc.is_tracing():
+            self.memory_peak = tracemalloc.get_traced_memory()[1]
+            if self.tracing:
+                tracemalloc.stop()
+                self.tracing = False
+
+    @property
+    def stack(self) -> List[List[float]]:
+        try:
+            return self.local.stack
+        except AttributeError:
+            self.local.stack = []
+            return self.local.stack
+
+    def _enter(self) -> Tuple[float, float]:
+        self.stack.append([0.0, 0.0])
+        # Stages are charged the CPU time of the thread running them, the total that of the process
+        return time.perf_counter(), time.thread_time()
+
+    def _exit(self, stage: str, wall_start: float, cpu_start: float, calls: int = 1):
+        wall = time.perf_counter() - wall_start
+        cpu = time.thread_time() - cpu_start
+        stack = self.stack
+        child_wall, child_cpu = stack.pop()
+        with self.lock:
+            stats = self.stats.setdefault(stage, [0.0, 0.0, 0])
+            stats[0] += wall - child_wall
+            stats[1] += cpu - child_cpu
+            stats[2] += calls
+        if stack:
+            stack[-1][0] += wall
+            stack[-1][1] += cpu
+
+    def timed_call(self, stage: str, function: Callable) -> Callable:
+        """Wrap a function so each call is charged to the stage."""
+        def timed(*args, **kwargs):
+            started = self._enter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self._exit(stage, *started)
+        return timed
+
+    def timed_iter(self, stage: str, iterable: Iterable[Any]) -> Iterator[Any]:
+        """Charge the time spent producing each item to the stage."""
+        iterator = iter(iterable)
+        while True:
+            started = self._enter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self._exit(stage, *started, calls=0)
+                return
+            except BaseException:
+                self._exit(stage, *started)
+                raise
+            self._exit(stage, *started)
+            yield item
+
+    def drain(self) -> Dict[str, List[float]]:
+        """Hand over the stage stats collected so far (in a worker) and start again from zero."""
+        stats, self.stats = self.stats, {}
+        return stats
+
+    def merge(self, stats: Dict[str, List[float]], suffix: str = " (workers)"):
+        with self.lock:
+            for stage, (wall, cpu, calls) in stats.items():
+                merged = self.stats.setdefault(stage + suffix, [0.0, 0.0, 0])
+                merged[0] += wall
+                merged[1] += cpu
+                merged[2] += calls
+
+    def report(self) -> Dict[str, Any]:
+        wall, cpu = self.elapsed
+        return {
+            "wall_seconds": wall,
+            "cpu_seconds": cpu,
+            "records": self.stats.get("decode", [0.0, 0.0, 0])[2],
+            "tracemalloc_peak_bytes": self.memory_peak,
+            "stages": {
+                stage: {"wall_seconds": stage_wall, "cpu_seconds": stage_cpu, "calls": calls}
+                for stage, (stage_wall, stage_cpu, calls) in self.stats.items()
+            },
+        }
+
+    def summary(self) -> str:
+        wall, cpu = self.elapsed
+        lines = [f"Profile: {wall:.3f}s wall, {cpu:.3f}s CPU"]
+        for stage, (stage_wall, stage_cpu, calls) in sorted(self.stats.items(), key=lambda item: -item[1][0]):
+            per_call = stage_wall / calls * 1e6 if calls else 0.0
+            lines.append(f"  {stage:<22} {stage_wall:>9.3f}s wall {stage_cpu:>9.3f}s CPU {calls:>10} calls {per_call:>9.1f} us/call")
+        if self.memory_peak is not None:
+            lines.append(f"  tracemalloc peak {self.memory_peak / 2**20:.1f} MiB")
+        return "\n".join(lines)
+
+    def save(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", encoding="utf-8") as file:
+            json.dump(self.report(), file, indent=2)
+
+    def finish(self, config: ConfigLoader):
+        """Stop the clocks, log the summary and write the JSON report from the profile config."""
+        self.stop()
+        logger.info(self.summary())
+        settings = config.get("profile", {}) or {}
+        self.save(Path(settings.get("report", "data_transformation/outputs/profile.json")))
+
+
+# Set in worker processes when profiling is enabled
+_worker_profile: Optional[PipelineProfile] = None
+
+
+def _instrument_models(profile: PipelineProfile):
+    """Charge alias resolution to its own stage; undone by the next set_config."""
+    for model in (Transaction, ItemDetail):
+        model.shape_cache.map = profile.timed_call("alias", model.shape_cache.map)
+
+
+def _instrument_outputs(profile: PipelineProfile, transaction_writer: Any, detail_writer: Any, store: Any):
+    for writer in (transaction_writer, detail_writer):
+        writer.writerow = profile.timed_call("write", writer.writerow)
+        if isinstance(writer, _BatchedWriter):
+            # Staged: "write" is only the hand-over, the rows are written on the writer thread
+            target = writer.writer
+            method = "writerows" if hasattr(target, "writerows") else "writerow"
+            setattr(target, method, profile.timed_call("write (writer thread)", getattr(target, method)))
+    store.add = profile.timed_call("dedupe", store.add)
+
+
+def _timed_validation(
+    profile: PipelineProfile, validated: Iterable[Tuple[Dict[str, Any], Iterable[Dict[str, Any]]]]
+) -> Iterator[Tuple[Dict[str, Any], Iterable[Dict[str, Any]]]]:
+    for transaction_data, details in profile.timed_iter("validation", validated):
+        # Serial details are validated lazily while the writer consumes them
+        yield transaction_data, profile.timed_iter("validation", details)
+
 # ------------------------------
 #        Pydantic Models
 # ------------------------------
 
 class Transaction(BaseModel):
     config: ClassVar[ConfigLoader] = None
+    # Model field -> config key listing its aliases
+    alias_fields: ClassVar[Dict[str, str]] = {
+        "transaction_id": "id_fields",
+        "customer_name": "name_fields",
+        "purchase_date": "date_fields",
+        "total_amount": "amount_fields",
+        "status": "status_fields",
+    }
     alias_map: ClassVar[Dict[str, List[str]]] = {}
+    alias_plan: ClassVar[AliasPlan] = ()
+    shape_cache: ClassVar[Optional[ShapeCache]] = None
+    date_parser: ClassVar[Optional[DateParser]] = None
+    status_lookup: ClassVar[Optional[Dict[str, str]]] = None
+    status_casefold: ClassVar[bool] = False
 
     transaction_id: int
     customer_name: Optional[str] = "Unknown"
@@ -53,50 +767,27 @@ class Transaction(BaseModel):
     @classmethod
     def set_config(cls, config: ConfigLoader):
         cls.config = config
-        cls.alias_map = {
-            "transaction_id": config.get("id_fields", []),
-            "customer_name": config.get("name_fields", []),
-            "purchase_date": config.get("date_fields", []),
-            "total_amount": config.get("amount_fields", []),
-            "status": config.get("status_fields", [])
-        }
+        compiled = config.compiled
+        cls.alias_map = compiled.alias_maps["Transaction"]
+        cls.alias_plan = compiled.alias_plans["Transaction"]
+        cls.shape_cache = ShapeCache(cls.alias_plan, config.get("shape_cache_size", 128))
+        cls.date_parser = DateParser(compiled.date_formats, config.get("date_cache_size", 4096), compiled.date_analysis)
+        cls.status_lookup = compiled.status_lookup
+        cls.status_casefold = compiled.status_casefold
 
     @model_validator(mode="before")
     @classmethod
     def apply_aliases(cls, values: Dict[str, Any]) -> Dict[str, Any]:
         """Apply aliases dynamically to map input data to model fields."""
-        if not cls.alias_map:
+        if cls.shape_cache is None:
             return values
-
-        mapped_values = {}
-        for field_name, aliases in cls.alias_map.items():
-            for alias in aliases:
-                if '.' in alias:
-                    # Handle nested dictionary alias
-                    nested_keys = alias.split('.')
-                    nested_value = values
-                    try:
-                        for key in nested_keys:
-                            nested_value = nested_value[key]
-                        mapped_values[field_name] = nested_value
-                        break  # Stop at the first valid nested alias
-                    except (TypeError, KeyError):
-                        continue  # Move on to the next alias
-                elif alias in values:
-                    mapped_values[field_name] = values[alias]
-                    break  # Stop at the first matching alias
-
-            # If no alias matched, retain the original field value if it exists
-            if field_name not in mapped_values and field_name in values:
-                mapped_values[field_name] = values[field_name]
-
-        return mapped_values  
+        return cls.shape_cache.map(values)
 
     # Implement Class atributes if needed
     @field_validator("transaction_id", "customer_name", "purchase_date", "total_amount", "status", mode="before")
     def unified_validator(cls, value, info):
         if value is None:
-            logger.warning(f"Field '{info.field_name}' is None, defaulting to appropriate value.")
+            data_quality.count("Transaction", info.field_name, "missing")
             if info.field_name == "transaction_id":
                 return 0  # Default ID if missing
             if info.field_name == "customer_name":
@@ -134,39 +825,60 @@ class Transaction(BaseModel):
         # Normalize customer_name
         if info.field_name == "customer_name" and isinstance(value, str):
             try:
-                return re.sub(r'\s+', ' ', value.strip())
+                return sys.intern(re.sub(r'\s+', ' ', value.strip()))
             except ValueError:
                 raise ValueError(f"Unable to parse '{value}' as a str")
 
         # Normalize purchase_date
         if info.field_name == "purchase_date" and isinstance(value, str):
-            date_formats = cls.config.get("date_formats", [])
-            for fmt in date_formats:
-                try:
-                    return datetime.strptime(value, fmt).date()
-                except ValueError:
-                    continue
-            raise ValueError(f"Unable to parse '{value}' as a date")
+            return cls.date_parser.parse(value)
 
         # Parse total_amount
         if info.field_name == "total_amount" and isinstance(value, str):
             try:
-                return format_price(value)
+                amount = format_price(value)
+                if amount == 0.0 and is_unparseable_price(value):
+                    data_quality.count("Transaction", "total_amount", "unparseable", value)
+                return amount
             except ValueError:
                 raise ValueError(f"Unable to parse '{value}' as a float")
 
         # Map status values to standard form
         if info.field_name == "status" and isinstance(value, str):
-            status_mapping = cls.config.get("status_mapping", {})
-            for standard_status, variations in status_mapping.items():
-                value = value.strip()
-                if value in variations:
-                    return standard_status
-            return value
+            return cls.map_status(value)
 
         return value
 
+    @classmethod
+    def map_status(cls, value: str) -> str:
+        """Map a raw status onto its standard form from status_mapping."""
+        if cls.status_lookup is not None:
+            value = value.strip()
+            standard_status = cls.status_lookup.get(value.casefold() if cls.status_casefold else value)
+            # Unmapped statuses repeat as much as mapped ones; share one string per distinct value
+            return sys.intern(value) if standard_status is None else standard_status
+
+        status_mapping = cls.config.get("status_mapping", {})
+        for standard_status, variations in status_mapping.items():
+            value = value.strip()
+            if value in variations:
+                return standard_status
+        return sys.intern(value)
+
 class ItemDetail(BaseModel):
+    config: ClassVar[ConfigLoader] = None
+    # Model field -> config key listing its aliases
+    alias_fields: ClassVar[Dict[str, str]] = {
+        "details_id": "details_id_fields",
+        "transaction_id": "transaction_id_fields",
+        "item": "item_fields",
+        "quantity": "quantity_fields",
+        "price": "price_fields",
+    }
+    alias_map: ClassVar[Dict[str, List[str]]] = {}
+    alias_plan: ClassVar[AliasPlan] = ()
+    shape_cache: ClassVar[Optional[ShapeCache]] = None
+
     details_id: int
     transaction_id: int
     item: str
@@ -178,48 +890,23 @@ class ItemDetail(BaseModel):
     @classmethod
     def set_config(cls, config: ConfigLoader):
         cls.config = config
-        cls.alias_map = {
-            "details_id": config.get("details_id_fields", []),
-            "transaction_id": config.get("transaction_id_fields", []),
-            "item": config.get("item_fields", []),
-            "quantity": config.get("quantity_fields", []),
-            "price": config.get("price_fields", [])
-        }
+        compiled = config.compiled
+        cls.alias_map = compiled.alias_maps["ItemDetail"]
+        cls.alias_plan = compiled.alias_plans["ItemDetail"]
+        cls.shape_cache = ShapeCache(cls.alias_plan, config.get("shape_cache_size", 128))
 
     @model_validator(mode="before")
     @classmethod
     def apply_aliases(cls, values: Dict[str, Any]) -> Dict[str, Any]:
         """Apply aliases dynamically to map input data to model fields."""
-        if not cls.alias_map:
+        if cls.shape_cache is None:
             return values
-
-        mapped_values = {}
-        for field_name, aliases in cls.alias_map.items():
-            for alias in aliases:
-                if '.' in alias:
-                    nested_keys = alias.split('.')
-                    nested_value = values
-                    try:
-                        for key in nested_keys:
-                            nested_value = nested_value[key]
-                        mapped_values[field_name] = nested_value
-                        break
-                    except (TypeError, KeyError):
-                        continue
-                elif alias in values:
-                    mapped_values[field_name] = values[alias]
-                    break
-
-            # Fallback: if no alias matched, use the direct field value if it exists
-            if field_name not in mapped_values and field_name in values:
-                mapped_values[field_name] = values[field_name]
-
-        return mapped_values
+        return cls.shape_cache.map(values)
 
     @field_validator("details_id", "transaction_id", "item", "quantity", "price", mode="before")
     def unified_validator(cls, value, info):
         if value is None:
-            logger.warning(f"Field '{info.field_name}' is None, defaulting to appropriate value.")
+            data_quality.count("ItemDetail", info.field_name, "missing")
             if info.field_name == "details_id":
                 return 0
             if info.field_name == "transaction_id":
@@ -237,7 +924,7 @@ class ItemDetail(BaseModel):
                 cleaned_value = re.sub(r'[^\d]', '', value.strip())
                 if cleaned_value.isdigit():
                     return int(cleaned_value)
-                logger.warning(f"Invalid ID for '{info.field_name}': '{value}', defaulting to 0")
+                data_quality.count("ItemDetail", info.field_name, "invalid", value)
                 return 0
             if isinstance(value, int):
                 return value
@@ -245,8 +932,8 @@ class ItemDetail(BaseModel):
         # Validar `item`
         if info.field_name == "item":
             if isinstance(value, str):
-                return value.strip()
-            logger.warning(f"Invalid item name: '{value}', defaulting to 'Unknown Item'")
+                return sys.intern(value.strip())
+            data_quality.count("ItemDetail", "item", "invalid", value)
             return "Unknown Item"
 
         # Validar `quantity`
@@ -254,133 +941,2502 @@ class ItemDetail(BaseModel):
             try:
                 return int(value)
             except (ValueError, TypeError):
-                logger.warning(f"Invalid quantity: '{value}', defaulting to 1")
+                data_quality.count("ItemDetail", "quantity", "invalid", value)
                 return 1
 
         # Validar `price`
         if info.field_name == "price":
             try:
-                return format_price(value)
+                price = format_price(value)
+                if price == 0.0 and is_unparseable_price(value):
+                    data_quality.count("ItemDetail", "price", "unparseable", value)
+                return price
             except ValueError:
-                logger.warning(f"Invalid price: '{value}', defaulting to 0.0")
+                data_quality.count("ItemDetail", "price", "invalid", value)
                 return 0.0
 
         return value
 
+# ------------------------------
+#      Price Normalization
+# ------------------------------
+
+_price_noise = re.compile(r"[^\d,\.]")
+# Raw price literal -> parsed float; exports repeat the same prices constantly
+_price_cache: Dict[str, float] = {}
+# Cached literals that could not be parsed and were defaulted to 0.0
+_unparseable_prices: set = set()
+PRICE_CACHE_SIZE = 1 << 16
+# Below this many values NumPy's call overhead outweighs the vectorized math
+_NUMPY_MIN_BATCH = 16
+
+
+def _clean_price_literal(value: str) -> Tuple[str, bool]:
+    """
+    Strip currency symbols and thousand separators from a price literal.
+    Returns the numeric text and whether it should be rounded: literals with
+    no dot or comma are plain numbers and are returned as is.
+    """
+    # Remove any non-digit and non-dot/comma characters
+    value = _price_noise.sub("", value)
+
+    # Identify the last occurrence of dot and comma
+    last_dot = value.rfind('.')
+    last_comma = value.rfind(',')
+
+    # Determine which one is the decimal separator (whichever comes last)
+    if last_dot > last_comma:
+        # Dot is the decimal separator, remove commas (thousand separators)
+        return value.replace(',', ''), True
+    if last_comma > last_dot:
+        # Comma is the decimal separator, remove dots (thousand separators)
+        return value.replace('.', '').replace(',', '.'), True
+    return value, False
+
+
+def _round_prices(values: np.ndarray) -> np.ndarray:
+    """
+    Vectorized round(value, 2). np.round rounds the scaled binary value, which
+    disagrees with Python's correctly rounded round() on near-halfway cases,
+    so those (and non-finite or huge values) are re-rounded one by one.
+    """
+    rounded = np.round(values, 2)
+    with np.errstate(invalid="ignore"):
+        scaled = values * 100
+        halfway = np.abs(scaled - np.floor(scaled) - 0.5) <= 1e-6
+    for i in np.flatnonzero(halfway | ~(np.abs(values) < 1e13)):
+        rounded[i] = round(float(values[i]), 2)
+    return rounded
+
+
+def _parse_price_literals(literals: List[str]) -> List[float]:
+    """Convert and round raw price literals, remembering the ones that fail."""
+    cleaned = [_clean_price_literal(literal) for literal in literals]
+    parsed = [0.0] * len(cleaned)
+
+    if len(cleaned) >= _NUMPY_MIN_BATCH:
+        try:
+            floats = np.array([text for text, _ in cleaned], dtype=np.float64)
+        except ValueError:
+            floats = None  # At least one literal is invalid, convert one by one
+        if floats is not None:
+            rounded = _round_prices(floats)
+            return [
+                rounded.item(i) if needs_rounding else floats.item(i)
+                for i, (_, needs_rounding) in enumerate(cleaned)
+            ]
+
+    for i, (text, needs_rounding) in enumerate(cleaned):
+        try:
+            parsed[i] = round(float(text), 2) if needs_rounding else float(text)
+        except ValueError:
+            _unparseable_prices.add(literals[i])
+    return parsed
+
+
+def format_prices(values: Iterable[Any]) -> List[float]:
+    """
+    Batch version of format_price for a whole column of raw prices.
+    String literals are resolved through a bounded cache and the misses are
+    converted and rounded together; numeric values are rounded in one
+    vectorized pass. Unparseable or unsupported values become 0.0.
+    """
+    values = list(values)
+    results = [0.0] * len(values)
+    misses: Dict[str, List[int]] = {}
+    numeric_positions = []
+
+    for i, value in enumerate(values):
+        if isinstance(value, str):
+            cached = _price_cache.get(value)
+            if cached is not None:
+                results[i] = cached
+            else:
+                misses.setdefault(value, []).append(i)
+        elif isinstance(value, (float, int)):
+            numeric_positions.append(i)
+
+    if misses:
+        if len(_price_cache) + len(misses) > PRICE_CACHE_SIZE:
+            # Hits already taken from the cache must still read as unparseable
+            hits = {value for value in values if value.__class__ is str and value in _unparseable_prices}
+            _price_cache.clear()
+            _unparseable_prices.clear()
+            _unparseable_prices.update(hits)
+        for literal, parsed in zip(misses, _parse_price_literals(list(misses))):
+            _price_cache[literal] = parsed
+            for i in misses[literal]:
+                results[i] = parsed
+
+    if len(numeric_positions) >= _NUMPY_MIN_BATCH:
+        rounded = _round_prices(np.array([values[i] for i in numeric_positions], dtype=np.float64))
+        for i, price in zip(numeric_positions, rounded.tolist()):
+            results[i] = price
+    else:
+        for i in numeric_positions:
+            results[i] = round(float(values[i]), 2)
+
+    return results
+
+
+def is_unparseable_price(value: Any) -> bool:
+    """Whether the last format_price(s) call defaulted this literal to 0.0 because it could not be parsed."""
+    return value.__class__ is str and value in _unparseable_prices
+
+
 def format_price(value: Any) -> float:
     """
     Format price to two decimal places and remove trailing zeros.
     Detects the most likely decimal separator.
     Returns 0.0 if unable to parse the input.
     """
-    try:
-        # Convert directly if it's already a float or int
-        if isinstance(value, (float, int)):
-            return round(float(value), 2)
+    return format_prices((value,))[0]
 
-        # Convert from string representation
-        if isinstance(value, str):
-            # Remove any non-digit and non-dot/comma characters
-            value = re.sub(r"[^\d,\.]", "", value)
-            
-            # Identify the last occurrence of dot and comma
-            last_dot = value.rfind('.')
-            last_comma = value.rfind(',')
-
-            # Determine which one is the decimal separator (whichever comes last)
-            if last_dot > last_comma:
-                # Dot is the decimal separator, remove commas (thousand separators)
-                value = value.replace(',', '')
-            elif last_comma > last_dot:
-                # Comma is the decimal separator, remove dots (thousand separators)
-                value = value.replace('.', '').replace(',', '.')
-            elif last_comma == last_dot == -1:
-                # No dot or comma found, return as a plain number
-                return float(value)
-
-            return round(float(value), 2)
-
-    except (ValueError, TypeError):
-        logger.warning(f"Unable to parse '{value}' as a float. Defaulting to 0.0")
-        return 0.0  # Return a default value on failure
-
-    # In case none of the above worked, return 0.0 as a fallback
-    return 0.0
+# ------------------------------
+#     Streaming JSON Reader
+# ------------------------------
 
-def parse_json_to_csv(
-    json_data: List[Dict[str, Any]],
-    transaction_file: Path,
-    detail_file: Path,
-    config: ConfigLoader,
-):
-    pass  # To implement
+_json_decoder = json.JSONDecoder()
+_json_whitespace = re.compile(r"\s*")
+# Longest tail a value cut off outside a string leaves undecoded: "-Infinit"
+_JSON_PARTIAL_TAIL = 8
 
-    Transaction.set_config(config)
-    ItemDetail.set_config(config)
 
-    transaction_file.parent.mkdir(parents=True, exist_ok=True)
-    detail_file.parent.mkdir(parents=True, exist_ok=True)
+class _JsonStream:
+    """Character buffer over a text file that decodes one JSON value at a time."""
 
-    transaction_fields = config.get("transaction_fields", ["transaction_id", "customer_name", "purchase_date", "total_amount", "status"])
-    detail_fields = config.get("detail_fields", ["details_id", "transaction_id", "item", "quantity", "price"])
+    def __init__(self, file: TextIO, chunk_size: int, start_offset: int = 0):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        # UTF-8 bytes of input dropped from the front of the buffer so far
+        self.consumed_bytes = start_offset
 
-    details_id_counter = 1
+    def _read(self):
+        # Drop the consumed prefix so the buffer only holds the pending record
+        if self.pos:
+            self.consumed_bytes += len(self.buffer[:self.pos].encode("utf-8"))
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        chunk = self.file.read(self.chunk_size)
+        if chunk:
+            self.buffer += chunk
+        else:
+            self.eof = True
 
-    with transaction_file.open("w", newline="", encoding="utf-8") as tf, detail_file.open("w", newline="", encoding="utf-8") as df:
-        transaction_writer = csv.DictWriter(tf, fieldnames=transaction_fields)
-        detail_writer = csv.DictWriter(df, fieldnames=detail_fields)
+    def peek(self) -> str:
+        """Skip whitespace and return the next character, or '' at end of input."""
+        while True:
+            self.pos = _json_whitespace.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if self.eof:
+                return ""
+            self._read()
 
-        transaction_writer.writeheader()
-        detail_writer.writeheader()
+    def advance(self, count: int = 1):
+        self.pos += count
 
-        # Set to store unique transaction data
-        written_transactions = set()
+    def decode(self) -> Any:
+        """Decode the next JSON value, reading more input until it is complete."""
+        self.peek()
+        while True:
+            try:
+                value, end = _json_decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                # Only a value cut off by the end of the buffer can be completed by
+                # reading on; an error anywhere else is in the input itself
+                cut_off = e.msg.startswith("Unterminated string") or len(self.buffer) - e.pos <= _JSON_PARTIAL_TAIL
+                if self.eof or not cut_off:
+                    raise
+                self._read()
+                continue
+            # A number or literal ending exactly at the buffer edge may be cut short
+            if end == len(self.buffer) and not self.eof:
+                self._read()
+                continue
+            self.pos = end
+            return value
 
-        for record in json_data:
-            transaction = Transaction(**record)
-            transaction_data = transaction.model_dump()
+    def mark(self) -> Tuple[int, str, int]:
+        """Cheap snapshot of the current position, turned into bytes only when needed."""
+        return self.consumed_bytes, self.buffer, self.pos
 
-            # Convert the transaction data to a tuple for storing in the set
-            transaction_tuple = tuple((k, v) for k, v in transaction_data.items() if k not in {"transaction_id", "customer_name"})
+    @staticmethod
+    def byte_offset(mark: Tuple[int, str, int]) -> int:
+        consumed_bytes, buffer, pos = mark
+        return consumed_bytes + len(buffer[:pos].encode("utf-8"))
 
-            # Avoid duplicated rows
-            if transaction_tuple not in written_transactions:
-                transaction_writer.writerow(transaction_data)
-                written_transactions.add(transaction_tuple)
+    def error(self, message: str) -> json.JSONDecodeError:
+        return json.JSONDecodeError(message, self.buffer, self.pos)
 
-                details = record.get("items", [])
-                for detail in details:
-                    detail = ItemDetail(**detail, details_id=details_id_counter, transaction_id=transaction.transaction_id)
-                    detail_data = detail.model_dump()
-                    detail_writer.writerow(detail_data)
 
-                    details_id_counter += 1
+class JsonRecordReader:
+    """
+    Incrementally yield records from a JSON array or an NDJSON/JSONL stream.
+    Only the record being decoded is kept in memory, so rows can be written
+    as soon as they are parsed regardless of the input size.
 
-def process_single_file(filename: Path, transaction_file: Path, details_file: Path, config: ConfigLoader):
-    with filename.open("r", encoding="utf-8") as file:
-        json_data = json.load(file)
+    After each record, last_mark locates the end of that record; byte_offset()
+    converts it to a file offset from which a reader created with
+    start_offset and in_array can resume. Files must be opened with
+    newline="" so offsets match the bytes on disk.
+    """
 
-    parse_json_to_csv(json_data, transaction_file, details_file, config)
+    def __init__(self, file: TextIO, chunk_size: int = 1 << 16, start_offset: int = 0, in_array: Optional[bool] = None):
+        self.stream = _JsonStream(file, chunk_size, start_offset)
+        # None until the first character is seen; resuming readers already know
+        self.in_array = in_array
+        self.resuming = in_array is not None
+        self.last_mark = self.stream.mark()
 
-if __name__ == "__main__":
-    start = time.time()
+    def byte_offset(self, mark: Optional[Tuple[int, str, int]] = None) -> int:
+        return _JsonStream.byte_offset(self.last_mark if mark is None else mark)
 
-    # ------------------------------
-    #      Load Configuration
-    # ------------------------------
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        stream = self.stream
+        if not self.resuming:
+            self.in_array = stream.peek() == "["
 
-    config = ConfigLoader(Path("data_transformation/config.yml"))
-    Transaction.set_config(config)
-    ItemDetail.set_config(config)
+        if not self.in_array:
+            # NDJSON / JSONL: whitespace separated top-level values
+            while stream.peek():
+                record = stream.decode()
+                self.last_mark = stream.mark()
+                yield record
+            return
 
-    input_files = config.get("files", {}).get("input", [])
-    output_file = Path(
-        config.get("files", {}).get("transaction_output", "transactions.csv")
-    )
-    details_file = Path(config.get("files", {}).get("details_output", "details.csv"))
+        expect_separator = self.resuming
+        if not self.resuming:
+            stream.advance()
+            if stream.peek() == "]":
+                stream.advance()
+                expect_separator = None
+        while expect_separator is not None:
+            if expect_separator:
+                separator = stream.peek()
+                stream.advance()
+                if separator == "]":
+                    break
+                if separator != ",":
+                    raise stream.error("Expecting ',' delimiter")
+            record = stream.decode()
+            self.last_mark = stream.mark()
+            yield record
+            expect_separator = True
 
-    if isinstance(input_files, str):
-        input_files = [input_files]  # Wrap single file in a list if input is a string
+        if stream.peek():
+            raise stream.error("Extra data")
+
+
+def iter_json_records(file: TextIO, chunk_size: int = 1 << 16) -> Iterator[Dict[str, Any]]:
+    """Incrementally yield records from a JSON array or an NDJSON/JSONL stream."""
+    return iter(JsonRecordReader(file, chunk_size))
+
+
+# ------------------------------
+#      Record Validation
+# ------------------------------
+
+# Detail rows are validated with a placeholder id; the writer assigns the real
+# details_id once it knows the parent transaction is not a duplicate.
+_PENDING_DETAILS_ID = 0
+
+
+def _model_row(model: BaseModel) -> Dict[str, Any]:
+    """
+    The field values of a validated model as a dict, equal to model_dump()
+    for these flat models. The instance's own __dict__ is handed over rather
+    than serialized into a new one; the instance is not used afterwards.
+    Rows stay dicts rather than field-order tuples: the writer assigns
+    details_id and the sinks key into them, and RowWriter's itemgetter
+    costs well under a microsecond next to validation itself.
+    """
+    return model.__dict__
+
+
+def _validate_detail(detail: Dict[str, Any], transaction_id: int) -> Dict[str, Any]:
+    return _model_row(ItemDetail(**detail, details_id=_PENDING_DETAILS_ID, transaction_id=transaction_id))
+
+
+def _items_error(items: Any) -> Optional[TypeError]:
+    if isinstance(items, list):
+        return None
+    return TypeError(f"items must be a list, not {type(items).__name__}")
+
+
+def _iter_details(items: Iterable[Dict[str, Any]], transaction_id: int) -> Iterator[Dict[str, Any]]:
+    error = _items_error(items)
+    if error is not None:
+        data_quality.reject("ItemDetail", items, error)
+        return
+    for detail in items:
+        try:
+            detail_data = _validate_detail(detail, transaction_id)
+        except Exception as e:
+            data_quality.reject("ItemDetail", detail, e)
+            continue
+        yield detail_data
+
+
+def _validate_detail_deferred(detail: Dict[str, Any], transaction_id: int) -> Tuple[Optional[Dict[str, Any]], List[Tuple[Any, ...]], Optional[Exception]]:
+    """Validate one item, holding back its data-quality counts: (detail_data or None, counts, error)."""
+    counts = data_quality.defer()
+    try:
+        return _validate_detail(detail, transaction_id), counts, None
+    except Exception as e:
+        return None, counts, e
+    finally:
+        data_quality.resume()
+
+
+def _collect_details(items: Iterable[Dict[str, Any]], transaction_id: int) -> Tuple[List[Dict[str, Any]], List[Tuple[Any, ...]]]:
+    """
+    Validate every item of a record away from the writer. Counts and
+    failures are returned as (position, counts, item, error) so
+    _replay_details reports them only for records that get written, at the
+    same point the lazy serial path would have.
+    """
+    error = _items_error(items)
+    if error is not None:
+        return [], [(0, [], items, error)]
+    details = []
+    deferred = []
+    for detail in items:
+        detail_data, counts, error = _validate_detail_deferred(detail, transaction_id)
+        if counts or error is not None:
+            deferred.append((len(details), counts, detail, error))
+        if detail_data is not None:
+            details.append(detail_data)
+    return details, deferred
+
+
+_TRUSTED_TRANSACTION_KEYS = frozenset(("transaction_id", "customer_name", "purchase_date", "total_amount", "status", "items"))
+_TRUSTED_ITEM_KEYS = frozenset(("item", "quantity", "price"))
+
+
+class TrustedSchema:
+    """
+    Fast path for records already in canonical form: the model field names
+    with values of the final types (int id, str name/date/status, numeric
+    amount, items holding only str item, int quantity and numeric price).
+    Such records skip alias resolution and the Pydantic models; the few
+    normalizations left (date parsing, status mapping, whitespace, rounding)
+    are applied directly. Anything else goes through full validation.
+
+    Every sample_every-th fast-path record is also fully validated, and the
+    first disagreement turns the fast path off for the rest of the run.
+    """
+
+    def __init__(self, sample_every: int = 1000):
+        self.sample_every = sample_every
+        self.enabled = True
+        self.fast_records = 0
+
+    @classmethod
+    def from_config(cls, config: ConfigLoader) -> Optional["TrustedSchema"]:
+        settings = config.get("trusted", {}) or {}
+        if not settings.get("enabled", False):
+            return None
+        # The canonical names must resolve to their own field, or the models would read them differently
+        for model, fields in ((Transaction, _TRUSTED_TRANSACTION_KEYS - {"items"}), (ItemDetail, _TRUSTED_ITEM_KEYS)):
+            missing = [field for field in fields if field not in model.alias_map.get(field, [])]
+            if missing:
+                logger.warning(f"Trusted fast path disabled: {model.__name__} fields {missing} are not their own alias")
+                return None
+        return cls(settings.get("sample_every", 1000))
+
+    def rows(self, record: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+        """The transaction and detail rows of a canonical record, or None when it needs full validation."""
+        if not self.enabled or record.__class__ is not dict or not record.keys() <= _TRUSTED_TRANSACTION_KEYS:
+            return None
+        try:
+            transaction_id = record["transaction_id"]
+            customer_name = record["customer_name"]
+            purchase_date = record["purchase_date"]
+            total_amount = record["total_amount"]
+            status = record["status"]
+        except KeyError:
+            return None
+        if (
+            transaction_id.__class__ is not int or customer_name.__class__ is not str or purchase_date.__class__ is not str
+            or total_amount.__class__ not in (int, float) or status.__class__ is not str
+        ):
+            return None
+
+        items = record.get("items", [])
+        if items.__class__ is not list:
+            return None
+        details = []
+        for item in items:
+            if item.__class__ is not dict or item.keys() != _TRUSTED_ITEM_KEYS:
+                return None
+            name, quantity, price = item["item"], item["quantity"], item["price"]
+            if name.__class__ is not str or quantity.__class__ is not int or price.__class__ not in (int, float):
+                return None
+            details.append({
+                "details_id": _PENDING_DETAILS_ID,
+                "transaction_id": transaction_id,
+                "item": sys.intern(name.strip()),
+                "quantity": quantity,
+                "price": round(float(price), 2),
+            })
+
+        try:
+            purchase_date = Transaction.date_parser.parse(purchase_date)
+        except ValueError:
+            return None
+        transaction_data = {
+            "transaction_id": transaction_id,
+            "customer_name": sys.intern(_whitespace_runs.sub(" ", customer_name.strip())),
+            "purchase_date": purchase_date,
+            "total_amount": float(total_amount),
+            "status": Transaction.map_status(status),
+        }
+
+        self.fast_records += 1
+        if self.sample_every and self.fast_records % self.sample_every == 0 and not self._agrees(record, transaction_data, details):
+            self.enabled = False
+            logger.warning(f"Trusted record {transaction_id} differs from full validation, validating every record from now on")
+            return None
+        return transaction_data, details
+
+    @staticmethod
+    def _agrees(record: Dict[str, Any], transaction_data: Dict[str, Any], details: List[Dict[str, Any]]) -> bool:
+        counts = data_quality.defer()
+        try:
+            expected = Transaction(**record).model_dump()
+            expected_details = [_validate_detail(item, expected["transaction_id"]) for item in record.get("items", [])]
+        except Exception:
+            return False
+        finally:
+            data_quality.resume()
+        return not counts and expected == transaction_data and expected_details == details
+
+
+# Set in worker processes when the trusted fast path is enabled
+_worker_trusted: Optional[TrustedSchema] = None
+
+
+def _validate_serial(
+    json_data: Iterable[Dict[str, Any]], trusted: Optional[TrustedSchema] = None
+) -> Iterator[Tuple[Dict[str, Any], Iterator[Dict[str, Any]]]]:
+    """
+    Yield (transaction_data, details) pairs; details are validated lazily by
+    the writer. Rejected records yield (None, ()).
+    """
+    for record in json_data:
+        if trusted is not None:
+            rows = trusted.rows(record)
+            if rows is not None:
+                yield rows
+                continue
+        try:
+            transaction = Transaction(**record)
+        except Exception as e:
+            data_quality.reject("Transaction", record, e)
+            # Rejected records keep their place so every input record yields one result
+            yield None, ()
+            continue
+        yield _model_row(transaction), _iter_details(record.get("items", []), transaction.transaction_id)
+
+
+def _init_worker(config: ConfigLoader):
+    global _worker_profile, _worker_trusted
+    Transaction.set_config(config)
+    ItemDetail.set_config(config)
+    data_quality.configure(config)
+    _worker_trusted = TrustedSchema.from_config(config)
+    _worker_profile = PipelineProfile.from_config(config)
+    if _worker_profile is not None:
+        _instrument_models(_worker_profile)
+
+
+def _validate_chunk(records: List[Dict[str, Any]]) -> List[Tuple[Any, ...]]:
+    """
+    Validate a chunk of records in a worker process.
+    Errors are returned in place as (None, record, error) rather than
+    raised, so the parent rejects them at the same record the serial path
+    would have.
+    """
+    results = []
+    for record in records:
+        if _worker_trusted is not None:
+            rows = _worker_trusted.rows(record)
+            if rows is not None:
+                results.append((*rows, []))
+                continue
+        try:
+            transaction = Transaction(**record)
+        except Exception as e:
+            results.append((None, record, e))
+            continue
+
+        # Detail counts and failures are only reported if the transaction turns out not to be a duplicate
+        details, deferred = _collect_details(record.get("items", []), transaction.transaction_id)
+        results.append((_model_row(transaction), details, deferred))
+    return results
+
+
+def _run_chunk(validate_batch: Callable, records: List[Dict[str, Any]]) -> Tuple[List[Tuple[Any, ...]], Counter, Dict[str, List[float]]]:
+    """Worker entry point: the chunk results plus the data-quality counts and stage timings they produced."""
+    if _worker_profile is None:
+        return validate_batch(records), data_quality.drain(), {}
+    results = _worker_profile.timed_call("validation", validate_batch)(records)
+    return results, data_quality.drain(), _worker_profile.drain()
+
+
+# ------------------------------
+#     Columnar Validation
+# ------------------------------
+
+_non_digits = re.compile(r'[^\d]')
+_whitespace_runs = re.compile(r'\s+')
+
+
+def _columnar_transactions(mapped: List[Optional[Dict[str, Any]]]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Apply the Transaction.unified_validator rules column by column.
+    Returns the model_dump() equivalent per row, or None for rows holding
+    anything outside the plain cases (missing, None, dicts, invalid values),
+    which are left to the Pydantic model.
+    """
+    size = len(mapped)
+    clean = [values is not None for values in mapped]
+
+    def column(field_name):
+        return [values.get(field_name, _MISSING) if values is not None else _MISSING for values in mapped]
+
+    ids = column("transaction_id")
+    for i, value in enumerate(ids):
+        if value.__class__ is str:
+            cleaned = _non_digits.sub('', value.strip())
+            if cleaned.isdigit() and cleaned.isascii():
+                ids[i] = int(cleaned)
+            else:
+                clean[i] = False
+        elif value.__class__ is not int:
+            clean[i] = False
+
+    names = column("customer_name")
+    name_aliases = Transaction.alias_map.get("customer_name", [])
+    for i, value in enumerate(names):
+        if value.__class__ is str:
+            names[i] = sys.intern(_whitespace_runs.sub(' ', value.strip()))
+        elif value is _MISSING:
+            names[i] = "Unknown"
+        elif value.__class__ is dict:
+            # Composed names: a nested alias wins as is, else first + last name
+            alias = next((alias for alias in name_aliases if alias in value), None)
+            if alias is None:
+                names[i] = f"{value.get('first_name', '')} {value.get('last_name', '')}".strip()
+            elif value[alias].__class__ is str:
+                names[i] = value[alias]
+            else:
+                clean[i] = False
+        else:
+            clean[i] = False
+
+    dates = column("purchase_date")
+    parse_date = Transaction.date_parser.parse
+    for i, value in enumerate(dates):
+        if value.__class__ is not str:
+            clean[i] = False
+            continue
+        try:
+            dates[i] = parse_date(value)
+        except ValueError:
+            clean[i] = False
+
+    amounts = column("total_amount")
+    literal_positions = []
+    for i, value in enumerate(amounts):
+        if value.__class__ is str:
+            literal_positions.append(i)
+        elif value.__class__ is float or value.__class__ is int:
+            amounts[i] = float(value)
+        else:
+            clean[i] = False
+    for i, amount in zip(literal_positions, format_prices([amounts[i] for i in literal_positions])):
+        if amount == 0.0 and is_unparseable_price(amounts[i]):
+            clean[i] = False  # Left to the model, which counts it
+        amounts[i] = amount
+
+    statuses = column("status")
+    mapped_statuses: Dict[str, str] = {}
+    for i, value in enumerate(statuses):
+        if value.__class__ is str:
+            status = mapped_statuses.get(value)
+            if status is None:
+                status = mapped_statuses[value] = Transaction.map_status(value)
+            statuses[i] = status
+        else:
+            clean[i] = False
+
+    return [
+        {
+            "transaction_id": ids[i],
+            "customer_name": names[i],
+            "purchase_date": dates[i],
+            "total_amount": amounts[i],
+            "status": statuses[i],
+        } if clean[i] else None
+        for i in range(size)
+    ]
+
+
+def _columnar_details(items: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+    """Apply the ItemDetail.unified_validator rules column by column (see _columnar_transactions)."""
+    mapped = [ItemDetail.shape_cache.map(item) for item in items]
+    clean = [
+        values["details_id"].__class__ is int and values["transaction_id"].__class__ is int
+        for values in mapped
+    ]
+
+    names = [values.get("item", _MISSING) for values in mapped]
+    for i, value in enumerate(names):
+        if value.__class__ is str:
+            names[i] = sys.intern(value.strip())
+        else:
+            clean[i] = False
+
+    quantities = [values.get("quantity", _MISSING) for values in mapped]
+    for i, value in enumerate(quantities):
+        if value.__class__ is str:
+            try:
+                quantities[i] = int(value)
+            except ValueError:
+                clean[i] = False
+        elif value.__class__ is not int:
+            clean[i] = False
+
+    prices = [values.get("price", _MISSING) for values in mapped]
+    for i, value in enumerate(prices):
+        if not (value.__class__ is str or value.__class__ is float or value.__class__ is int):
+            clean[i] = False
+    priced = [i for i in range(len(items)) if clean[i]]
+    for i, price in zip(priced, format_prices([prices[i] for i in priced])):
+        if price == 0.0 and is_unparseable_price(prices[i]):
+            clean[i] = False
+        prices[i] = price
+
+    return [
+        {
+            "details_id": mapped[i]["details_id"],
+            "transaction_id": mapped[i]["transaction_id"],
+            "item": names[i],
+            "quantity": quantities[i],
+            "price": prices[i],
+        } if clean[i] else None
+        for i in range(len(items))
+    ]
+
+
+def _plain_items(items: Any) -> bool:
+    """Whether a record's items can be handed to the columnar detail rules."""
+    return isinstance(items, list) and all(
+        isinstance(item, dict) and "details_id" not in item and "transaction_id" not in item
+        for item in items
+    )
+
+
+def _validate_columnar(records: List[Dict[str, Any]]) -> List[Tuple[Any, ...]]:
+    """
+    Columnar counterpart of _validate_chunk for trusted bulk loads.
+    Fields are normalized a whole column at a time and only rows the column
+    rules do not cover go through the Pydantic models, so the results (and
+    the errors, at the same record) match the model-per-record path.
+    """
+    mapped = [Transaction.shape_cache.map(record) if isinstance(record, dict) else None for record in records]
+    transactions = _columnar_transactions(mapped)
+
+    # Gather the items of the whole batch into one column, keyed back to their record
+    details_by_record: Dict[int, List[Optional[Dict[str, Any]]]] = {}
+    owners = []
+    items = []
+    for position, (record, transaction_data) in enumerate(zip(records, transactions)):
+        if transaction_data is None or not _plain_items(record.get("items", [])):
+            continue
+        details_by_record[position] = []
+        for item in record.get("items", []):
+            owners.append(position)
+            items.append({**item, "details_id": _PENDING_DETAILS_ID, "transaction_id": transaction_data["transaction_id"]})
+    for position, detail_data in zip(owners, _columnar_details(items)):
+        details_by_record[position].append(detail_data)
+
+    results = []
+    for position, (record, transaction_data) in enumerate(zip(records, transactions)):
+        if transaction_data is None:
+            try:
+                transaction_data = _model_row(Transaction(**record))
+            except Exception as e:
+                results.append((None, record, e))
+                continue
+
+        transaction_id = transaction_data["transaction_id"]
+        if position not in details_by_record:
+            results.append((transaction_data, *_collect_details(record.get("items", []), transaction_id)))
+            continue
+        details = []
+        deferred = []
+        for item, detail_data in zip(record.get("items", []), details_by_record[position]):
+            if detail_data is None:
+                detail_data, counts, error = _validate_detail_deferred(item, transaction_id)
+                if counts or error is not None:
+                    deferred.append((len(details), counts, item, error))
+                if detail_data is None:
+                    continue
+            details.append(detail_data)
+        results.append((transaction_data, details, deferred))
+    return results
+
+
+def _replay_details(details: List[Dict[str, Any]], deferred: List[Tuple[Any, ...]]) -> Iterator[Dict[str, Any]]:
+    written = 0
+    for position, counts, detail, error in deferred:
+        yield from details[written:position]
+        written = position
+        for count in counts:
+            data_quality.count(*count)
+        if error is not None:
+            data_quality.reject("ItemDetail", detail, error)
+    yield from details[written:]
+
+
+def _replay_results(results: List[Tuple[Any, ...]]) -> Iterator[Tuple[Dict[str, Any], Iterator[Dict[str, Any]]]]:
+    """Turn batch results back into (transaction_data, details) pairs, rejecting failed (None, record, error) ones."""
+    for transaction_data, details, deferred in results:
+        if transaction_data is None:
+            data_quality.reject("Transaction", details, deferred)
+            yield None, ()
+            continue
+        yield transaction_data, _replay_details(details, deferred)
+
+
+def _validate_batches(
+    json_data: Iterable[Dict[str, Any]], validate_batch: Callable, batch_size: int
+) -> Iterator[Tuple[Dict[str, Any], Iterator[Dict[str, Any]]]]:
+    """Validate records a batch at a time in this process and yield results in input order."""
+    records = iter(json_data)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return
+        yield from _replay_results(validate_batch(batch))
+
+
+def _worker_context():
+    """
+    Start method for worker pools. Forking copies locks held by the staged
+    pipeline's threads into the child, so workers come from a fork server
+    (or are spawned where it is unavailable) and rebuild their state in
+    _init_worker from the pickled config.
+    """
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def _validate_parallel(
+    json_data: Iterable[Dict[str, Any]], config: ConfigLoader, workers: int, chunk_size: int,
+    validate_batch: Callable = _validate_chunk, profile: Optional[PipelineProfile] = None,
+) -> Iterator[Tuple[Dict[str, Any], Iterator[Dict[str, Any]]]]:
+    """Fan record chunks out to a process pool and yield results in input order."""
+    records = iter(json_data)
+    executor = ProcessPoolExecutor(
+        max_workers=workers, mp_context=_worker_context(), initializer=_init_worker, initargs=(config,),
+    )
+    pending = deque()
+    try:
+        while True:
+            # Keep a bounded number of chunks in flight so memory stays flat
+            while len(pending) < workers * 2:
+                chunk = list(islice(records, chunk_size))
+                if not chunk:
+                    break
+                pending.append(executor.submit(_run_chunk, validate_batch, chunk))
+            if not pending:
+                return
+
+            results, counts, stats = pending.popleft().result()
+            data_quality.merge(counts)
+            if profile is not None:
+                profile.merge(stats)
+            yield from _replay_results(results)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+# ------------------------------
+#      Dedupe Stores
+# ------------------------------
+
+
+def dedupe_key(transaction_data: Dict[str, Any]) -> Tuple[Tuple[str, Any], ...]:
+    """Identity of a transaction for duplicate detection; the id and the customer name are ignored."""
+    return tuple((k, v) for k, v in transaction_data.items() if k not in {"transaction_id", "customer_name"})
+
+
+def _encode_key(key: Tuple[Tuple[str, Any], ...]) -> bytes:
+    # repr is exact for the str, float and date values a transaction holds
+    return repr(key).encode("utf-8")
+
+
+def _key_digest(encoded: bytes, size: int = 8) -> bytes:
+    return hashlib.blake2b(encoded, digest_size=size).digest()
+
+
+class TupleDedupeStore:
+    """Exact dedupe keeping every key tuple in a set; fastest, but the largest in memory."""
+
+    name = "tuple"
+
+    def __init__(self):
+        self.keys = set()
+
+    def add(self, key: Tuple[Tuple[str, Any], ...]) -> bool:
+        """Record the key and return True if it was not seen before."""
+        if key in self.keys:
+            return False
+        self.keys.add(key)
+        return True
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def memory_bytes(self) -> int:
+        # Approximate: objects shared between keys are counted once per key
+        total = sys.getsizeof(self.keys)
+        for key in self.keys:
+            total += sys.getsizeof(key)
+            for pair in key:
+                total += sys.getsizeof(pair) + sys.getsizeof(pair[1])
+        return total
+
+    def close(self):
+        self.keys = set()
+
+
+class DigestDedupeStore:
+    """
+    Keeps a 64-bit digest per key instead of the key itself. Two distinct
+    transactions collide with probability about n^2 / 2^65, i.e. roughly
+    one in 37 million for a run of a million unique transactions.
+    """
+
+    name = "digest"
+
+    def __init__(self):
+        self.digests = set()
+
+    def add(self, key: Tuple[Tuple[str, Any], ...]) -> bool:
+        digest = int.from_bytes(_key_digest(_encode_key(key)), "little")
+        if digest in self.digests:
+            return False
+        self.digests.add(digest)
+        return True
+
+    def __len__(self) -> int:
+        return len(self.digests)
+
+    def memory_bytes(self) -> int:
+        return sys.getsizeof(self.digests) + sum(sys.getsizeof(digest) for digest in self.digests)
+
+    def close(self):
+        self.digests = set()
+
+
+class SQLiteDedupeStore:
+    """
+    Exact dedupe backed by an SQLite table, for runs with more unique
+    transactions than fit in RAM. Without a path a temporary file is used
+    and removed on close.
+
+    With keep, the table survives across runs: keys only become durable on
+    commit, which tags them with a token naming the output state they match,
+    and keys added since the last commit are discarded on close.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: Optional[Path] = None, cache_kib: int = 65536, keep: bool = False):
+        self.temporary = path is None
+        self.keep = keep and not self.temporary
+        if path is None:
+            handle, path = tempfile.mkstemp(prefix="dedupe-", suffix=".sqlite")
+            os.close(handle)
+        self.path = Path(path)
+        self.connection = sqlite3.connect(str(self.path))
+        if self.keep:
+            self.connection.execute("PRAGMA journal_mode = WAL")
+            self.connection.execute("PRAGMA synchronous = NORMAL")
+        else:
+            # A scratch index: durability is not needed, it is rebuilt on every run
+            self.connection.execute("PRAGMA journal_mode = OFF")
+            self.connection.execute("PRAGMA synchronous = OFF")
+            self.connection.execute("DROP TABLE IF EXISTS seen")
+        self.connection.execute(f"PRAGMA cache_size = -{int(cache_kib)}")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS seen (key BLOB PRIMARY KEY) WITHOUT ROWID")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value)")
+        meta = dict(self.connection.execute("SELECT name, value FROM meta"))
+        self.count = meta.get("count", 0)
+        self.token: Optional[str] = meta.get("token")
+
+    def clear(self):
+        """Forget every key, committed or not."""
+        self.connection.execute("DELETE FROM seen")
+        self.connection.execute("DELETE FROM meta")
+        self.connection.commit()
+        self.count = 0
+        self.token = None
+
+    def commit(self, token: str):
+        """Make the keys added so far durable, tagged with token."""
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (("count", self.count), ("token", token))
+        )
+        self.connection.commit()
+        self.token = token
+
+    def add(self, key: Tuple[Tuple[str, Any], ...]) -> bool:
+        added = self.connection.execute("INSERT OR IGNORE INTO seen (key) VALUES (?)", (_encode_key(key),)).rowcount == 1
+        self.count += added
+        return added
+
+    def insert_new(self, encoded: bytes):
+        """Insert a key already known to be absent."""
+        self.connection.execute("INSERT INTO seen (key) VALUES (?)", (encoded,))
+        self.count += 1
+
+    def contains(self, encoded: bytes) -> bool:
+        return self.connection.execute("SELECT 1 FROM seen WHERE key = ?", (encoded,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def memory_bytes(self) -> int:
+        # Only the page cache lives in memory; the table itself is on disk
+        page_size, = self.connection.execute("PRAGMA page_size").fetchone()
+        cache_size, = self.connection.execute("PRAGMA cache_size").fetchone()
+        cache_bytes = -cache_size * 1024 if cache_size < 0 else cache_size * page_size
+        return min(cache_bytes, self.disk_bytes())
+
+    def disk_bytes(self) -> int:
+        page_size, = self.connection.execute("PRAGMA page_size").fetchone()
+        page_count, = self.connection.execute("PRAGMA page_count").fetchone()
+        return page_size * page_count
+
+    def close(self):
+        self.connection.close()
+        if self.temporary:
+            self.path.unlink(missing_ok=True)
+
+
+class BloomDedupeStore:
+    """
+    Bloom filter in front of an exact SQLite store. Keys the filter has
+    never seen are inserted without a lookup; only possible duplicates are
+    confirmed against the table, so results stay exact.
+    """
+
+    name = "bloom"
+
+    def __init__(self, capacity: int = 1000000, error_rate: float = 0.01, path: Optional[Path] = None):
+        bits = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.size = bits
+        self.hashes = max(1, round(bits / capacity * math.log(2)))
+        self.bits = bytearray((bits + 7) // 8)
+        self.exact = SQLiteDedupeStore(path)
+        self.confirmations = 0
+
+    def _positions(self, encoded: bytes) -> Iterator[int]:
+        # Double hashing: k positions from two independent 64-bit halves
+        digest = _key_digest(encoded, 16)
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: Tuple[Tuple[str, Any], ...]) -> bool:
+        encoded = _encode_key(key)
+        bits = self.bits
+        present = True
+        for position in self._positions(encoded):
+            byte, mask = position >> 3, 1 << (position & 7)
+            if not bits[byte] & mask:
+                present = False
+                bits[byte] |= mask
+        if present:
+            self.confirmations += 1
+            if self.exact.contains(encoded):
+                return False
+        self.exact.insert_new(encoded)
+        return True
+
+    def __len__(self) -> int:
+        return len(self.exact)
+
+    def memory_bytes(self) -> int:
+        return sys.getsizeof(self.bits) + self.exact.memory_bytes()
+
+    def disk_bytes(self) -> int:
+        return self.exact.disk_bytes()
+
+    def close(self):
+        self.exact.close()
+
+
+DEDUPE_BACKENDS = ("tuple", "digest", "sqlite", "bloom")
+
+
+def create_dedupe_store(config: ConfigLoader):
+    """Build the dedupe store selected by the dedupe section of the config."""
+    settings = config.get("dedupe", {}) or {}
+    backend = settings.get("backend", "tuple")
+    path = settings.get("path")
+    path = Path(path) if path else None
+    if backend == "tuple":
+        return TupleDedupeStore()
+    if backend == "digest":
+        return DigestDedupeStore()
+    if backend == "sqlite":
+        return SQLiteDedupeStore(path, settings.get("cache_kib", 65536))
+    if backend == "bloom":
+        return BloomDedupeStore(settings.get("bloom_capacity", 1000000), settings.get("bloom_error_rate", 0.01), path)
+    raise ValueError(f"Unknown dedupe backend: '{backend}'")
+
+
+def report_dedupe_store(store) -> str:
+    """One-line memory summary, scaled to a million unique transactions."""
+    count = len(store)
+    memory = store.memory_bytes()
+    per_million = memory / count * 1e6 if count else 0.0
+    summary = f"Dedupe store '{store.name}': {count} unique transactions, {memory / 2**20:.1f} MiB in memory ({per_million / 2**20:.1f} MiB per million)"
+    if hasattr(store, "disk_bytes"):
+        summary += f", {store.disk_bytes() / 2**20:.1f} MiB on disk"
+    return summary
+
+
+class IngestState:
+    """Output state shared by every input written to the same pair of CSV files."""
+
+    def __init__(self, written_transactions=None, details_id_counter: int = 1):
+        # Store of the unique transaction data written so far
+        self.written_transactions = written_transactions if written_transactions is not None else TupleDedupeStore()
+        self.details_id_counter = details_id_counter
+
+
+def _select_validation(
+    json_data: Iterable[Dict[str, Any]],
+    config: ConfigLoader,
+    workers: Optional[int] = None,
+    validation: Optional[str] = None,
+    profile: Optional[PipelineProfile] = None,
+) -> Iterator[Tuple[Dict[str, Any], Iterable[Dict[str, Any]]]]:
+    parallel = config.get("parallel", {}) or {}
+    if workers is None:
+        workers = parallel.get("workers", 1)
+    validation_config = config.get("validation", {}) or {}
+    if validation is None:
+        validation = validation_config.get("mode", "models")
+    if validation not in ("models", "columnar"):
+        raise ValueError(f"Unknown validation mode: '{validation}'")
+    validate_batch = _validate_columnar if validation == "columnar" else _validate_chunk
+
+    if workers > 1:
+        return _validate_parallel(json_data, config, workers, parallel.get("chunk_size", 2000), validate_batch, profile)
+    if validation == "columnar":
+        return _validate_batches(json_data, validate_batch, validation_config.get("batch_size", 5000))
+    return _validate_serial(json_data, TrustedSchema.from_config(config))
+
+
+def write_records(
+    validated: Iterable[Tuple[Dict[str, Any], Iterable[Dict[str, Any]]]],
+    transaction_writer: csv.DictWriter,
+    detail_writer: csv.DictWriter,
+    state: IngestState,
+    on_record: Optional[Callable[[], None]] = None,
+):
+    """
+    Write validated records, skipping duplicates and rejected (None) ones;
+    on_record runs once each input record is fully written.
+    """
+    for transaction_data, details in validated:
+        if transaction_data is not None:
+            # Convert the transaction data to a tuple for the dedupe store
+            transaction_tuple = dedupe_key(transaction_data)
+
+            # Avoid duplicated rows
+            if state.written_transactions.add(transaction_tuple):
+                transaction_writer.writerow(transaction_data)
+
+                for detail_data in details:
+                    detail_data["details_id"] = state.details_id_counter
+                    detail_writer.writerow(detail_data)
+
+                    state.details_id_counter += 1
+
+        if on_record is not None:
+            on_record()
+
+
+# ------------------------------
+#       Staged Pipeline
+# ------------------------------
+
+_END_OF_STREAM = object()
+
+
+def _put(queue: "Queue", item: Any, stop: threading.Event):
+    """Put item on a bounded queue, giving up once stop is set so a failed consumer never blocks the producer."""
+    while not stop.is_set():
+        try:
+            queue.put(item, timeout=0.1)
+            return
+        except Full:
+            continue
+
+
+def read_ahead(json_data: Iterable[Dict[str, Any]], batch_size: int = 1000, queue_size: int = 16) -> Iterator[Dict[str, Any]]:
+    """Decode records in a background thread and hand them over in batches through a bounded queue."""
+    batches = Queue(queue_size)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            records = iter(json_data)
+            while not stop.is_set():
+                batch = list(islice(records, batch_size))
+                if not batch:
+                    break
+                _put(batches, batch, stop)
+        except Exception as e:
+            # Raised again in the consuming thread, at the record where decoding failed
+            _put(batches, e, stop)
+            return
+        _put(batches, _END_OF_STREAM, stop)
+
+    reader = threading.Thread(target=produce, name="ingest-reader", daemon=True)
+    reader.start()
+    try:
+        while True:
+            batch = batches.get()
+            if batch is _END_OF_STREAM:
+                return
+            if isinstance(batch, Exception):
+                raise batch
+            yield from batch
+    finally:
+        stop.set()
+        reader.join()
+
+
+class _BatchedWriter:
+    """DictWriter look-alike handing its rows to a WriteBehind."""
+
+    def __init__(self, writer: Any, write_behind: "WriteBehind"):
+        self.writer = writer
+        self.write_behind = write_behind
+
+    def writerow(self, row: Dict[str, Any]):
+        self.write_behind.add(self.writer, row)
+
+
+class WriteBehind:
+    """
+    Writes rows from a background thread, handed over in batches of
+    (writer, row) pairs through a bounded queue. Rows reach their writers in
+    the order they were written across all wrapped writers, each run of
+    consecutive rows for the same writer in one writerows call.
+    A failed write is raised in the submitting thread at its next hand-over
+    or at close; the rows queued after it are dropped.
+    """
+
+    def __init__(self, batch_size: int = 1000, queue_size: int = 16):
+        self.batch_size = batch_size
+        self.batches = Queue(queue_size)
+        self.stop = threading.Event()
+        self.error: Optional[BaseException] = None
+        self.rows: List[Tuple[Any, Dict[str, Any]]] = []
+        self.thread = threading.Thread(target=self._run, name="ingest-writer", daemon=True)
+        self.thread.start()
+
+    def wrap(self, writer: Any) -> _BatchedWriter:
+        return _BatchedWriter(writer, self)
+
+    def add(self, writer: Any, row: Dict[str, Any]):
+        self.rows.append((writer, row))
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.error is not None:
+            raise self.error
+        if self.rows:
+            _put(self.batches, self.rows, self.stop)
+            self.rows = []
+
+    def _run(self):
+        while True:
+            batch = self.batches.get()
+            if batch is _END_OF_STREAM:
+                return
+            if self.error is not None:
+                continue
+            try:
+                for writer, rows in groupby(batch, key=itemgetter(0)):
+                    if hasattr(writer, "writerows"):
+                        writer.writerows(map(itemgetter(1), rows))
+                    else:
+                        for _, row in rows:
+                            writer.writerow(row)
+            except BaseException as e:
+                self.error = e
+
+    def close(self, flush: bool = True):
+        """Write the remaining rows (unless flush is False) and wait for the writer thread."""
+        try:
+            if flush:
+                self.flush()
+        finally:
+            _put(self.batches, _END_OF_STREAM, self.stop)
+            self.thread.join()
+        if flush and self.error is not None:
+            raise self.error
+
+
+# ------------------------------
+#      Output Sinks
+# ------------------------------
+
+
+class RowWriter:
+    """
+    DictWriter look-alike passing each row to csv.writer as the tuple of its
+    fieldnames values, without DictWriter's per-row list and key checks.
+    Missing fields are written empty; keys outside fieldnames are left out,
+    as the other sinks do.
+    """
+
+    def __init__(self, file: TextIO, fieldnames: List[str]):
+        self.fieldnames = list(fieldnames)
+        self.writer = csv.writer(file)
+        getter = itemgetter(*self.fieldnames)
+        self._values = getter if len(self.fieldnames) > 1 else lambda row: (getter(row),)
+
+    def _row(self, row: Dict[str, Any]) -> Iterable[Any]:
+        try:
+            return self._values(row)
+        except KeyError:
+            return [row.get(field, "") for field in self.fieldnames]
+
+    def writeheader(self):
+        self.writer.writerow(self.fieldnames)
+
+    def writerow(self, row: Dict[str, Any]):
+        self.writer.writerow(self._row(row))
+
+    def writerows(self, rows: Iterable[Dict[str, Any]]):
+        self.writer.writerows(map(self._row, rows))
+
+
+class CSVSink:
+    """
+    Writes transactions and item details to a pair of CSV files, replacing their content.
+
+    With atomic set, both files are written under a .tmp name and only
+    renamed over the outputs once complete and synced, so a crash never
+    leaves a half-written output behind; a failed run keeps the old ones.
+    """
+
+    def __init__(
+        self, transaction_file: Path, detail_file: Path, transaction_fields: List[str], detail_fields: List[str],
+        atomic: bool = False, buffering: int = -1,
+    ):
+        self.transaction_file = transaction_file
+        self.detail_file = detail_file
+        self.transaction_fields = transaction_fields
+        self.detail_fields = detail_fields
+        self.atomic = atomic
+        self.buffering = buffering
+
+    def _target(self, path: Path) -> Path:
+        return path.with_name(path.name + ".tmp") if self.atomic else path
+
+    def __enter__(self) -> "CSVSink":
+        self.transaction_file.parent.mkdir(parents=True, exist_ok=True)
+        self.detail_file.parent.mkdir(parents=True, exist_ok=True)
+        self.tf = self._target(self.transaction_file).open("w", buffering=self.buffering, newline="", encoding="utf-8")
+        self.df = self._target(self.detail_file).open("w", buffering=self.buffering, newline="", encoding="utf-8")
+        self.transaction_writer = RowWriter(self.tf, self.transaction_fields)
+        self.detail_writer = RowWriter(self.df, self.detail_fields)
+
+        self.transaction_writer.writeheader()
+        self.detail_writer.writeheader()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if self.atomic and exc_type is None:
+            for file in (self.tf, self.df):
+                file.flush()
+                os.fsync(file.fileno())
+        self.tf.close()
+        self.df.close()
+        if self.atomic:
+            for path in (self.transaction_file, self.detail_file):
+                if exc_type is None:
+                    os.replace(self._target(path), path)
+                else:
+                    self._target(path).unlink(missing_ok=True)
+
+
+_PARTITION_FORMATS = {"year": "%Y", "month": "%Y-%m", "day": "%Y-%m-%d"}
+
+
+class _PartitionedTableWriter:
+    """
+    DictWriter look-alike sending each row to the CSV file of its partition.
+    At most max_open files are kept open, least recently written first to
+    be closed; a closed partition is reopened in append mode.
+    """
+
+    def __init__(
+        self, directory: Path, fieldnames: List[str], partition_of: Callable[[Dict[str, Any]], str], buffering: int, max_open: int,
+    ):
+        self.directory = directory
+        self.fieldnames = fieldnames
+        self.partition_of = partition_of
+        self.buffering = buffering
+        if not isinstance(max_open, int) or max_open < 1:
+            raise ValueError(f"max_open_files must be an integer of at least 1, got {max_open!r}")
+        self.max_open = max_open
+        self.open: "OrderedDict[str, Tuple[TextIO, RowWriter]]" = OrderedDict()
+        self.started: set = set()
+        directory.mkdir(parents=True)
+
+    def writerow(self, row: Dict[str, Any]):
+        partition = self.partition_of(row)
+        handle = self.open.get(partition)
+        if handle is None:
+            if len(self.open) >= self.max_open:
+                self.open.popitem(last=False)[1][0].close()
+            new = partition not in self.started
+            file = (self.directory / f"{partition}.csv").open("w" if new else "a", buffering=self.buffering, newline="", encoding="utf-8")
+            handle = self.open[partition] = (file, RowWriter(file, self.fieldnames))
+            if new:
+                self.started.add(partition)
+                handle[1].writeheader()
+        else:
+            self.open.move_to_end(partition)
+        handle[1].writerow(row)
+
+    def close(self):
+        for file, _ in self.open.values():
+            file.close()
+        self.open.clear()
+
+
+class PartitionedCSVSink:
+    """
+    Writes one pair of CSV files per purchase_date partition (month by
+    default): <directory>/transactions/2024-01.csv and
+    <directory>/details/2024-01.csv. Item details go to the partition of
+    the transaction written just before them, their parent, since every
+    writer receives rows in write_records order. At most max_open_files
+    partition files per table are open at once.
+
+    Each run builds its partitions in a new <directory>.v<run> directory.
+    <directory> itself is a symlink, atomically repointed at the new build
+    once it is complete, so readers always see one whole set of partitions.
+    A plain directory left by an earlier version is moved aside first,
+    the only time <directory> is briefly missing.
+    """
+
+    def __init__(self, settings: Dict[str, Any], transaction_fields: List[str], detail_fields: List[str], buffering: int = -1):
+        self.directory = Path(settings.get("directory", "data_transformation/outputs/partitions"))
+        by = settings.get("by", "month")
+        if by not in _PARTITION_FORMATS:
+            raise ValueError(f"Unknown partition key: '{by}'")
+        self.format = _PARTITION_FORMATS[by]
+        self.max_open_files = settings.get("max_open_files", 64)
+        if not isinstance(self.max_open_files, int) or self.max_open_files < 1:
+            raise ValueError(f"max_open_files must be an integer of at least 1, got {self.max_open_files!r}")
+        self.transaction_fields = transaction_fields
+        self.detail_fields = detail_fields
+        self.buffering = buffering
+        self.staging: Optional[Path] = None
+        self.partitions: Dict[Optional[date], str] = {}
+        self.current: Optional[str] = None
+
+    def _transaction_partition(self, row: Dict[str, Any]) -> str:
+        purchase_date = row.get("purchase_date")
+        partition = self.partitions.get(purchase_date)
+        if partition is None:
+            partition = self.partitions[purchase_date] = purchase_date.strftime(self.format) if purchase_date is not None else "undated"
+        self.current = partition
+        return partition
+
+    def _detail_partition(self, row: Dict[str, Any]) -> str:
+        return self.current
+
+    def _builds(self) -> List[Path]:
+        return list(self.directory.parent.glob(f"{self.directory.name}.v*"))
+
+    def __enter__(self) -> "PartitionedCSVSink":
+        self.directory.parent.mkdir(parents=True, exist_ok=True)
+        current = self.directory.resolve() if self.directory.is_symlink() else None
+        for build in self._builds():
+            # Left behind by failed or crashed runs
+            if build.resolve() != current:
+                shutil.rmtree(build, ignore_errors=True)
+        self.staging = self.directory.with_name(f"{self.directory.name}.v{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{os.getpid()}")
+        self.transaction_writer = _PartitionedTableWriter(
+            self.staging / "transactions", self.transaction_fields, self._transaction_partition, self.buffering, self.max_open_files
+        )
+        self.detail_writer = _PartitionedTableWriter(
+            self.staging / "details", self.detail_fields, self._detail_partition, self.buffering, self.max_open_files
+        )
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.transaction_writer.close()
+        self.detail_writer.close()
+        if exc_type is not None:
+            shutil.rmtree(self.staging, ignore_errors=True)
+            return
+        previous = self.directory.resolve() if self.directory.is_symlink() else None
+        if previous is None and self.directory.exists():
+            previous = self.directory.with_name(self.directory.name + ".old")
+            shutil.rmtree(previous, ignore_errors=True)
+            os.replace(self.directory, previous)
+        link = self.directory.with_name(self.directory.name + ".link")
+        link.unlink(missing_ok=True)
+        link.symlink_to(self.staging.name, target_is_directory=True)
+        os.replace(link, self.directory)
+        if previous is not None:
+            shutil.rmtree(previous, ignore_errors=True)
+
+
+# Bounds of the signed 64-bit integers SQLite and the columnar arrays hold
+_INT64_MIN, _INT64_MAX = -(2 ** 63), 2 ** 63 - 1
+
+
+def _int64_overflow(row: Dict[str, Any], fields: Iterable[str], minimum: int = _INT64_MIN) -> Optional[ValueError]:
+    """The error to reject row with if an int in fields falls outside [minimum, 2**63 - 1], else None."""
+    for field in fields:
+        value = row.get(field)
+        if value.__class__ is int and not minimum <= value <= _INT64_MAX:
+            return ValueError(f"{field} {value} does not fit a 64-bit integer column")
+    return None
+
+
+class _SQLiteTableWriter:
+    """
+    DictWriter look-alike buffering rows for executemany. Rows holding an
+    int SQLite cannot store are rejected on their own, through data_quality,
+    instead of failing the whole load.
+    """
+
+    def __init__(self, connection: sqlite3.Connection, table: str, fieldnames: List[str], batch_size: int, model: str):
+        self.connection = connection
+        self.model = model
+        self.fieldnames = fieldnames
+        self.batch_size = batch_size
+        self.rows = []
+        self.count = 0
+        self.sql = f'INSERT INTO "{table}" ({", ".join(fieldnames)}) VALUES ({", ".join("?" * len(fieldnames))})'
+
+    def writerow(self, row: Dict[str, Any]):
+        error = _int64_overflow(row, self.fieldnames)
+        if error is not None:
+            data_quality.reject(self.model, row, error)
+            return
+        # Dates are stored as ISO text, like the CSV output and the ERP tables
+        self.rows.append(tuple(value.isoformat() if isinstance(value, date) else value for value in map(row.get, self.fieldnames)))
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.connection.executemany(self.sql, self.rows)
+            self.count += len(self.rows)
+            self.rows = []
+
+
+class SQLiteSink:
+    """
+    Bulk-loads transactions and item details straight into an SQLite
+    database such as the ERP one. Both tables are recreated and filled in a
+    single transaction with batched executemany, under the load PRAGMAs
+    from the config; indexes are only built once all rows are in. A failed
+    load is rolled back and leaves the previous tables untouched.
+
+    The default PRAGMAs (WAL journal, synchronous=NORMAL) keep the database
+    intact if the process crashes or the machine loses power mid-load. The
+    faster journal_mode=MEMORY/OFF and synchronous=OFF give that up, so a
+    crash can corrupt the whole database; they are only accepted with
+    unsafe_fast_load set, which also makes them the defaults.
+    """
+
+    durable_pragmas: ClassVar[Dict[str, Any]] = {"journal_mode": "WAL", "synchronous": "NORMAL", "cache_size": -65536, "temp_store": "MEMORY"}
+    unsafe_pragmas: ClassVar[Dict[str, Any]] = {"journal_mode": "MEMORY", "synchronous": "OFF"}
+
+    column_types: ClassVar[Dict[str, str]] = {
+        "details_id": "INTEGER PRIMARY KEY",
+        "transaction_id": "INTEGER",
+        "customer_name": "TEXT",
+        "purchase_date": "DATE",
+        "total_amount": "REAL",
+        "status": "TEXT",
+        "item": "TEXT",
+        "quantity": "INTEGER",
+        "price": "REAL",
+    }
+
+    def __init__(self, settings: Dict[str, Any], transaction_fields: List[str], detail_fields: List[str]):
+        self.database = Path(settings.get("database", "sql_queries/erp.db"))
+        self.transactions_table = settings.get("transactions_table", "Transactions")
+        self.details_table = settings.get("details_table", "TransactionDetails")
+        self.batch_size = settings.get("batch_size", 10000)
+        self.unsafe_fast_load = bool(settings.get("unsafe_fast_load", False))
+        self.pragmas = dict(self.durable_pragmas, **(self.unsafe_pragmas if self.unsafe_fast_load else {}))
+        self.pragmas.update(settings.get("pragmas") or {})
+        if not self.unsafe_fast_load and self._is_unsafe(self.pragmas):
+            raise ValueError(
+                f"PRAGMAs {self.pragmas} risk corrupting {self.database} on a crash; set unsafe_fast_load: true to use them"
+            )
+        self.indexes = settings.get("indexes", {
+            "transactions": ["transaction_id", "purchase_date", "status"],
+            "details": ["transaction_id"],
+        }) or {}
+        self.transaction_fields = transaction_fields
+        self.detail_fields = detail_fields
+
+    @staticmethod
+    def _is_unsafe(pragmas: Dict[str, Any]) -> bool:
+        journal_mode = str(pragmas.get("journal_mode", "")).upper()
+        synchronous = str(pragmas.get("synchronous", "")).upper()
+        return journal_mode in ("MEMORY", "OFF") or synchronous in ("OFF", "0")
+
+    def _create_table(self, table: str, fields: List[str]):
+        columns = ", ".join(f"{field} {self.column_types.get(field, '')}".rstrip() for field in fields)
+        self.connection.execute(f'DROP TABLE IF EXISTS "{table}"')
+        self.connection.execute(f'CREATE TABLE "{table}" ({columns})')
+
+    def _create_indexes(self, table: str, fields: List[str]):
+        for field in fields:
+            self.connection.execute(f'CREATE INDEX "idx_{table}_{field}" ON "{table}" ({field})')
+
+    def __enter__(self) -> "SQLiteSink":
+        self.database.parent.mkdir(parents=True, exist_ok=True)
+        # Transactions are managed explicitly so the whole load commits at once
+        # A staged pipeline inserts from its writer thread, never concurrently with this one
+        self.connection = sqlite3.connect(str(self.database), isolation_level=None, check_same_thread=False)
+        for pragma, value in self.pragmas.items():
+            self.connection.execute(f"PRAGMA {pragma} = {value}")
+        self.connection.execute("BEGIN")
+        self._create_table(self.transactions_table, self.transaction_fields)
+        self._create_table(self.details_table, self.detail_fields)
+        self.transaction_writer = _SQLiteTableWriter(
+            self.connection, self.transactions_table, self.transaction_fields, self.batch_size, "Transaction"
+        )
+        self.detail_writer = _SQLiteTableWriter(self.connection, self.details_table, self.detail_fields, self.batch_size, "ItemDetail")
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        try:
+            if exc_type is not None:
+                self.connection.execute("ROLLBACK")
+                return
+            self.transaction_writer.flush()
+            self.detail_writer.flush()
+            self._create_indexes(self.transactions_table, self.indexes.get("transactions", []))
+            self._create_indexes(self.details_table, self.indexes.get("details", []))
+            self.connection.execute("COMMIT")
+            logger.info(
+                f"Loaded {self.transaction_writer.count} transactions and {self.detail_writer.count} item details into {self.database}"
+            )
+        finally:
+            self.connection.close()
+
+
+class _TeeWriter:
+    """Forwards every row to several writers."""
+
+    def __init__(self, writers: List[Any]):
+        self.writers = writers
+
+    def writerow(self, row: Dict[str, Any]):
+        for writer in self.writers:
+            writer.writerow(row)
+
+
+_COLUMNAR_MAGIC = b"TXCOLS01"
+_COLUMNAR_ALIGN = 64
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_NULL_INT = np.iinfo(np.int64).min
+
+
+class _ColumnarTableWriter:
+    """
+    DictWriter look-alike accumulating typed columns for one columnar file.
+    Rows with an int64 value out of range (the minimum is the null marker)
+    are rejected through data_quality before any of their columns grows.
+    """
+
+    def __init__(self, fieldnames: List[str], encodings: Dict[str, str], model: str):
+        self.fieldnames = fieldnames
+        self.model = model
+        self.encodings = {field: encodings.get(field, "dict") for field in fieldnames}
+        self.int_fields = [field for field in fieldnames if self.encodings[field] == "int64"]
+        self.columns = {field: array("d" if self.encodings[field] == "float64" else "q") for field in fieldnames}
+        self.dictionaries: Dict[str, Dict[str, int]] = {field: {} for field in fieldnames if self.encodings[field] == "dict"}
+        self.count = 0
+
+    def writerow(self, row: Dict[str, Any]):
+        error = _int64_overflow(row, self.int_fields, _NULL_INT + 1)
+        if error is not None:
+            data_quality.reject(self.model, row, error)
+            return
+        for field in self.fieldnames:
+            value = row.get(field)
+            encoding = self.encodings[field]
+            if encoding == "dict":
+                if value is None:
+                    value = -1
+                else:
+                    codes = self.dictionaries[field]
+                    value = codes.setdefault(value, len(codes))
+            elif encoding == "date":
+                value = _NULL_INT if value is None else value.toordinal() - _EPOCH_ORDINAL
+            elif value is None:
+                value = float("nan") if encoding == "float64" else _NULL_INT
+            self.columns[field].append(value)
+        self.count += 1
+
+    def save(self, path: Path):
+        """Write the columns, each aligned for zero-copy memory mapping, then swap the file in."""
+        header = {"rows": self.count, "columns": []}
+        offset = 0
+        for field in self.fieldnames:
+            column = {"name": field, "encoding": self.encodings[field], "offset": offset}
+            if field in self.dictionaries:
+                column["dictionary"] = list(self.dictionaries[field])
+            header["columns"].append(column)
+            nbytes = len(self.columns[field]) * self.columns[field].itemsize
+            offset += -(-nbytes // _COLUMNAR_ALIGN) * _COLUMNAR_ALIGN
+        encoded = json.dumps(header, ensure_ascii=False).encode("utf-8")
+        data_start = -(-(len(_COLUMNAR_MAGIC) + 8 + len(encoded)) // _COLUMNAR_ALIGN) * _COLUMNAR_ALIGN
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open("wb") as file:
+            file.write(_COLUMNAR_MAGIC)
+            file.write(len(encoded).to_bytes(8, "little"))
+            file.write(encoded)
+            for field, column in zip(self.fieldnames, header["columns"]):
+                file.write(b"\0" * (data_start + column["offset"] - file.tell()))
+                # array uses the native byte order, which the reader assumes too
+                self.columns[field].tofile(file)
+        os.replace(tmp_path, path)
+
+
+class ColumnarSink:
+    """
+    Writes transactions and item details as typed columnar files: ids,
+    quantities and amounts as fixed-width arrays, dates as epoch days and
+    strings dictionary-encoded. Files are only replaced once the whole load
+    succeeds. Read them back with ColumnarReader.
+    """
+
+    encodings: ClassVar[Dict[str, str]] = {
+        "details_id": "int64",
+        "transaction_id": "int64",
+        "customer_name": "dict",
+        "purchase_date": "date",
+        "total_amount": "float64",
+        "status": "dict",
+        "item": "dict",
+        "quantity": "int64",
+        "price": "float64",
+    }
+
+    def __init__(self, settings: Dict[str, Any], transaction_fields: List[str], detail_fields: List[str]):
+        self.transaction_file = Path(settings.get("transactions", "data_transformation/outputs/transactions.cols"))
+        self.detail_file = Path(settings.get("details", "data_transformation/outputs/details.cols"))
+        self.transaction_fields = transaction_fields
+        self.detail_fields = detail_fields
+
+    def __enter__(self) -> "ColumnarSink":
+        self.transaction_writer = _ColumnarTableWriter(self.transaction_fields, self.encodings, "Transaction")
+        self.detail_writer = _ColumnarTableWriter(self.detail_fields, self.encodings, "ItemDetail")
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.transaction_writer.save(self.transaction_file)
+            self.detail_writer.save(self.detail_file)
+
+
+class ColumnarReader:
+    """
+    Memory-maps a file written by ColumnarSink. Indexing by column name
+    returns a zero-copy NumPy view: int64 and float64 arrays, datetime64[D]
+    for dates (NaT when missing) and int64 codes for dictionary-encoded
+    strings (-1 when missing), which decode() turns back into strings.
+    """
+
+    dtypes: ClassVar[Dict[str, str]] = {"int64": "=i8", "float64": "=f8", "date": "=i8", "dict": "=i8"}
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.data = np.memmap(self.path, dtype=np.uint8, mode="r")
+        if bytes(self.data[:len(_COLUMNAR_MAGIC)]) != _COLUMNAR_MAGIC:
+            raise ValueError(f"Not a columnar file: {self.path}")
+        header_size = int.from_bytes(bytes(self.data[len(_COLUMNAR_MAGIC):len(_COLUMNAR_MAGIC) + 8]), "little")
+        header_start = len(_COLUMNAR_MAGIC) + 8
+        header = json.loads(bytes(self.data[header_start:header_start + header_size]).decode("utf-8"))
+        self.data_start = -(-(header_start + header_size) // _COLUMNAR_ALIGN) * _COLUMNAR_ALIGN
+        self.rows = header["rows"]
+        self.columns = {column["name"]: column for column in header["columns"]}
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        column = self.columns[name]
+        start = self.data_start + column["offset"]
+        values = self.data[start:start + self.rows * 8].view(self.dtypes[column["encoding"]])
+        if column["encoding"] == "date":
+            return values.view("datetime64[D]")
+        return values
+
+    def dictionary(self, name: str) -> List[str]:
+        return self.columns[name]["dictionary"]
+
+    def decode(self, name: str) -> np.ndarray:
+        """Materialize a dictionary-encoded column as an object array of strings (None when missing)."""
+        lookup = np.array(self.dictionary(name) + [None], dtype=object)
+        return lookup[self[name]]
+
+
+def parse_json_to_csv(
+    json_data: Iterable[Dict[str, Any]],
+    transaction_file: Path,
+    detail_file: Path,
+    config: ConfigLoader,
+    workers: Optional[int] = None,
+    validation: Optional[str] = None,
+    sink: Optional[str] = None,
+    profile: Optional[PipelineProfile] = None,
+    pipeline_mode: Optional[str] = None,
+):
+    pass  # To implement
+
+    Transaction.set_config(config)
+    ItemDetail.set_config(config)
+
+    transaction_fields = config.get("transaction_fields", ["transaction_id", "customer_name", "purchase_date", "total_amount", "status"])
+    detail_fields = config.get("detail_fields", ["details_id", "transaction_id", "item", "quantity", "price"])
+
+    stages = config.get("pipeline", {}) or {}
+    if pipeline_mode is None:
+        pipeline_mode = stages.get("mode", "sequential")
+    if pipeline_mode not in ("sequential", "staged"):
+        raise ValueError(f"Unknown pipeline mode: '{pipeline_mode}'")
+    staged = pipeline_mode == "staged"
+    stage_batch, stage_queue = stages.get("batch_size", 1000), stages.get("queue_size", 16)
+
+    output_config = config.get("output", {}) or {}
+    if sink is None:
+        sink = output_config.get("sink", "csv")
+    outputs = []
+    # Several sinks can be fed from the same pass
+    for name in [sink] if isinstance(sink, str) else sink:
+        if name == "csv":
+            buffering = stages.get("write_buffer", 1 << 20) if staged else -1
+            outputs.append(CSVSink(transaction_file, detail_file, transaction_fields, detail_fields, atomic=staged, buffering=buffering))
+        elif name == "partitioned":
+            buffering = stages.get("write_buffer", 1 << 20) if staged else -1
+            outputs.append(PartitionedCSVSink(output_config.get("partitioned", {}) or {}, transaction_fields, detail_fields, buffering))
+        elif name == "sqlite":
+            outputs.append(SQLiteSink(output_config.get("sqlite", {}) or {}, transaction_fields, detail_fields))
+        elif name == "columnar":
+            outputs.append(ColumnarSink(output_config.get("columnar", {}) or {}, transaction_fields, detail_fields))
+        else:
+            raise ValueError(f"Unknown output sink: '{name}'")
+
+    if staged:
+        json_data = reader = read_ahead(json_data, stage_batch, stage_queue)
+
+    # A profile passed in belongs to the caller, which reports it
+    owns_profile = profile is None
+    if profile is None:
+        profile = PipelineProfile.from_config(config)
+    if profile is not None:
+        profile.start()
+        _instrument_models(profile)
+        json_data = profile.timed_iter("decode", json_data)
+
+    validated = _select_validation(json_data, config, workers, validation, profile)
+
+    data_quality.configure(config)
+    quality = config.get("quality", {}) or {}
+    with ExitStack() as stack:
+        data_quality.open_quarantine(Path(quality.get("quarantine", "data_transformation/outputs/quarantine.jsonl")))
+        stack.callback(data_quality.close_quarantine)
+        for output in outputs:
+            stack.enter_context(output)
+        if len(outputs) == 1:
+            transaction_writer, detail_writer = outputs[0].transaction_writer, outputs[0].detail_writer
+        else:
+            transaction_writer = _TeeWriter([output.transaction_writer for output in outputs])
+            detail_writer = _TeeWriter([output.detail_writer for output in outputs])
+        if staged:
+            stack.callback(reader.close)
+            # Closed before the sinks: the remaining rows are written only if the run succeeded
+            write_behind = WriteBehind(stage_batch, stage_queue)
+            stack.push(lambda exc_type, exc, traceback: write_behind.close(flush=exc_type is None))
+            transaction_writer, detail_writer = write_behind.wrap(transaction_writer), write_behind.wrap(detail_writer)
+
+        state = IngestState(create_dedupe_store(config))
+        if profile is not None:
+            _instrument_outputs(profile, transaction_writer, detail_writer, state.written_transactions)
+            validated = _timed_validation(profile, validated)
+        try:
+            write_records(validated, transaction_writer, detail_writer, state)
+            logger.info(report_dedupe_store(state.written_transactions))
+            logger.info(data_quality.summary())
+        finally:
+            state.written_transactions.close()
+
+    if profile is not None and owns_profile:
+        profile.finish(config)
+
+def process_single_file(
+    filename: Path, transaction_file: Path, details_file: Path, config: ConfigLoader, profile: Optional[PipelineProfile] = None
+):
+    # Records are streamed straight into the writers instead of loading the whole file
+    with filename.open("r", encoding="utf-8") as file:
+        parse_json_to_csv(iter_json_records(file), transaction_file, details_file, config, profile=profile)
+
+
+def iter_files_records(filenames: Iterable[Path]) -> Iterator[Dict[str, Any]]:
+    """Stream the records of several input files one after the other."""
+    for filename in filenames:
+        with Path(filename).open("r", encoding="utf-8") as file:
+            yield from iter_json_records(file)
+
+
+def process_files(
+    filenames: Iterable[Path], transaction_file: Path, details_file: Path, config: ConfigLoader, profile: Optional[PipelineProfile] = None
+):
+    """Write every input into the same outputs, with one duplicate check and details_id sequence across them."""
+    parse_json_to_csv(iter_files_records(filenames), transaction_file, details_file, config, profile=profile)
+
+# ------------------------------
+#      Incremental Ingestion
+# ------------------------------
+
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class IngestManifest:
+    """
+    JSON checkpoint of an incremental ingestion run.
+
+    inputs maps each input path to its size, mtime_ns, sha256, the byte_offset
+    just past the last checkpointed record, the number of records read and
+    whether the file is complete. outputs holds the byte sizes of both CSV
+    files, a digest of the bytes just before each size, and the next
+    details_id at that same checkpoint, so a crashed run can roll its
+    outputs back to a consistent state before resuming. outputs["running"]
+    stays set from the start of a run until it completes.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.inputs: Dict[str, Dict[str, Any]] = {}
+        self.outputs: Dict[str, Any] = {}
+        if path.exists():
+            with path.open("r", encoding="utf-8") as file:
+                data = json.load(file)
+            self.inputs = data.get("inputs", {})
+            self.outputs = data.get("outputs", {})
+
+    def reset(self):
+        self.inputs = {}
+        self.outputs = {}
+
+    def save(self):
+        # Write to a temporary file first so a crash never leaves a torn manifest
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with tmp_path.open("w", encoding="utf-8") as file:
+            json.dump({"inputs": self.inputs, "outputs": self.outputs}, file, indent=2)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.path)
+
+
+_csv_parsers: Dict[Any, Callable[[str], Any]] = {
+    int: int,
+    float: float,
+    str: str,
+    date: date.fromisoformat,
+    Optional[str]: str,
+    Optional[date]: date.fromisoformat,
+}
+
+
+def _load_written_transactions(transaction_file: Path, store):
+    """Rebuild the dedupe keys of the transactions already present in an output file."""
+    # An empty cell was None, except in str fields where it was an empty string
+    fields = [
+        (name, _csv_parsers[field.annotation], _csv_parsers[field.annotation] is not str)
+        for name, field in Transaction.model_fields.items()
+        if name not in {"transaction_id", "customer_name"}
+    ]
+    with transaction_file.open("r", newline="", encoding="utf-8") as file:
+        for row in csv.DictReader(file):
+            store.add(tuple(
+                (name, None if empty_is_none and row[name] == "" else parse(row[name])) for name, parse, empty_is_none in fields
+            ))
+    return store
+
+
+def _dedupe_token(transaction_bytes: int, transaction_tail: Optional[str]) -> str:
+    """Names the transactions output state a persisted dedupe store matches."""
+    return f"{transaction_bytes}:{transaction_tail}"
+
+
+def _output_tail(path: Path, size: int, span: int = 4096) -> str:
+    """sha256 of the last span bytes of path before size, identifying what a checkpoint covered."""
+    start = max(0, size - span)
+    with path.open("rb") as file:
+        file.seek(start)
+        return hashlib.sha256(file.read(size - start)).hexdigest()
+
+
+def _check_output(path: Path, size: int, tail: Optional[str], fieldnames: List[str], running: bool):
+    """Refuse to roll back an output holding rows the manifest does not account for."""
+    with path.open("r", newline="", encoding="utf-8") as file:
+        header = next(csv.reader(file), None)
+    if header != fieldnames:
+        raise ValueError(f"{path} has header {header}, expected {fieldnames}; refusing to truncate it")
+    actual = path.stat().st_size
+    if actual < size or (tail is not None and _output_tail(path, size) != tail):
+        raise ValueError(f"{path} changed before its last checkpoint at byte {size}; refusing to truncate it")
+    if actual > size:
+        if not running:
+            raise ValueError(f"{path} was extended by {actual - size} bytes after the last run completed; refusing to truncate it")
+        logger.warning(f"Dropping {actual - size} bytes written to {path} after the last checkpoint")
+
+
+def _open_for_append(path: Path, size: int, fieldnames: List[str]) -> Tuple[TextIO, "RowWriter"]:
+    # Drop anything written after the last checkpoint (see _check_output), then append from there
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("ab") as file:
+        file.truncate(size)
+    file = path.open("a", newline="", encoding="utf-8")
+    writer = RowWriter(file, fieldnames)
+    if size == 0:
+        writer.writeheader()
+    return file, writer
+
+
+def ingest_incremental(
+    input_files: Iterable[Path], transaction_file: Path, details_file: Path, config: ConfigLoader, profile: Optional[PipelineProfile] = None
+):
+    """
+    Append new input files to the outputs, driven by a checkpoint manifest.
+
+    Inputs whose size and mtime, or content hash, match a completed manifest
+    entry are skipped. An input interrupted mid-way resumes from its last
+    checkpointed byte offset after both outputs are truncated back to the
+    matching sizes. An input whose content changed is read again from the
+    start; rows already written are dropped by the usual duplicate check.
+    The outputs are always the CSV files, whatever the configured sink.
+
+    With persist_dedupe (the default), the keys of the written transactions
+    are kept in an SQLite store committed at every checkpoint, so a run
+    costs time in its new inputs only. The transactions output is read back
+    only when that store is missing or does not match the checkpoint.
+    Otherwise the configured dedupe backend is refilled from it every run.
+    """
+    Transaction.set_config(config)
+    ItemDetail.set_config(config)
+
+    checkpoint = config.get("checkpoint", {}) or {}
+    manifest = IngestManifest(Path(checkpoint.get("manifest", "data_transformation/outputs/manifest.json")))
+    every = checkpoint.get("every", 10000)
+
+    transaction_fields = config.get("transaction_fields", ["transaction_id", "customer_name", "purchase_date", "total_amount", "status"])
+    detail_fields = config.get("detail_fields", ["details_id", "transaction_id", "item", "quantity", "price"])
+
+    transaction_size = manifest.outputs.get("transaction_bytes", 0)
+    details_size = manifest.outputs.get("details_bytes", 0)
+    if manifest.outputs and (not transaction_file.exists() or not details_file.exists()):
+        # The outputs the manifest describes are gone: start over
+        logger.warning(f"Outputs of {manifest.path} are missing, ingesting every input again")
+        manifest.reset()
+        transaction_size = details_size = 0
+    # Manifests written before outputs["running"] existed are trusted as crashed runs
+    running = manifest.outputs.get("running", bool(manifest.outputs))
+    for path, size, tail, fieldnames in (
+        (transaction_file, transaction_size, manifest.outputs.get("transaction_tail"), transaction_fields),
+        (details_file, details_size, manifest.outputs.get("details_tail"), detail_fields),
+    ):
+        if path.exists() and path.stat().st_size:
+            _check_output(path, size, tail, fieldnames, running)
+    manifest.outputs["running"] = True
+    manifest.save()
+
+    tf, transaction_writer = _open_for_append(transaction_file, transaction_size, transaction_fields)
+    df, detail_writer = _open_for_append(details_file, details_size, detail_fields)
+    persist_dedupe = checkpoint.get("persist_dedupe", True)
+    if persist_dedupe:
+        store = SQLiteDedupeStore(
+            Path(checkpoint.get("dedupe_store") or manifest.path.with_suffix(".dedupe.sqlite")),
+            (config.get("dedupe", {}) or {}).get("cache_kib", 65536),
+            keep=True,
+        )
+        token = _dedupe_token(transaction_size, manifest.outputs.get("transaction_tail"))
+        if store.token != token:
+            # Missing, or committed for other outputs than the ones resumed from
+            store.clear()
+            if transaction_size:
+                logger.info(f"Rebuilding {store.path} from {transaction_file}")
+                _load_written_transactions(transaction_file, store)
+            store.commit(token)
+    else:
+        store = create_dedupe_store(config)
+        if transaction_size:
+            _load_written_transactions(transaction_file, store)
+    state = IngestState(store, manifest.outputs.get("details_id_next", 1))
+    owns_profile = profile is None
+    if profile is None:
+        profile = PipelineProfile.from_config(config)
+    if profile is not None:
+        profile.start()
+        _instrument_models(profile)
+        _instrument_outputs(profile, transaction_writer, detail_writer, store)
+
+    # Quarantined records past the last checkpoint are dropped too, they will be rejected again
+    data_quality.configure(config)
+    quality = config.get("quality", {}) or {}
+    data_quality.open_quarantine(
+        Path(quality.get("quarantine", "data_transformation/outputs/quarantine.jsonl")), manifest.outputs.get("quarantine_bytes")
+    )
+
+    def save_checkpoint(entry: Dict[str, Any]):
+        for file in (tf, df):
+            file.flush()
+            os.fsync(file.fileno())
+        transaction_bytes, details_bytes = os.fstat(tf.fileno()).st_size, os.fstat(df.fileno()).st_size
+        transaction_tail = _output_tail(transaction_file, transaction_bytes)
+        if persist_dedupe:
+            # Committed before the manifest: a crash in between leaves tokens that no longer match
+            store.commit(_dedupe_token(transaction_bytes, transaction_tail))
+        manifest.outputs = {
+            "transaction_bytes": transaction_bytes,
+            "transaction_tail": transaction_tail,
+            "details_bytes": details_bytes,
+            "details_tail": _output_tail(details_file, details_bytes),
+            "quarantine_bytes": data_quality.quarantine_bytes(),
+            "details_id_next": state.details_id_counter,
+            "running": True,
+        }
+        manifest.save()
+
+    try:
+        for filename in input_files:
+            filename = Path(filename)
+            key = str(filename)
+            stat = filename.stat()
+            entry = manifest.inputs.get(key)
+
+            if entry and entry["complete"] and (entry["size"], entry["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+                logger.info(f"Skipping unchanged {filename}")
+                continue
+            sha256 = file_sha256(filename)
+            if entry and entry["sha256"] == sha256:
+                if entry["complete"]:
+                    # Touched but identical: remember the new mtime and move on
+                    entry["mtime_ns"] = stat.st_mtime_ns
+                    manifest.save()
+                    continue
+                start_offset, in_array, records = entry["byte_offset"], entry["in_array"], entry["records"]
+            else:
+                start_offset, in_array, records = 0, None, 0
+
+            # The mtime is only recorded once the file is complete, so a partial entry never passes the quick check
+            entry = manifest.inputs[key] = {
+                "size": stat.st_size,
+                "mtime_ns": None,
+                "sha256": sha256,
+                "byte_offset": start_offset,
+                "in_array": in_array,
+                "records": records,
+                "complete": False,
+            }
+
+            with filename.open("rb") as raw:
+                raw.seek(start_offset)
+                file = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+                reader = JsonRecordReader(file, start_offset=start_offset, in_array=in_array)
+
+                # Reader positions for records handed to validation but not yet written
+                marks = deque()
+
+                def tracked() -> Iterator[Dict[str, Any]]:
+                    for record in reader:
+                        marks.append(reader.last_mark)
+                        yield record
+
+                def on_record():
+                    mark = marks.popleft()
+                    entry["records"] += 1
+                    if entry["records"] % every == 0:
+                        entry["byte_offset"] = reader.byte_offset(mark)
+                        entry["in_array"] = reader.in_array
+                        save_checkpoint(entry)
+
+                records = tracked()
+                if profile is not None:
+                    records = profile.timed_iter("decode", records)
+                validated = _select_validation(records, config, profile=profile)
+                if profile is not None:
+                    validated = _timed_validation(profile, validated)
+                write_records(validated, transaction_writer, detail_writer, state, on_record)
+
+            entry.update(byte_offset=stat.st_size, in_array=reader.in_array, complete=True, mtime_ns=stat.st_mtime_ns)
+            save_checkpoint(entry)
+        manifest.outputs["running"] = False
+        manifest.save()
+        logger.info(report_dedupe_store(store))
+        logger.info(data_quality.summary())
+    finally:
+        tf.close()
+        df.close()
+        store.close()
+        data_quality.close_quarantine()
+
+    if profile is not None and owns_profile:
+        profile.finish(config)
+
+# ------------------------------
+#     Watch-Folder Daemon
+# ------------------------------
+
+
+def _ingest_drop(filename: str, validation: str) -> Tuple[List[Tuple[Any, ...]], Counter, Dict[str, List[float]], float]:
+    """Worker entry point: validate a whole dropped file, returning the _run_chunk results and the time spent."""
+    started = time.perf_counter()
+    with open(filename, "r", encoding="utf-8") as file:
+        records = list(iter_json_records(file))
+    validate_batch = _validate_columnar if validation == "columnar" else _validate_chunk
+    results, counts, stats = _run_chunk(validate_batch, records)
+    return results, counts, stats, time.perf_counter() - started
+
+
+class _OutputSegment:
+    """
+    A pair of CSV files being filled by the daemon, with its own duplicate
+    check and details_id sequence, and the inputs whose rows it holds.
+    """
+
+    def __init__(self, output_dir: Path, name: str, config: ConfigLoader, transaction_fields: List[str], detail_fields: List[str]):
+        self.files = [output_dir / f"transactions-{name}.csv", output_dir / f"details-{name}.csv"]
+        # Files are written under a .part suffix and renamed once the segment is rotated out
+        self.sink = CSVSink(*(path.with_name(path.name + ".part") for path in self.files), transaction_fields, detail_fields)
+        self.sink.__enter__()
+        self.state = IngestState(create_dedupe_store(config))
+        self.inputs: List[Path] = []
+        self.opened = time.monotonic()
+
+    def size(self) -> int:
+        return self.sink.tf.tell() + self.sink.df.tell()
+
+    def close(self):
+        # Synced before the rename, so a finalized segment survives its inputs being moved away
+        for file in (self.sink.tf, self.sink.df):
+            file.flush()
+            os.fsync(file.fileno())
+        self.sink.__exit__(None, None, None)
+        self.state.written_transactions.close()
+        for path in self.files:
+            os.replace(path.with_name(path.name + ".part"), path)
+
+    def discard(self):
+        """Drop the segment and its .part files; its inputs were not moved and are ingested again."""
+        try:
+            self.sink.__exit__(None, None, None)
+            self.state.written_transactions.close()
+        finally:
+            for path in self.files:
+                path.with_name(path.name + ".part").unlink(missing_ok=True)
+
+
+class IngestDaemon:
+    """
+    Long-running ingestion of JSON files dropped into a watched directory.
+
+    The directory is polled and a file is picked up once its size and mtime
+    are unchanged between two polls. A bounded pool of worker processes,
+    each loading the config and models once, validates whole files; the
+    results are written in pickup order by this process into the current
+    output segment, which is rotated after rotate_seconds or rotate_bytes.
+    The duplicate check and details_id sequence span a segment.
+
+    Ingested files stay in input_dir until their segment is finalized, then
+    move to done_dir, so a crash never loses rows: the .part files it leaves
+    are removed on startup and their inputs ingested again. A file that
+    fails for any reason is moved to failed_dir and the daemon carries on;
+    a failure while writing also drops the current segment, whose other
+    inputs are picked up again into a new one.
+    """
+
+    def __init__(self, config: ConfigLoader, workers: Optional[int] = None):
+        Transaction.set_config(config)
+        ItemDetail.set_config(config)
+        self.config = config
+        settings = config.get("daemon", {}) or {}
+        self.input_dir = Path(settings.get("input_dir", "data_transformation/inbox"))
+        self.pattern = settings.get("pattern", "*.json")
+        self.poll_interval = settings.get("poll_interval", 1.0)
+        self.workers = workers if workers is not None else settings.get("workers", 2)
+        self.done_dir = Path(settings.get("done_dir", "data_transformation/inbox/done"))
+        self.failed_dir = Path(settings.get("failed_dir", "data_transformation/inbox/failed"))
+        self.output_dir = Path(settings.get("output_dir", "data_transformation/outputs/stream"))
+        self.rotate_seconds = settings.get("rotate_seconds", 3600)
+        self.rotate_bytes = settings.get("rotate_bytes", 0)
+        latency_log = settings.get("latency_log", "")
+        self.latency_log = Path(latency_log) if latency_log else None
+        self.validation = (config.get("validation", {}) or {}).get("mode", "models")
+
+        self.transaction_fields = config.get("transaction_fields", ["transaction_id", "customer_name", "purchase_date", "total_amount", "status"])
+        self.detail_fields = config.get("detail_fields", ["details_id", "transaction_id", "item", "quantity", "price"])
+
+        # (size, mtime_ns) seen at the previous poll of files not yet picked up
+        self.candidates: Dict[Path, Tuple[int, int]] = {}
+        # time.monotonic() of the poll that first saw each of those files
+        self.first_seen: Dict[Path, float] = {}
+        # (path, first seen, future, executor) in pickup order
+        self.pending = deque()
+        self.in_flight = set()
+        self.latencies: List[float] = []
+        self.segment: Optional[_OutputSegment] = None
+        self.segments = 0
+        self.stopping = False
+
+        for directory in (self.input_dir, self.done_dir, self.failed_dir, self.output_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+        for orphan in self.output_dir.glob("*.csv.part"):
+            # Left by a daemon that died mid-segment; its inputs are still in input_dir
+            logger.warning(f"Removing unfinished segment file {orphan}")
+            orphan.unlink()
+        data_quality.configure(config)
+        quality = config.get("quality", {}) or {}
+        data_quality.open_quarantine(Path(quality.get("quarantine", "data_transformation/outputs/quarantine.jsonl")))
+        self.executor = self._start_pool()
+
+    def _start_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=_worker_context(), initializer=_init_worker, initargs=(self.config,),
+        )
+
+    def scan(self) -> List[Path]:
+        """Return the files whose size and mtime did not change since the previous scan."""
+        ready = []
+        seen = {}
+        now = time.monotonic()
+        for path in sorted(self.input_dir.glob(self.pattern)):
+            if path in self.in_flight or not path.is_file():
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            seen[path] = (stat.st_size, stat.st_mtime_ns)
+            self.first_seen.setdefault(path, now)
+            if self.candidates.get(path) == seen[path]:
+                ready.append(path)
+        self.candidates = seen
+        self.first_seen = {path: first for path, first in self.first_seen.items() if path in seen}
+        return ready
+
+    def poll(self):
+        """Pick up settled files while the pool has room, then write whatever finished in order."""
+        for path in self.scan():
+            # Keep a bounded number of files in flight; the rest are picked up by later polls
+            if len(self.pending) >= self.workers * 2:
+                break
+            self.in_flight.add(path)
+            future = self.executor.submit(_ingest_drop, str(path), self.validation)
+            self.pending.append((path, self.first_seen.pop(path), future, self.executor))
+        while self.pending and self.pending[0][2].done():
+            self._complete(*self.pending.popleft())
+        if self.segment is not None and self._should_rotate():
+            self.rotate()
+
+    def drain(self):
+        """Wait for every file in flight and write it."""
+        while self.pending:
+            self._complete(*self.pending.popleft())
+
+    def run(self):
+        """Poll until stop() is called, then finish the files in flight and close."""
+        try:
+            while not self.stopping:
+                self.poll()
+                if self.pending:
+                    # Write the oldest file as soon as it is validated rather than at the next poll
+                    wait([self.pending[0][2]], timeout=self.poll_interval)
+                else:
+                    time.sleep(self.poll_interval)
+            self.drain()
+        finally:
+            self.close()
+
+    def stop(self):
+        self.stopping = True
+
+    def _should_rotate(self) -> bool:
+        if self.rotate_seconds and time.monotonic() - self.segment.opened >= self.rotate_seconds:
+            return True
+        return bool(self.rotate_bytes) and self.segment.size() >= self.rotate_bytes
+
+    def rotate(self):
+        """Finalize the current output segment and move its inputs to done_dir; the next written file starts a new one."""
+        if self.segment is not None:
+            segment, self.segment = self.segment, None
+            segment.close()
+            logger.info(f"Rotated output segment {segment.files[0].name}")
+            for path in segment.inputs:
+                self._move(path, self.done_dir)
+
+    def _move(self, path: Path, directory: Path):
+        self.in_flight.discard(path)
+        try:
+            os.replace(path, directory / path.name)
+        except OSError as e:
+            logger.error(f"Unable to move {path} to {directory}: {e}")
+
+    def _fail(self, path: Path, error: Exception):
+        logger.error(f"Failed to ingest {path}: {error!r}")
+        self._move(path, self.failed_dir)
+
+    def _complete(self, path: Path, first_seen: float, future, executor: ProcessPoolExecutor):
+        try:
+            results, counts, _, validation_seconds = future.result()
+        except Exception as e:
+            # Unreadable input, validation error under on_error: raise, a worker that died...
+            if isinstance(e, BrokenProcessPool) and executor is self.executor:
+                # Every file in flight fails with it; later ones go to a new pool
+                logger.error("Worker pool broke, starting a new one")
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = self._start_pool()
+            self._fail(path, e)
+            return
+
+        try:
+            if self.segment is None:
+                self.segments += 1
+                name = f"{time.strftime('%Y%m%d-%H%M%S')}-{self.segments:04d}"
+                self.segment = _OutputSegment(self.output_dir, name, self.config, self.transaction_fields, self.detail_fields)
+            write_records(_replay_results(results), self.segment.sink.transaction_writer, self.segment.sink.detail_writer, self.segment.state)
+            self.segment.sink.tf.flush()
+            self.segment.sink.df.flush()
+        except Exception as e:
+            # Part of this file may be in the segment: drop it, its other inputs are ingested again
+            if self.segment is not None:
+                segment, self.segment = self.segment, None
+                for staged in segment.inputs:
+                    self.in_flight.discard(staged)
+                try:
+                    segment.discard()
+                except Exception as discard_error:
+                    logger.error(f"Unable to discard output segment {segment.files[0].name}: {discard_error!r}")
+            self._fail(path, e)
+            return
+        data_quality.merge(counts)
+        self.segment.inputs.append(path)
+
+        # Measured from the poll that first saw the file, settle delay included, to its rows being flushed
+        latency = time.monotonic() - first_seen
+        self.latencies.append(latency)
+        logger.info(f"Ingested {path.name}: {len(results)} records in {latency:.3f}s (validation {validation_seconds:.3f}s)")
+        if self.latency_log is not None:
+            with self.latency_log.open("a", encoding="utf-8") as file:
+                file.write(json.dumps({"file": path.name, "records": len(results), "latency_seconds": latency, "validation_seconds": validation_seconds}) + "\n")
+
+        if self._should_rotate():
+            self.rotate()
+
+    def latency_summary(self) -> str:
+        if not self.latencies:
+            return "Daemon: no files ingested"
+        latencies = sorted(self.latencies)
+        p50 = latencies[len(latencies) // 2]
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        return f"Daemon: {len(latencies)} file(s), latency p50 {p50:.3f}s p95 {p95:.3f}s max {latencies[-1]:.3f}s"
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.rotate()
+        data_quality.close_quarantine()
+        logger.info(self.latency_summary())
+        logger.info(data_quality.summary())
+
+if __name__ == "__main__":
+    start = time.time()
+
+    # ------------------------------
+    #      Load Configuration
+    # ------------------------------
+
+    config = ConfigLoader(Path("data_transformation/config.yml"))
+    Transaction.set_config(config)
+    ItemDetail.set_config(config)
+
+    if "--watch" in sys.argv[1:]:
+        # Keep the config and models warm and ingest files as they are dropped into daemon.input_dir
+        daemon = IngestDaemon(config)
+        signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+        try:
+            daemon.run()
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+
+    input_files = config.get("files", {}).get("input", [])
+    output_file = Path(
+        config.get("files", {}).get("transaction_output", "transactions.csv")
+    )
+    details_file = Path(config.get("files", {}).get("details_output", "details.csv"))
+
+    if isinstance(input_files, str):
+        input_files = [input_files]  # Wrap single file in a list if input is a string
+
+    # One profile covers every input of the run
+    profile = PipelineProfile.from_config(config)
+
+    if (config.get("checkpoint", {}) or {}).get("enabled", False):
+        ingest_incremental([Path(filename) for filename in input_files], output_file, details_file, config, profile)
+    elif config.get("files", {}).get("mode", "aggregate") == "aggregate":
+        process_files([Path(filename) for filename in input_files], output_file, details_file, config, profile)
+    else:
+        for filename in input_files:
+            process_single_file(Path(filename), output_file, details_file, config, profile)
 
-    for filename in input_files:
-        process_single_file(Path(filename), output_file, details_file, config)
+    if profile is not None:
+        profile.finish(config)
+    logger.info(f"Processed {len(input_files)} input file(s) in {time.time() - start:.2f}s")
@@ -1,10 +1,28 @@
+import json
+import random
+import threading
+import time
+
+import pytest
 import requests
-from api_rest.main import app
-from unittest.mock import patch
+from haversine import haversine as calculate_distance
+
+from api_rest import distance
+from api_rest import main as api_main
+from api_rest.cache import TTLCache
+from api_rest.geo import TechnicianIndex
+from api_rest.main import app, erp, haversine, parts_cache, stock_cache
+from unittest.mock import MagicMock, patch
 
 url = "http://localhost:3000/api"
 
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    parts_cache.clear()
+    stock_cache.clear()
+
+
 def test_request_product():
     answ = requests.get(f"{url}/products", params={"part_id": 1})
     assert answ.status_code == 200
@@ -36,7 +54,7 @@ def test_request_technicians_2():
     answ = requests.get(f"{url}/technicians/nearest", params={"sss": 1, "ldat": 4})
     assert answ.status_code == 400
 
-@patch("api_rest.main.requests.get")  # Patch the correct module path
+@patch("api_rest.main.erp.session.get")  # Patch the correct module path
 def test_request_technicians_void_technitians(mock_get):
     # Mock the response from the legacy API
     mock_get.return_value.status_code = 200
@@ -45,4 +63,335 @@ def test_request_technicians_void_technitians(mock_get):
         response = client.get("/api/technicians/nearest?lat=54&lon=34")
 
         assert response.status_code == 500
-        assert response.json == {"error": "No technicians available"}
\ No newline at end of file
+        assert response.json == {"error": "No technicians available"}
+
+
+def _response(status_code, payload):
+    response = MagicMock()
+    response.status_code = status_code
+    response.json.return_value = payload
+    return response
+
+
+@patch("api_rest.upstream.time.sleep")
+@patch("api_rest.main.erp.session.get")
+def test_request_product_retries_transient_failures(mock_get, mock_sleep):
+    mock_get.side_effect = [
+        requests.ConnectionError("reset"),
+        _response(503, {}),
+        _response(200, {"type": "A05", "status": "ok"}),
+        _response(200, {"stock": 76}),
+    ]
+    with app.test_client() as client:
+        response = client.get("/api/products?part_id=1")
+
+    assert response.status_code == 200
+    assert response.json == {"id": 1, "type": "A05", "stock": 76, "status": "ok"}
+    assert mock_sleep.call_count == 2
+    # Every call is bounded by the (connect, read) timeout
+    assert all(call.kwargs["timeout"] == erp.timeout for call in mock_get.call_args_list)
+
+
+@patch("api_rest.upstream.time.sleep")
+@patch("api_rest.main.erp.session.get")
+def test_request_product_does_not_retry_read_timeouts(mock_get, mock_sleep):
+    mock_get.side_effect = requests.ReadTimeout("slow")
+    with app.test_client() as client:
+        response = client.get("/api/products?part_id=1")
+
+    assert response.status_code == 500
+    assert mock_get.call_count == 1
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class _DeferredExecutor:
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, fn, *args):
+        self.calls.append((fn, args))
+
+    def run(self):
+        calls, self.calls = self.calls, []
+        for fn, args in calls:
+            try:
+                fn(*args)
+            except Exception:
+                pass
+
+
+def test_ttl_cache_serves_stale_value_while_refreshing():
+    clock, executor = _Clock(), _DeferredExecutor()
+    cache = TTLCache(maxsize=2, ttl=10, stale_ttl=5, clock=clock, executor=executor)
+    values = iter([1, 2, 3])
+    load = lambda: next(values)
+
+    assert cache.get("a", load) == 1
+    clock.now = 9
+    assert cache.get("a", load) == 1
+    clock.now = 12
+    # Stale: the old value is served and a single refresh is scheduled
+    assert cache.get("a", load) == 1
+    assert cache.get("a", load) == 1
+    assert len(executor.calls) == 1
+    executor.run()
+    assert cache.get("a", load) == 2
+    # Past the stale window the value is loaded on the spot
+    clock.now = 40
+    assert cache.get("a", load) == 3
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.get("a", lambda: 1)
+    cache.get("b", lambda: 2)
+    cache.get("a", lambda: 0)
+    cache.get("c", lambda: 3)
+    assert list(cache.entries) == ["a", "c"]
+
+
+def test_ttl_cache_keeps_stale_value_when_refresh_fails():
+    clock, executor = _Clock(), _DeferredExecutor()
+    cache = TTLCache(ttl=10, clock=clock, executor=executor)
+    cache.get("a", lambda: 1)
+    clock.now = 15
+
+    def fail():
+        raise requests.ConnectionError("down")
+
+    assert cache.get("a", fail) == 1
+    executor.run()
+    assert cache.get("a", fail) == 1
+
+
+@patch("api_rest.main.erp.session.get")
+def test_request_product_caches_parts_stock_and_not_found(mock_get):
+    not_found = _response(404, {})
+    not_found.raise_for_status.side_effect = requests.HTTPError("404 Client Error: Not Found", response=not_found)
+    responses = {
+        "/parts/1": _response(200, {"type": "A05", "status": "ok"}),
+        "/parts/2": _response(200, {"type": "A05", "status": "ok"}),
+        "/stock/A05": _response(200, {"stock": 76}),
+        "/parts/33": not_found,
+    }
+    mock_get.side_effect = lambda url, timeout: responses[url[len(erp.base_url):]]
+
+    with app.test_client() as client:
+        for _ in range(3):
+            assert client.get("/api/products?part_id=1").status_code == 200
+        assert client.get("/api/products?part_id=2").json["stock"] == 76
+        for _ in range(3):
+            assert client.get("/api/products?part_id=33").status_code == 500
+
+    fetched = [call.args[0][len(erp.base_url):] for call in mock_get.call_args_list]
+    # One fetch per part, one stock lookup for the shared type, and the 404 is remembered
+    assert fetched == ["/parts/1", "/stock/A05", "/parts/2", "/parts/33"]
+
+
+@patch("api_rest.main.erp.session.get")
+def test_request_products_batch_fetches_concurrently(mock_get):
+    not_found = _response(404, {})
+    not_found.raise_for_status.side_effect = requests.HTTPError("404 Client Error: Not Found", response=not_found)
+
+    def get(url, timeout):
+        path = url[len(erp.base_url):]
+        time.sleep(0.05)
+        if path == "/parts/33":
+            return not_found
+        if path.startswith("/parts/"):
+            part_id = int(path.rsplit("/", 1)[1])
+            return _response(200, {"type": f"T{part_id % 3}", "status": "ok"})
+        return _response(200, {"stock": int(path[-1]) * 10})
+
+    mock_get.side_effect = get
+    part_ids = list(range(1, 61))
+    started = time.perf_counter()
+    with app.test_client() as client:
+        response = client.get("/api/products", query_string={"part_id": ",".join(map(str, part_ids + [1, "x"]))})
+    elapsed = time.perf_counter() - started
+
+    assert response.status_code == 200
+    results = response.json
+    assert len(results) == 62
+    assert results[0] == {"id": 1, "type": "T1", "stock": 10, "status": "ok"}
+    assert results[32] == {"id": 33, "error": "404 Client Error: Not Found"}
+    assert results[60] == results[0]
+    assert results[61] == {"id": "x", "error": "Invalid part_id"}
+    fetched = [call.args[0][len(erp.base_url):] for call in mock_get.call_args_list]
+    # One fetch per distinct part and one stock lookup per distinct type
+    assert sorted(path for path in fetched if path.startswith("/stock/")) == ["/stock/T0", "/stock/T1", "/stock/T2"]
+    assert len(fetched) == 63
+    # 63 sequential calls would take over 3s
+    assert elapsed < 1.5
+
+
+@patch("api_rest.main.erp.session.get")
+def test_request_products_batch_looks_up_every_part_in_one_round(mock_get):
+    # Each part lookup waits until all 500 are in flight at once
+    all_in_flight = threading.Barrier(500, timeout=10)
+
+    def get(url, timeout):
+        if "/parts/" in url:
+            all_in_flight.wait()
+            return _response(200, {"type": "A05", "status": "ok"})
+        return _response(200, {"stock": 5})
+
+    mock_get.side_effect = get
+    with app.test_client() as client:
+        response = client.post("/api/products", json={"part_ids": list(range(1, 501))})
+
+    assert response.status_code == 200
+    assert all(result.get("stock") == 5 for result in response.json)
+
+
+@patch("api_rest.main.erp.session.get")
+def test_request_products_batch_post(mock_get):
+    mock_get.side_effect = lambda url, timeout: _response(
+        200, {"stock": 5} if "/stock/" in url else {"type": "A05", "status": "ok"}
+    )
+    with app.test_client() as client:
+        response = client.post("/api/products", json={"part_ids": [1, "2"]})
+        assert client.post("/api/products", json={"ids": [1]}).status_code == 400
+        assert client.post("/api/products", json={"part_ids": []}).status_code == 400
+        unicode_digits = client.get("/api/products", query_string={"part_id": "1,²,１"})
+
+    assert response.status_code == 200
+    assert [result["id"] for result in response.json] == [1, 2]
+    assert all(result["stock"] == 5 for result in response.json)
+    assert unicode_digits.status_code == 200
+    assert unicode_digits.json[1:] == [{"id": "²", "error": "Invalid part_id"}, {"id": "１", "error": "Invalid part_id"}]
+
+
+@pytest.mark.parametrize("part_id", ["²", "１", "١٢", "", "-1", "1.5"])
+@patch("api_rest.main.erp.session.get")
+def test_request_product_rejects_non_ascii_digit_ids(mock_get, part_id):
+    with app.test_client() as client:
+        response = client.get("/api/products", query_string={"part_id": part_id})
+
+    assert response.status_code == 400
+    assert response.json == {"error": "Invalid part_id"}
+    mock_get.assert_not_called()
+
+
+def _roster_response(technicians, etag=None):
+    response = requests.Response()
+    response.status_code = 200
+    response._content = json.dumps(technicians).encode()
+    if etag is not None:
+        response.headers["ETag"] = etag
+    return response
+
+
+def _roster(rng, size):
+    # Clustered, with exact duplicates, so many distances tie once rounded
+    centres = [(rng.uniform(-80, 80), rng.uniform(-180, 180)) for _ in range(5)]
+    technicians = []
+    for i in range(size):
+        lat, lon = rng.choice(centres)
+        if rng.random() < 0.8:
+            lat, lon = lat + rng.gauss(0, 0.05), lon + rng.gauss(0, 0.05)
+        technicians.append({"id": i, "name": f"T{i}", "latitude": str(lat), "longitude": lon})
+    return technicians
+
+
+@pytest.mark.parametrize("size", [400, 3000])
+def test_technician_index_ranks_like_a_full_sort(size):
+    rng = random.Random(7)
+    technicians = _roster(rng, size)
+    index = TechnicianIndex(technicians, haversine)
+    for _ in range(50):
+        lat, lon = technicians[rng.randrange(size)]["latitude"], technicians[rng.randrange(size)]["longitude"]
+        lat, lon = float(lat) + rng.gauss(0, 0.02), lon + rng.gauss(0, 0.02)
+        ranked = sorted(technicians, key=lambda t: haversine(lat, lon, float(t["latitude"]), float(t["longitude"])))
+        expected = [(t, haversine(lat, lon, float(t["latitude"]), float(t["longitude"]))) for t in ranked]
+        for k in (1, 2, 7, 60, 500, size + 1):
+            assert index.nearest(lat, lon, k) == expected[:k]
+        radius_km = rng.choice((0.0, 1.0, 5.0, 500.0))
+        within = [(t, d) for t, d in expected if d <= radius_km]
+        assert index.nearest(lat, lon, radius_km=radius_km) == within
+        assert index.nearest(lat, lon, 3, radius_km) == within[:3]
+
+
+def test_vectorized_distances_match_the_haversine_package():
+    rng = random.Random(3)
+    points = [(rng.uniform(-90, 90), rng.uniform(-180, 180)) for _ in range(1000)]
+    positions = distance.Positions([lat for lat, _ in points], [lon for _, lon in points])
+    lat, lon = 41.39, 2.17
+    vectorized = distance.haversine_km(lat, lon, positions)
+    assert vectorized.tolist() == pytest.approx([calculate_distance((lat, lon), point) for point in points], abs=1e-6)
+
+
+@patch("api_rest.main.erp.session.get")
+def test_request_technicians_k_and_radius(mock_get):
+    technicians = [
+        {"id": 1, "name": "Far", "latitude": 10, "longitude": 10},
+        {"id": 2, "name": "Near", "latitude": 0.01, "longitude": 0},
+        {"id": 3, "name": "Nearer", "latitude": 0, "longitude": 0.001},
+    ]
+    mock_get.return_value = _roster_response(technicians)
+    with app.test_client() as client:
+        default = client.get("/api/technicians/nearest?lat=0&lon=0").json
+        one = client.get("/api/technicians/nearest?lat=0&lon=0&k=1").json
+        within = client.get("/api/technicians/nearest?lat=0&lon=0&radius_km=100").json
+        assert client.get("/api/technicians/nearest?lat=0&lon=0&k=0").status_code == 400
+        assert client.get("/api/technicians/nearest?lat=0&lon=0&radius_km=-1").status_code == 400
+
+        technicians.append({"id": 4, "name": "New", "latitude": 0, "longitude": 0})
+        mock_get.return_value = _roster_response(technicians)
+        rebuilt = client.get("/api/technicians/nearest?lat=0&lon=0&k=1").json
+
+    assert default == [{"id": 3, "name": "Nearer", "distance_km": 0.11}, {"id": 2, "name": "Near", "distance_km": 1.11}]
+    assert one == default[:1]
+    assert within == default
+    assert rebuilt == [{"id": 4, "name": "New", "distance_km": 0.0}]
+
+
+@patch("api_rest.main.erp.session.get")
+def test_request_technicians_reuses_the_index_per_roster_version(mock_get):
+    technicians = [{"id": 1, "name": "A", "latitude": 0, "longitude": 0}]
+    with app.test_client() as client:
+        mock_get.return_value = _roster_response(technicians, etag='"v1"')
+        client.get("/api/technicians/nearest?lat=0&lon=0")
+        index = api_main.technician_index
+        # Same version: the body is neither parsed nor indexed again
+        mock_get.return_value = _roster_response([], etag='"v1"')
+        assert client.get("/api/technicians/nearest?lat=0&lon=0").json[0]["id"] == 1
+        assert api_main.technician_index is index
+
+        mock_get.return_value = _roster_response([{"id": 2, "name": "B", "latitude": 1, "longitude": 1}])
+        assert client.get("/api/technicians/nearest?lat=0&lon=0").json[0]["id"] == 2
+        mock_get.return_value = _roster_response([{"id": 2, "name": "B", "latitude": 1, "longitude": 1}])
+        index = api_main.technician_index
+        client.get("/api/technicians/nearest?lat=0&lon=0")
+        assert api_main.technician_index is index
+
+
+@pytest.mark.parametrize("query", [
+    "lat=100&lon=0", "lat=-90.5&lon=0", "lat=0&lon=180.1", "lat=0&lon=-200",
+    "lat=nan&lon=0", "lat=0&lon=nan", "lat=inf&lon=0", "lat=0&lon=-inf",
+])
+@pytest.mark.parametrize("extra", ["", "&radius_km=100"])
+@patch("api_rest.main.erp.session.get")
+def test_request_technicians_rejects_out_of_range_coordinates(mock_get, query, extra):
+    mock_get.return_value = _roster_response([{"id": 1, "name": "A", "latitude": 0, "longitude": 0}])
+    with app.test_client() as client:
+        response = client.get(f"/api/technicians/nearest?{query}{extra}")
+
+    assert response.status_code == 400
+    assert response.json == {"error": "Invalid latitude or longitude"}
+    mock_get.assert_not_called()
+
+
+@patch("api_rest.main.erp.session.get")
+def test_request_technicians_accepts_boundary_coordinates(mock_get):
+    mock_get.return_value = _roster_response([{"id": 1, "name": "A", "latitude": 0, "longitude": 0}])
+    with app.test_client() as client:
+        for query in ("lat=90&lon=180", "lat=-90&lon=-180"):
+            assert client.get(f"/api/technicians/nearest?{query}").status_code == 200
@@ -1,12 +1,38 @@
 from pathlib import Path
 from datetime import date, datetime
+import io
+import time
+import json
+import csv
+import sqlite3
 import os
 
+import pytest
+import yaml
+from pydantic import ValidationError
+
 from data_transformation.main import (
     ConfigLoader,
     Transaction,
     ItemDetail,
     parse_json_to_csv,
+    iter_json_records,
+    process_single_file,
+    compile_alias_map,
+    map_aliases,
+    DateParser,
+    format_price,
+    format_prices,
+    is_unparseable_price,
+    ingest_incremental,
+    create_dedupe_store,
+    report_dedupe_store,
+    ColumnarReader,
+    data_quality,
+    PipelineProfile,
+    IngestDaemon,
+    TrustedSchema,
+    process_files,
 )
 
 data_path = "data_transformation/inputs/records.json"
@@ -31,6 +57,95 @@ def test_status_mapping_in_config():
     assert "Pending" in status_mapping
 
 
+def test_config_loader_caches_compiled_config_as_json(tmp_path, monkeypatch):
+    yaml_file = tmp_path / "config.yml"
+    yaml_file.write_text(Path(config_path).read_text())
+    first = ConfigLoader(yaml_file)
+    cached = list((tmp_path / "__pycache__").glob("config.*.json"))
+    assert len(cached) == 1
+    json.loads(cached[0].read_text())
+
+    def no_parse(*args, **kwargs):
+        raise AssertionError("cached config was parsed again")
+
+    monkeypatch.setattr(yaml, "safe_load", no_parse)
+    second = ConfigLoader(yaml_file)
+    assert second.config == first.config
+    assert second.compiled is second.compiled
+    assert second.compiled.status_lookup == first.compiled.status_lookup
+    assert second.compiled.alias_plans == first.compiled.alias_plans
+    assert second.compiled.date_analysis == first.compiled.date_analysis
+
+    # A changed file misses the cache and replaces the stale entry
+    monkeypatch.undo()
+    yaml_file.write_text(yaml_file.read_text() + "status_casefold: true\n")
+    third = ConfigLoader(yaml_file)
+    assert third.compiled.status_casefold
+    assert list((tmp_path / "__pycache__").glob("config.*.json")) != cached
+    assert len(list((tmp_path / "__pycache__").glob("config.*.json"))) == 1
+
+    # A tampered entry is ignored instead of trusted
+    entry = next((tmp_path / "__pycache__").glob("config.*.json"))
+    entry.write_text(entry.read_text().replace('"status_casefold": true', '"status_casefold": false', 1))
+    assert ConfigLoader(yaml_file).compiled.status_casefold
+
+
+def test_config_loader_keeps_caches_of_configs_sharing_a_prefix(tmp_path):
+    for name in ("config.yml", "config.prod.yml"):
+        (tmp_path / name).write_text(Path(config_path).read_text())
+    ConfigLoader(tmp_path / "config.yml")
+    ConfigLoader(tmp_path / "config.prod.yml")
+    (tmp_path / "config.yml").write_text(Path(config_path).read_text() + "status_casefold: true\n")
+    ConfigLoader(tmp_path / "config.yml")
+    (tmp_path / "config.prod.yml").write_text(Path(config_path).read_text() + "status_casefold: true\n")
+    ConfigLoader(tmp_path / "config.prod.yml")
+    stems = sorted(p.name.rsplit(".", 2)[0] for p in (tmp_path / "__pycache__").glob("*.json"))
+    assert stems == ["config", "config.prod"]
+
+
+def test_set_config_shares_one_compiled_config():
+    config = ConfigLoader(Path(config_path), cache=False)
+    Transaction.set_config(config)
+    ItemDetail.set_config(config)
+    assert Transaction.alias_plan is config.compiled.alias_plans["Transaction"]
+    assert ItemDetail.alias_plan is config.compiled.alias_plans["ItemDetail"]
+
+
+def test_set_config_follows_config_edits():
+    config = ConfigLoader(Path(config_path))
+    try:
+        config.config["status_casefold"] = True
+        Transaction.set_config(config)
+        assert Transaction.map_status(" PAID ") == "Completed"
+        config.config["status_casefold"] = False
+        Transaction.set_config(config)
+        assert Transaction.map_status(" PAID ") == "PAID"
+    finally:
+        Transaction.set_config(ConfigLoader(Path(config_path)))
+
+
+def test_map_status_lookup_matches_mapping_scan():
+    config = ConfigLoader(Path(config_path))
+    Transaction.set_config(config)
+    status_mapping = config.get("status_mapping")
+    values = [v for variations in status_mapping.values() for v in variations] + [" paid ", "PAID", "Unknown", ""]
+    for value in values:
+        expected = next((standard for standard, variations in status_mapping.items() if value.strip() in variations), value.strip())
+        assert Transaction.map_status(value) == expected
+
+
+def test_map_status_casefold_option():
+    config = ConfigLoader(Path(config_path))
+    try:
+        config.config["status_casefold"] = True
+        Transaction.set_config(config)
+        assert Transaction.map_status(" PAID ") == "Completed"
+        assert Transaction.map_status("in progress") == "Pending"
+        assert Transaction.map_status("Refunded") == "Refunded"
+    finally:
+        Transaction.set_config(ConfigLoader(Path(config_path)))
+
+
 def test_transaction_model_valid_data():
     config = ConfigLoader(Path(config_path))
 
@@ -210,4 +325,873 @@ def test_transaction_model_problem_costs_format_valid_data():
     assert txn.customer_name == "John Doe"
     assert txn.purchase_date == date(2024, 1, 10)
     assert txn.total_amount == 1500.75
-    assert txn.status == "Completed"
\ No newline at end of file
+    assert txn.status == "Completed"
+
+def test_iter_json_records_streams_array():
+    with Path(data_path).open("r", encoding="utf-8") as f:
+        expected = json.load(f)
+    # A tiny chunk size forces records to be split across reads
+    with Path(data_path).open("r", encoding="utf-8") as f:
+        records = list(iter_json_records(f, chunk_size=7))
+    assert records == expected
+
+
+def test_iter_json_records_accepts_ndjson():
+    lines = '{"id": 1, "total": 10}\n\n{"id": 2, "total": 2.5}\n'
+    assert list(iter_json_records(io.StringIO(lines), chunk_size=4)) == [
+        {"id": 1, "total": 10},
+        {"id": 2, "total": 2.5},
+    ]
+
+
+def test_iter_json_records_empty_and_malformed_arrays():
+    assert list(iter_json_records(io.StringIO(" [ ] "))) == []
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_records(io.StringIO('[{"id": 1} {"id": 2}]')))
+
+
+def test_iter_json_records_completes_values_cut_at_any_chunk_edge():
+    text = '[{"a": -Infinity, "b": [true, false, null, -12.5e-10], "s": "x\\ud83d\\ude00\\"y"}, {"id": 2}]'
+    for chunk_size in range(1, 12):
+        assert list(iter_json_records(io.StringIO(text), chunk_size=chunk_size)) == json.loads(text)
+
+
+def test_iter_json_records_raises_malformed_record_without_reading_on():
+    text = '[{"id": 1}, {"id": 2,, "total": 1}, ' + ", ".join(['{"id": 3}'] * 10000) + "]"
+    stream = io.StringIO(text)
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_records(stream, chunk_size=64))
+    assert stream.tell() < 256
+
+
+def test_process_single_file_ndjson(tmp_path):
+    source = tmp_path / "records.jsonl"
+    with Path(data_path).open("r", encoding="utf-8") as f:
+        source.write_text("\n".join(json.dumps(r) for r in json.load(f)))
+
+    transaction_file = tmp_path / "transactions.csv"
+    details_file = tmp_path / "details.csv"
+    process_single_file(source, transaction_file, details_file, ConfigLoader(Path(config_path)))
+
+    with transaction_file.open("r") as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 9  # header + 8 unique transactions
+    assert lines[1] == "1,John Doe,2024-01-10,1200.5,Completed"
+
+
+def test_compile_alias_map_presplits_nested_aliases():
+    plan = compile_alias_map({"customer_name": ["customer", "buyer.full_name"]})
+    assert plan == (("customer_name", ("customer", ("buyer", "full_name"), "customer_name"), True),)
+
+
+def test_map_aliases_skips_nested_alias_on_non_dict():
+    config = ConfigLoader(Path(config_path))
+    Transaction.set_config(config)
+    mapped = map_aliases(
+        {"ID": 2, "buyer": "not a dict", "client": {"first_name": "Jane"}, "status": "Paid"},
+        Transaction.alias_plan,
+    )
+    assert mapped == {
+        "transaction_id": 2,
+        "customer_name": {"first_name": "Jane"},
+        "status": "Paid",
+    }
+
+
+def test_shape_cache_reuses_plan_per_key_set():
+    config = ConfigLoader(Path(config_path))
+    Transaction.set_config(config)
+    cache = Transaction.shape_cache
+
+    first = cache.map({"ID": 1, "client": "Ann", "date": "10/02/24", "amount": "1", "status": "Paid"})
+    # Same key set in a different order hits the cached plan
+    second = cache.map({"status": "Pending", "amount": "2", "date": "11/02/24", "client": "Bob", "ID": 2})
+    assert first["customer_name"] == "Ann" and first["purchase_date"] == "10/02/24"
+    assert second == {
+        "transaction_id": 2,
+        "customer_name": "Bob",
+        "purchase_date": "11/02/24",
+        "total_amount": "2",
+        "status": "Pending",
+    }
+    info = cache.cache_info()
+    assert (info.hits, info.misses) == (1, 1)
+
+
+def test_shape_cache_checks_nested_alias_per_record():
+    config = ConfigLoader(Path(config_path))
+    Transaction.set_config(config)
+    cache = Transaction.shape_cache
+
+    nested = cache.map({"order_no": "4", "buyer": {"full_name": "Alice"}, "client": "Fallback"})
+    flat = cache.map({"order_no": "5", "buyer": "no nested name", "client": "Fallback"})
+    assert nested["customer_name"] == "Alice"
+    assert flat["customer_name"] == "Fallback"
+    assert cache.cache_info().misses == 1
+
+
+def test_parse_json_to_csv_parallel_matches_serial(tmp_path):
+    with Path(data_path).open("r", encoding="utf-8") as f:
+        records = json.load(f) * 3  # repeats exercise dedupe across chunks
+    config = ConfigLoader(Path(config_path))
+    config.config["parallel"] = {"workers": 2, "chunk_size": 4}
+
+    parse_json_to_csv(records, tmp_path / "t_serial.csv", tmp_path / "d_serial.csv", config, workers=1)
+    parse_json_to_csv(iter(records), tmp_path / "t_parallel.csv", tmp_path / "d_parallel.csv", config)
+
+    assert (tmp_path / "t_parallel.csv").read_text() == (tmp_path / "t_serial.csv").read_text()
+    assert (tmp_path / "d_parallel.csv").read_text() == (tmp_path / "d_serial.csv").read_text()
+
+
+def test_parse_json_to_csv_parallel_raises_at_invalid_record(tmp_path):
+    records = [
+        {"id": 1, "customer": "Ann", "purchase_date": "2024-01-10", "total_amount": "5", "status": "Paid",
+         "items": [{"item": "Pen", "quantity": 1, "price": "5"}]},
+        {"id": "no digits", "customer": "Bob", "total_amount": "6", "status": "Paid"},
+    ]
+    config = ConfigLoader(Path(config_path))
+    config.config["quality"] = {"on_error": "raise"}
+    with pytest.raises(ValidationError):
+        parse_json_to_csv(records, tmp_path / "t.csv", tmp_path / "d.csv", config, workers=2)
+    assert (tmp_path / "d.csv").read_text().splitlines()[1] == "1,1,Pen,1,5.0"
+
+
+def test_date_parser_keeps_configured_format_priority():
+    parser = DateParser(ConfigLoader(Path(config_path)).get("date_formats"))
+    # Also valid for '%d/%m/%Y' (year 24), but '%d/%m/%y' is listed first
+    assert parser.parse("10/02/24") == date(2024, 2, 10)
+    assert parser.parse("10/02/2024") == date(2024, 2, 10)
+    assert parser.parse("March 6, 2024") == date(2024, 3, 6)
+    assert parser.parse("2024.03.05") == date(2024, 3, 5)
+    # Out of range for the fast path, then rejected by every other format
+    with pytest.raises(ValueError, match="Unable to parse '2024-13-01' as a date"):
+        parser.parse("2024-13-01")
+
+
+def test_date_parser_memoizes_repeated_dates():
+    parser = DateParser(["%Y-%m-%d", "%B %d, %Y"], cache_size=8)
+    for _ in range(3):
+        assert parser.parse("March 6, 2024") == date(2024, 3, 6)
+    info = parser.cache_info()
+    assert (info.hits, info.misses) == (2, 1)
+    assert parser.hits["%B %d, %Y"] == 1
+
+
+def test_format_prices_matches_scalar_format_price():
+    raw = ["1,200.50€", "€1.500,75", "1 250.50 EUR", "870", "n/a", 780.256, 5, None] * 4
+    assert format_prices(raw) == [format_price(value) for value in raw]
+    assert format_prices(raw)[:8] == [1200.5, 1500.75, 1250.5, 870.0, 0.0, 780.26, 5.0, 0.0]
+
+
+def test_format_prices_vectorized_rounding_matches_round():
+    # Halfway cases where np.round and round() disagree
+    values = [529.245, 3487.045, 1100.935, 2620.955] * 10
+    assert format_prices(values) == [round(v, 2) for v in values]
+    assert format_prices([str(v) for v in values]) == [round(v, 2) for v in values]
+
+
+def test_format_prices_keeps_unparseable_flags_when_cache_overflows(monkeypatch):
+    monkeypatch.setattr("data_transformation.main.PRICE_CACHE_SIZE", 4)
+    assert format_prices(["n/a", "1.00", "2.00"]) == [0.0, 1.0, 2.0]
+    # "n/a" is a cache hit, then the new literals overflow the cache
+    assert format_prices(["n/a", "3.00", "4.00"]) == [0.0, 3.0, 4.0]
+    assert is_unparseable_price("n/a")
+
+
+def test_parse_json_to_csv_columnar_matches_models(tmp_path):
+    with Path(data_path).open("r", encoding="utf-8") as f:
+        records = json.load(f)
+    records += [
+        {"id": "010", "client": {"customer": " Kept  As Is "}, "date": "2024-01-11", "amount": 5,
+         "items": [{"item": "Pen", "qty": "3", "price": "1,5"}, {"item": None, "quantity": "x", "price": None}],
+         "status": "weird"},
+        {"id": 11, "customer": None, "date": "2024-01-12", "amount": "7", "status": "Paid"},
+    ]
+    config = ConfigLoader(Path(config_path))
+
+    parse_json_to_csv(records, tmp_path / "t_models.csv", tmp_path / "d_models.csv", config, validation="models")
+    parse_json_to_csv(records, tmp_path / "t_columnar.csv", tmp_path / "d_columnar.csv", config, validation="columnar")
+
+    assert (tmp_path / "t_columnar.csv").read_text() == (tmp_path / "t_models.csv").read_text()
+    assert (tmp_path / "d_columnar.csv").read_text() == (tmp_path / "d_models.csv").read_text()
+
+
+def test_parse_json_to_csv_columnar_quarantines_invalid_record(tmp_path):
+    records = [
+        {"id": 1, "customer": "Ann", "purchase_date": "2024-01-10", "total_amount": "5", "status": "Paid"},
+        {"id": 2, "customer": "Bob", "purchase_date": "not a date", "total_amount": "6", "status": "Paid"},
+        {"id": 3, "customer": "Cid", "purchase_date": "2024-01-12", "total_amount": "7", "status": "Paid"},
+    ]
+    config = ConfigLoader(Path(config_path))
+    config.config["quality"] = {"quarantine": str(tmp_path / "quarantine.jsonl")}
+    parse_json_to_csv(records, tmp_path / "t.csv", tmp_path / "d.csv", config, validation="columnar")
+    assert (tmp_path / "t.csv").read_text().splitlines()[1:] == ["1,Ann,2024-01-10,5.0,Completed", "3,Cid,2024-01-12,7.0,Completed"]
+    quarantined = [json.loads(line) for line in (tmp_path / "quarantine.jsonl").read_text().splitlines()]
+    assert [(entry["model"], entry["record"]["id"]) for entry in quarantined] == [("Transaction", 2)]
+    assert "Unable to parse 'not a date' as a date" in quarantined[0]["error"]
+
+
+def test_quarantine_keeps_rejects_of_earlier_runs(tmp_path):
+    config = ConfigLoader(Path(config_path))
+    config.config["quality"] = {"quarantine": str(tmp_path / "quarantine.jsonl")}
+    for record_id in (1, 2):
+        record = {"id": record_id, "customer": "Ann", "purchase_date": "not a date", "total_amount": "5", "status": "Paid"}
+        parse_json_to_csv([record], tmp_path / "t.csv", tmp_path / "d.csv", config)
+    quarantined = [json.loads(line) for line in (tmp_path / "quarantine.jsonl").read_text().splitlines()]
+    assert [entry["record"]["id"] for entry in quarantined] == [1, 2]
+    assert quarantined[0]["run"] != quarantined[1]["run"]
+
+
+def _checkpoint_config(tmp_path, every):
+    with Path(config_path).open("r", encoding="utf-8") as f:
+        settings = yaml.safe_load(f)
+    settings["checkpoint"] = {"enabled": True, "manifest": str(tmp_path / "manifest.json"), "every": every}
+    path = tmp_path / "config.yml"
+    path.write_text(yaml.safe_dump(settings), encoding="utf-8")
+    return ConfigLoader(path)
+
+
+def test_ingest_incremental_resumes_after_crash(tmp_path, monkeypatch):
+    from data_transformation import main
+
+    with Path(data_path).open("r", encoding="utf-8") as f:
+        records = json.load(f)
+    source = tmp_path / "records.json"
+    source.write_text(json.dumps(records, indent=2, ensure_ascii=False), encoding="utf-8")
+    config = _checkpoint_config(tmp_path, every=2)
+
+    parse_json_to_csv(records, tmp_path / "t_full.csv", tmp_path / "d_full.csv", config)
+
+    # Crash after five records: the fifth is written past the last checkpoint
+    calls = []
+    dedupe_key = main.dedupe_key
+
+    def crashing_key(transaction_data):
+        calls.append(transaction_data)
+        if len(calls) == 5:
+            raise RuntimeError("crash")
+        return dedupe_key(transaction_data)
+
+    monkeypatch.setattr(main, "dedupe_key", crashing_key)
+    with pytest.raises(RuntimeError):
+        ingest_incremental([source], tmp_path / "t.csv", tmp_path / "d.csv", config)
+    monkeypatch.undo()
+
+    entry = json.loads((tmp_path / "manifest.json").read_text())["inputs"][str(source)]
+    assert (entry["records"], entry["complete"]) == (4, False)
+
+    ingest_incremental([source], tmp_path / "t.csv", tmp_path / "d.csv", config)
+
+    assert (tmp_path / "t.csv").read_text() == (tmp_path / "t_full.csv").read_text()
+    assert (tmp_path / "d.csv").read_text() == (tmp_path / "d_full.csv").read_text()
+
+
+def test_ingest_incremental_skips_unchanged_inputs(tmp_path, monkeypatch):
+    from data_transformation import main
+
+    first = tmp_path / "first.jsonl"
+    second = tmp_path / "second.jsonl"
+    first_records = [
+        {"id": 1, "customer": "Ann", "date": "2024-01-10", "amount": "5", "status": "Paid", "items": [{"item": "Pen", "qty": 1, "price": "5"}]},
+        {"id": 2, "customer": "Bob", "date": "2024-01-11", "amount": "6", "status": "Pending"},
+    ]
+    second_records = [
+        # Duplicate of the first record of the first file
+        {"id": 3, "customer": "Cid", "date": "2024-01-10", "amount": 5.0, "status": "complete"},
+        {"id": 4, "customer": "Dee", "date": "2024-01-12", "amount": "7", "status": "Paid", "items": [{"item": "Ink", "qty": 2, "price": "3.5"}]},
+    ]
+    first.write_text("\n".join(json.dumps(r) for r in first_records), encoding="utf-8")
+    config = _checkpoint_config(tmp_path, every=1)
+
+    ingest_incremental([first], tmp_path / "t.csv", tmp_path / "d.csv", config)
+    second.write_text("\n".join(json.dumps(r) for r in second_records), encoding="utf-8")
+
+    hashed = []
+    monkeypatch.setattr(main, "file_sha256", lambda path: hashed.append(path) or main.hashlib.sha256(path.read_bytes()).hexdigest())
+    ingest_incremental([first, second], tmp_path / "t.csv", tmp_path / "d.csv", config)
+    assert hashed == [second]
+
+    parse_json_to_csv(first_records + second_records, tmp_path / "t_full.csv", tmp_path / "d_full.csv", config)
+    assert (tmp_path / "t.csv").read_text() == (tmp_path / "t_full.csv").read_text()
+    assert (tmp_path / "d.csv").read_text() == (tmp_path / "d_full.csv").read_text()
+
+
+
+def test_ingest_incremental_keeps_empty_status_duplicates_after_resume(tmp_path):
+    first = tmp_path / "first.jsonl"
+    second = tmp_path / "second.jsonl"
+    record = {"id": 1, "customer": "Ann", "date": "2024-01-10", "amount": "5", "status": ""}
+    first.write_text(json.dumps(record), encoding="utf-8")
+    second.write_text(json.dumps(dict(record, id=2, customer="Bob")), encoding="utf-8")
+    config = _checkpoint_config(tmp_path, every=1)
+
+    ingest_incremental([first], tmp_path / "t.csv", tmp_path / "d.csv", config)
+    ingest_incremental([first, second], tmp_path / "t.csv", tmp_path / "d.csv", config)
+    assert (tmp_path / "t.csv").read_text().splitlines()[1:] == ["1,Ann,2024-01-10,5.0,"]
+
+
+def test_ingest_incremental_persists_dedupe_keys_across_runs(tmp_path, monkeypatch):
+    from data_transformation import main
+
+    inputs = []
+    for i, record in enumerate([
+        {"id": 1, "customer": "Ann", "date": "2024-01-10", "amount": "5", "status": "Paid"},
+        {"id": 2, "customer": "Bob", "date": "2024-01-10", "amount": "5", "status": "Paid"},
+        {"id": 3, "customer": "Cid", "date": "2024-01-11", "amount": "6", "status": "Paid"},
+    ]):
+        inputs.append(tmp_path / f"in{i}.jsonl")
+        inputs[-1].write_text(json.dumps(record), encoding="utf-8")
+    config = _checkpoint_config(tmp_path, every=1)
+    ingest_incremental(inputs[:1], tmp_path / "t.csv", tmp_path / "d.csv", config)
+    assert (tmp_path / "manifest.dedupe.sqlite").exists()
+
+    def no_reread(*args):
+        raise AssertionError("transactions output was read again")
+
+    monkeypatch.setattr(main, "_load_written_transactions", no_reread)
+    ingest_incremental(inputs[:2], tmp_path / "t.csv", tmp_path / "d.csv", config)
+    monkeypatch.undo()
+    assert len((tmp_path / "t.csv").read_text().splitlines()) == 2
+
+    # A missing store, or one committed for other outputs, is rebuilt from the CSV
+    (tmp_path / "manifest.dedupe.sqlite").unlink()
+    store = main.SQLiteDedupeStore(tmp_path / "manifest.dedupe.sqlite", keep=True)
+    store.commit("stale")
+    store.close()
+    rebuilt = []
+    load_written = main._load_written_transactions
+    monkeypatch.setattr(main, "_load_written_transactions", lambda path, store: rebuilt.append(path) or load_written(path, store))
+    ingest_incremental(inputs, tmp_path / "t.csv", tmp_path / "d.csv", config)
+    assert rebuilt == [tmp_path / "t.csv"]
+    assert [line.split(",")[0] for line in (tmp_path / "t.csv").read_text().splitlines()[1:]] == ["1", "3"]
+
+
+def test_ingest_incremental_refuses_outputs_extended_by_another_run(tmp_path):
+    source = tmp_path / "records.jsonl"
+    source.write_text(json.dumps({"id": 1, "customer": "Ann", "date": "2024-01-10", "amount": "5", "status": "Paid"}), encoding="utf-8")
+    config = _checkpoint_config(tmp_path, every=1)
+    ingest_incremental([source], tmp_path / "t.csv", tmp_path / "d.csv", config)
+
+    with (tmp_path / "t.csv").open("a", encoding="utf-8") as f:
+        f.write("9,Zed,2024-02-01,9.0,Completed\r\n")
+    extended = (tmp_path / "t.csv").read_text()
+    with pytest.raises(ValueError, match="refusing to truncate"):
+        ingest_incremental([source], tmp_path / "t.csv", tmp_path / "d.csv", config)
+    assert (tmp_path / "t.csv").read_text() == extended
+
+    (tmp_path / "t.csv").write_text("id,name\r\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="header"):
+        ingest_incremental([source], tmp_path / "t.csv", tmp_path / "d.csv", config)
+
+@pytest.mark.parametrize("backend", ["digest", "sqlite", "bloom"])
+def test_dedupe_backends_match_tuple_store(tmp_path, backend):
+    with Path(data_path).open("r", encoding="utf-8") as f:
+        records = json.load(f)
+    # Same values under another id and name are duplicates; a changed amount is not
+    records += [dict(record, id=100 + i, customer="Someone Else") for i, record in enumerate(records)]
+    records += [dict(records[0], id=200, amount=12345)]
+    config = _checkpoint_config(tmp_path, every=1)
+    config.config["dedupe"] = {"backend": backend, "bloom_capacity": 4, "bloom_error_rate": 0.5}
+
+    parse_json_to_csv(records, tmp_path / "t.csv", tmp_path / "d.csv", config)
+    config.config["dedupe"] = {"backend": "tuple"}
+    parse_json_to_csv(records, tmp_path / "t_tuple.csv", tmp_path / "d_tuple.csv", config)
+
+    assert (tmp_path / "t.csv").read_text() == (tmp_path / "t_tuple.csv").read_text()
+    assert (tmp_path / "d.csv").read_text() == (tmp_path / "d_tuple.csv").read_text()
+
+
+def test_dedupe_store_reports_memory_per_million(tmp_path):
+    config = _checkpoint_config(tmp_path, every=1)
+    config.config["dedupe"] = {"backend": "digest"}
+    store = create_dedupe_store(config)
+    for i in range(1000):
+        assert store.add((("purchase_date", date(2024, 1, 1)), ("total_amount", float(i)), ("status", "Completed")))
+    assert not store.add((("purchase_date", date(2024, 1, 1)), ("total_amount", 0.0), ("status", "Completed")))
+    assert len(store) == 1000
+    assert "1000 unique transactions" in report_dedupe_store(store)
+    assert "per million" in report_dedupe_store(store)
+
+
+def test_parse_json_to_csv_sqlite_sink_matches_csv(tmp_path):
+    with Path(data_path).open("r", encoding="utf-8") as f:
+        records = json.load(f)
+    config = ConfigLoader(Path(config_path))
+    config.config["output"] = dict(config.get("output"), sqlite={"database": str(tmp_path / "erp.db"), "batch_size": 3})
+
+    parse_json_to_csv(records, tmp_path / "t.csv", tmp_path / "d.csv", config)
+    parse_json_to_csv(records, tmp_path / "unused_t.csv", tmp_path / "unused_d.csv", config, sink="sqlite")
+    assert not (tmp_path / "unused_t.csv").exists()
+
+    connection = sqlite3.connect(tmp_path / "erp.db")
+    try:
+        for table, path in (("Transactions", tmp_path / "t.csv"), ("TransactionDetails", tmp_path / "d.csv")):
+            with path.open("r", newline="", encoding="utf-8") as f:
+                expected = [tuple(row.values()) for row in csv.DictReader(f)]
+            loaded = [tuple("" if value is None else str(value) for value in row) for row in connection.execute(f"SELECT * FROM {table} ORDER BY rowid")]
+            assert loaded == expected
+        indexes = {name for name, in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert "idx_Transactions_purchase_date" in indexes and "idx_TransactionDetails_transaction_id" in indexes
+    finally:
+        connection.close()
+
+
+def test_sqlite_sink_rolls_back_failed_load(tmp_path):
+    config = ConfigLoader(Path(config_path))
+    config.config["output"] = {"sink": "sqlite", "sqlite": {"database": str(tmp_path / "erp.db")}}
+    config.config["quality"] = {"on_error": "raise"}
+    good = [{"id": 1, "customer": "Ann", "date": "2024-01-10", "amount": "5", "status": "Paid"}]
+    bad = good + [{"id": 2, "customer": "Bob", "date": "not a date", "amount": "6", "status": "Paid"}]
+
+    parse_json_to_csv(good, tmp_path / "t.csv", tmp_path / "d.csv", config)
+    with pytest.raises(ValidationError):
+        parse_json_to_csv(bad, tmp_path / "t.csv", tmp_path / "d.csv", config)
+
+    connection = sqlite3.connect(tmp_path / "erp.db")
+    try:
+        assert connection.execute("SELECT * FROM Transactions").fetchall() == [(1, "Ann", "2024-01-10", 5.0, "Completed")]
+    finally:
+        connection.close()
+
+
+def test_sqlite_sink_loads_durably_unless_unsafe_is_opted_in(tmp_path):
+    from data_transformation.main import SQLiteSink
+
+    database = str(tmp_path / "erp.db")
+    with SQLiteSink({"database": database, "indexes": {}}, ["transaction_id"], ["details_id"]) as sink:
+        assert sink.connection.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+        assert sink.connection.execute("PRAGMA synchronous").fetchone() == (1,)  # NORMAL
+
+    with pytest.raises(ValueError, match="unsafe_fast_load"):
+        SQLiteSink({"database": database, "pragmas": {"synchronous": "OFF"}}, ["transaction_id"], ["details_id"])
+    unsafe = SQLiteSink({"database": database, "unsafe_fast_load": True}, ["transaction_id"], ["details_id"])
+    assert unsafe.pragmas["journal_mode"] == "MEMORY" and unsafe.pragmas["synchronous"] == "OFF"
+
+
+def test_sqlite_sink_quarantines_ids_beyond_int64(tmp_path):
+    config = ConfigLoader(Path(config_path))
+    config.config["output"] = {"sqlite": {"database": str(tmp_path / "erp.db")}}
+    config.config["quality"] = {"quarantine": str(tmp_path / "quarantine.jsonl")}
+    records = [
+        {"id": "ORDER-" + "9" * 25, "customer": "Ann", "date": "2024-01-10", "amount": "5", "status": "Paid",
+         "items": [{"item": "Pen", "qty": 1, "price": "5"}]},
+        {"id": 2, "customer": "Bob", "date": "2024-01-11", "amount": "6", "status": "Paid",
+         "items": [{"item": "Ink", "qty": 1, "price": "6"}]},
+    ]
+    parse_json_to_csv(records, tmp_path / "t.csv", tmp_path / "d.csv", config, sink="sqlite")
+
+    connection = sqlite3.connect(tmp_path / "erp.db")
+    try:
+        assert connection.execute("SELECT transaction_id FROM Transactions").fetchall() == [(2,)]
+        assert connection.execute("SELECT transaction_id, item FROM TransactionDetails").fetchall() == [(2, "Ink")]
+    finally:
+        connection.close()
+    quarantined = [json.loads(line) for line in (tmp_path / "quarantine.jsonl").read_text().splitlines()]
+    assert [entry["model"] for entry in quarantined] == ["Transaction", "ItemDetail"]
+    assert all("64-bit" in entry["error"] for entry in quarantined)
+
+
+def test_columnar_sink_round_trips_csv_output(tmp_path):
+    with Path(data_path).open("r", encoding="utf-8") as f:
+        records = json.load(f)
+    records.append({"id": 99, "customer": None, "purchase_date": None, "amount": "3", "status": "Paid"})
+    config = ConfigLoader(Path(config_path))
+    config.config["output"] = dict(
+        config.get("output"),
+        columnar={"transactions": str(tmp_path / "t.cols"), "details": str(tmp_path / "d.cols")},
+    )
+
+    parse_json_to_csv(records, tmp_path / "t.csv", tmp_path / "d.csv", config, sink=["csv", "columnar"])
+
+    transactions = ColumnarReader(tmp_path / "t.cols")
+    with (tmp_path / "t.csv").open("r", newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert len(transactions) == len(rows)
+    assert transactions["transaction_id"].tolist() == [int(row["transaction_id"]) for row in rows]
+    assert transactions["total_amount"].tolist() == [float(row["total_amount"]) for row in rows]
+    assert [str(d) if d == d else "" for d in transactions["purchase_date"]] == [row["purchase_date"] for row in rows]
+    assert transactions.decode("status").tolist() == [row["status"] for row in rows]
+    assert transactions.decode("customer_name").tolist() == [row["customer_name"] for row in rows]
+    # Columns are views over the mapped file, not copies
+    assert not transactions["total_amount"].flags.owndata
+
+    details = ColumnarReader(tmp_path / "d.cols")
+    with (tmp_path / "d.csv").open("r", newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert details["quantity"].tolist() == [int(row["quantity"]) for row in rows]
+    assert details["price"].tolist() == [float(row["price"]) for row in rows]
+    assert details.decode("item").tolist() == [row["item"] for row in rows]
+
+
+def test_columnar_sink_quarantines_ids_beyond_int64(tmp_path):
+    config = ConfigLoader(Path(config_path))
+    config.config["output"] = {"columnar": {"transactions": str(tmp_path / "t.cols"), "details": str(tmp_path / "d.cols")}}
+    config.config["quality"] = {"quarantine": str(tmp_path / "quarantine.jsonl")}
+    records = [
+        {"id": "ORDER-" + "9" * 25, "customer": "Ann", "date": "2024-01-10", "amount": "5", "status": "Paid",
+         "items": [{"item": "Pen", "qty": 1, "price": "5"}]},
+        {"id": 2, "customer": "Bob", "date": "2024-01-11", "amount": "6", "status": "Paid",
+         "items": [{"item": "Ink", "qty": 1, "price": "6"}]},
+    ]
+    parse_json_to_csv(records, tmp_path / "t.csv", tmp_path / "d.csv", config, sink=["csv", "columnar"])
+
+    # The CSV keeps every row; the columnar files only those that fit
+    assert len((tmp_path / "t.csv").read_text().splitlines()) == 3
+    assert ColumnarReader(tmp_path / "t.cols")["transaction_id"].tolist() == [2]
+    assert ColumnarReader(tmp_path / "d.cols")["transaction_id"].tolist() == [2]
+    quarantined = [json.loads(line) for line in (tmp_path / "quarantine.jsonl").read_text().splitlines()]
+    assert [entry["model"] for entry in quarantined] == ["Transaction", "ItemDetail"]
+
+
+@pytest.mark.parametrize("options", [{"validation": "models"}, {"validation": "columnar"}, {"workers": 2}])
+def test_data_quality_counts_and_quarantine_match_across_modes(tmp_path, options, caplog):
+    records = [
+        {"id": 1, "customer": None, "date": "2024-01-10", "amount": "5", "status": "Paid",
+         "items": [{"item": None, "qty": "x", "price": "1"}, "not an item", {"item": "Pen", "qty": 2, "price": "3"}]},
+        {"id": "no digits", "customer": "Bob", "date": "2024-01-11", "amount": "6", "status": "Paid"},
+    ] + [
+        {"id": i, "customer": "Ann", "date": f"2024-02-{i:02d}", "amount": None, "status": "Paid", "items": [{"item": 5, "qty": 1, "price": "2"}]}
+        for i in range(1, 21)
+    ]
+    config = ConfigLoader(Path(config_path))
+    config.config["quality"] = {"quarantine": str(tmp_path / "quarantine.jsonl"), "log_first": 2, "log_every": 10}
+
+    with caplog.at_level("WARNING", logger="data_transformation.main"):
+        parse_json_to_csv(records, tmp_path / "t.csv", tmp_path / "d.csv", config, **options)
+
+    assert dict(data_quality.counts) == {
+        ("Transaction", "customer_name", "missing"): 1,
+        ("Transaction", "total_amount", "missing"): 20,
+        ("Transaction", "transaction_id", "rejected"): 1,
+        ("ItemDetail", "item", "missing"): 1,
+        ("ItemDetail", "item", "invalid"): 20,
+        ("ItemDetail", "quantity", "invalid"): 1,
+        ("ItemDetail", "record", "rejected"): 1,
+    }
+    quarantined = [json.loads(line) for line in (tmp_path / "quarantine.jsonl").read_text().splitlines()]
+    assert [(entry["model"], entry["record"]) for entry in quarantined] == [("ItemDetail", "not an item"), ("Transaction", records[1])]
+    assert (tmp_path / "d.csv").read_text().splitlines()[1:3] == ["1,1,Unknown Item,1,1.0", "2,1,Pen,2,3.0"]
+    if "workers" not in options:
+        # Two sampled lines plus the 10th and 20th occurrence instead of one per value
+        assert sum("total_amount missing" in message for message in caplog.messages) == 4
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_profile_reports_stage_timings(tmp_path, workers):
+    with Path(data_path).open("r", encoding="utf-8") as f:
+        records = json.load(f)
+    config = ConfigLoader(Path(config_path))
+    config.config["profile"] = {"enabled": True, "tracemalloc": True, "report": str(tmp_path / "profile.json")}
+
+    parse_json_to_csv(records, tmp_path / "t.csv", tmp_path / "d.csv", config, workers=workers)
+
+    report = json.loads((tmp_path / "profile.json").read_text())
+    stages = report["stages"]
+    written = len((tmp_path / "t.csv").read_text().splitlines()) - 1
+    details = len((tmp_path / "d.csv").read_text().splitlines()) - 1
+    assert report["records"] == len(records)
+    assert stages["decode"]["calls"] == len(records)
+    assert stages["dedupe"]["calls"] == len(records)
+    assert stages["write"]["calls"] == written + details
+    assert ("alias (workers)" if workers > 1 else "alias") in stages
+    assert report["tracemalloc_peak_bytes"] > 0
+    # Stages measured in this process are charged once each, so they fit in the run
+    assert sum(stage["wall_seconds"] for name, stage in stages.items() if "workers" not in name) <= report["wall_seconds"]
+
+
+def test_profile_times_staged_writes_on_the_writer_thread(tmp_path):
+    with Path(data_path).open("r", encoding="utf-8") as f:
+        records = json.load(f)
+    config = ConfigLoader(Path(config_path))
+    config.config["pipeline"] = {"mode": "staged", "batch_size": 2}
+    config.config["profile"] = {"enabled": True, "report": str(tmp_path / "profile.json")}
+
+    parse_json_to_csv(records, tmp_path / "t.csv", tmp_path / "d.csv", config)
+
+    stages = json.loads((tmp_path / "profile.json").read_text())["stages"]
+    rows = len((tmp_path / "t.csv").read_text().splitlines()) + len((tmp_path / "d.csv").read_text().splitlines()) - 2
+    assert stages["write"]["calls"] == rows
+    # Every hand-over batch reaches its writers in one writerows call per run of rows
+    assert 0 < stages["write (writer thread)"]["calls"] <= rows
+    assert stages["write (writer thread)"]["wall_seconds"] > 0
+
+
+def test_profile_charges_nested_stages_once():
+    profile = PipelineProfile()
+    inner = profile.timed_call("inner", lambda: time.sleep(0.01))
+    outer = profile.timed_call("outer", lambda: [inner() for _ in range(3)])
+    profile.start()
+    outer()
+    profile.stop()
+    report = profile.report()
+    assert report["stages"]["inner"]["calls"] == 3
+    assert report["stages"]["inner"]["wall_seconds"] >= 0.03
+    assert report["stages"]["outer"]["wall_seconds"] < 0.01
+
+
+def test_ingest_daemon_processes_dropped_files(tmp_path):
+    with Path(config_path).open("r", encoding="utf-8") as f:
+        settings = yaml.safe_load(f)
+    settings["daemon"] = {
+        "input_dir": str(tmp_path / "inbox"),
+        "done_dir": str(tmp_path / "done"),
+        "failed_dir": str(tmp_path / "failed"),
+        "output_dir": str(tmp_path / "stream"),
+        "latency_log": str(tmp_path / "latency.jsonl"),
+        "workers": 1,
+        "rotate_seconds": 0,
+    }
+    settings["quality"]["quarantine"] = str(tmp_path / "quarantine.jsonl")
+    (tmp_path / "config.yml").write_text(yaml.safe_dump(settings), encoding="utf-8")
+    config = ConfigLoader(tmp_path / "config.yml")
+
+    records = [
+        {"id": 1, "customer": "Ann", "date": "2024-01-10", "amount": "5", "status": "Paid", "items": [{"item": "Pen", "qty": 1, "price": "5"}]},
+        {"id": 2, "customer": "Bob", "date": "2024-01-11", "amount": "6", "status": "Pending", "items": [{"item": "Ink", "qty": 2, "price": "3"}]},
+    ]
+    daemon = IngestDaemon(config)
+    try:
+        (tmp_path / "inbox" / "a.json").write_text(json.dumps(records[:1]), encoding="utf-8")
+        (tmp_path / "inbox" / "b.json").write_text("\n".join(json.dumps(r) for r in records), encoding="utf-8")
+        (tmp_path / "inbox" / "c.json").write_text("[{", encoding="utf-8")
+        daemon.poll()
+        # Files are only picked up once they are unchanged between two polls
+        assert not daemon.pending
+        daemon.poll()
+        # Only workers * 2 files are in flight at once, the last one waits for the next poll
+        assert len(daemon.pending) == 2
+        daemon.drain()
+        daemon.poll()
+        daemon.drain()
+    finally:
+        daemon.close()
+
+    assert sorted(p.name for p in (tmp_path / "done").iterdir()) == ["a.json", "b.json"]
+    assert [p.name for p in (tmp_path / "failed").iterdir()] == ["c.json"]
+    assert len(daemon.latencies) == 2
+    assert len((tmp_path / "latency.jsonl").read_text().splitlines()) == 2
+
+    # Both files share one segment, so the duplicate check and details_id span them
+    parse_json_to_csv(records, tmp_path / "t.csv", tmp_path / "d.csv", config)
+    [transactions] = (tmp_path / "stream").glob("transactions-*.csv")
+    [details] = (tmp_path / "stream").glob("details-*.csv")
+    assert transactions.read_text() == (tmp_path / "t.csv").read_text()
+    assert details.read_text() == (tmp_path / "d.csv").read_text()
+
+
+def test_ingest_daemon_survives_failures_and_only_moves_finalized_inputs(tmp_path, monkeypatch):
+    from data_transformation import main
+
+    with Path(config_path).open("r", encoding="utf-8") as f:
+        settings = yaml.safe_load(f)
+    settings["daemon"] = {
+        "input_dir": str(tmp_path / "inbox"),
+        "done_dir": str(tmp_path / "done"),
+        "failed_dir": str(tmp_path / "failed"),
+        "output_dir": str(tmp_path / "stream"),
+        "workers": 1,
+        "rotate_seconds": 0,
+    }
+    settings["quality"] = {"on_error": "raise", "quarantine": str(tmp_path / "quarantine.jsonl")}
+    (tmp_path / "config.yml").write_text(yaml.safe_dump(settings), encoding="utf-8")
+    config = ConfigLoader(tmp_path / "config.yml")
+    (tmp_path / "stream").mkdir()
+    (tmp_path / "stream" / "transactions-old.csv.part").write_text("orphan")
+
+    good = {"id": 1, "customer": "Ann", "date": "2024-01-10", "amount": "5", "status": "Paid"}
+    daemon = IngestDaemon(config)
+    assert not list((tmp_path / "stream").iterdir())
+    write_records = main.write_records
+
+    def failing_write(validated, *args, **kwargs):
+        validated = list(validated)
+        if validated and validated[0][0]["transaction_id"] == 3:
+            raise RuntimeError("disk full")
+        return write_records(iter(validated), *args, **kwargs)
+
+    monkeypatch.setattr(main, "write_records", failing_write)
+    try:
+        (tmp_path / "inbox" / "a.json").write_text(json.dumps([good]), encoding="utf-8")
+        (tmp_path / "inbox" / "b.json").write_text(json.dumps([dict(good, id=2, date="not a date")]), encoding="utf-8")
+        for _ in range(2):
+            daemon.poll()
+        daemon.drain()
+        # a is written but its segment is still open, so it stays in the inbox
+        assert [p.name for p in (tmp_path / "inbox").glob("*.json")] == ["a.json"]
+        assert [p.name for p in (tmp_path / "failed").iterdir()] == ["b.json"]
+
+        # A write failure drops the open segment; a is ingested again into a new one
+        (tmp_path / "inbox" / "c.json").write_text(json.dumps([dict(good, id=3, amount="7")]), encoding="utf-8")
+        for _ in range(2):
+            daemon.poll()
+        daemon.drain()
+        assert sorted(p.name for p in (tmp_path / "failed").iterdir()) == ["b.json", "c.json"]
+        assert not list((tmp_path / "stream").iterdir())
+        for _ in range(2):
+            daemon.poll()
+        daemon.drain()
+    finally:
+        daemon.close()
+
+    assert [p.name for p in (tmp_path / "done").iterdir()] == ["a.json"]
+    [transactions] = (tmp_path / "stream").glob("transactions-*.csv")
+    assert transactions.read_text().splitlines()[1:] == ["1,Ann,2024-01-10,5.0,Completed"]
+    assert not list((tmp_path / "stream").glob("*.part"))
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parse_json_to_csv_staged_matches_sequential(tmp_path, workers):
+    config = ConfigLoader(Path(config_path))
+    with open(data_path, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    records = records * 50
+    parse_json_to_csv(records, tmp_path / "t.csv", tmp_path / "d.csv", config, workers=workers)
+    parse_json_to_csv(records, tmp_path / "t_staged.csv", tmp_path / "d_staged.csv", config, workers=workers, pipeline_mode="staged")
+    assert (tmp_path / "t_staged.csv").read_text() == (tmp_path / "t.csv").read_text()
+    assert (tmp_path / "d_staged.csv").read_text() == (tmp_path / "d.csv").read_text()
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_parse_json_to_csv_staged_keeps_outputs_on_failure(tmp_path):
+    config = ConfigLoader(Path(config_path))
+    (tmp_path / "t.csv").write_text("previous\n")
+    (tmp_path / "d.csv").write_text("previous\n")
+    source = io.StringIO('[{"id": 1, "customer": "Ann", "date": "2024-01-10", "amount": "5", "status": "Paid"}, {"id": ')
+    with pytest.raises(ValueError):
+        parse_json_to_csv(iter_json_records(source), tmp_path / "t.csv", tmp_path / "d.csv", config, pipeline_mode="staged")
+    assert (tmp_path / "t.csv").read_text() == "previous\n"
+    assert (tmp_path / "d.csv").read_text() == "previous\n"
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_trusted_schema_builds_rows_of_canonical_records():
+    config = ConfigLoader(Path(config_path))
+    Transaction.set_config(config)
+    ItemDetail.set_config(config)
+    trusted = TrustedSchema(sample_every=1)
+    record = {
+        "transaction_id": 7, "customer_name": " Ann   Lee ", "purchase_date": "2024-01-10", "total_amount": 5, "status": "paid",
+        "items": [{"item": "Pen ", "quantity": 2, "price": 2.505}],
+    }
+    transaction_data, details = trusted.rows(record)
+    assert transaction_data == Transaction(**record).model_dump()
+    assert details == [{"details_id": 0, "transaction_id": 7, "item": "Pen", "quantity": 2, "price": 2.5}]
+    # Aliased names and other types take the full validation path
+    assert trusted.rows({**record, "transaction_id": "7"}) is None
+    assert trusted.rows({"id": 7, **{k: v for k, v in record.items() if k != "transaction_id"}}) is None
+    assert trusted.rows({**record, "items": [{"item": "Pen", "qty": 2, "price": 1.0}]}) is None
+    assert trusted.enabled
+
+
+def test_trusted_schema_disables_itself_on_mismatch(monkeypatch):
+    from data_transformation import main
+
+    config = ConfigLoader(Path(config_path))
+    Transaction.set_config(config)
+    ItemDetail.set_config(config)
+    trusted = TrustedSchema(sample_every=2)
+    record = {"transaction_id": 7, "customer_name": "Ann", "purchase_date": "2024-01-10", "total_amount": 5.0, "status": "Pending"}
+    assert trusted.rows(record) is not None
+    monkeypatch.setattr(main, "_whitespace_runs", main.re.compile("n"))
+    assert trusted.rows(record) is None
+    assert not trusted.enabled
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parse_json_to_csv_trusted_matches_full_validation(tmp_path, workers):
+    config = ConfigLoader(Path(config_path))
+    with open(data_path, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    canonical = [
+        {"transaction_id": i, "customer_name": "Ann  Lee", "purchase_date": "2024-02-%02d" % (i % 28 + 1), "total_amount": i * 1.5,
+         "status": "paid", "items": [{"item": "Pen", "quantity": i % 3 + 1, "price": 1.255}]}
+        for i in range(1, 40)
+    ]
+    records = canonical + records
+    parse_json_to_csv(records, tmp_path / "t.csv", tmp_path / "d.csv", config, workers=workers)
+    config.config["trusted"] = {"enabled": True, "sample_every": 3}
+    parse_json_to_csv(records, tmp_path / "t_trusted.csv", tmp_path / "d_trusted.csv", config, workers=workers)
+    assert (tmp_path / "t_trusted.csv").read_text() == (tmp_path / "t.csv").read_text()
+    assert (tmp_path / "d_trusted.csv").read_text() == (tmp_path / "d.csv").read_text()
+
+
+def test_process_files_dedupes_and_numbers_details_across_inputs(tmp_path):
+    config = ConfigLoader(Path(config_path))
+    with open(data_path, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    (tmp_path / "a.json").write_text(json.dumps(records[:5]), encoding="utf-8")
+    # The second input repeats a record of the first one
+    (tmp_path / "b.jsonl").write_text("\n".join(json.dumps(r) for r in records[4:]), encoding="utf-8")
+    process_files([tmp_path / "a.json", tmp_path / "b.jsonl"], tmp_path / "t.csv", tmp_path / "d.csv", config)
+    parse_json_to_csv(records, tmp_path / "t_all.csv", tmp_path / "d_all.csv", config)
+    assert (tmp_path / "t.csv").read_text() == (tmp_path / "t_all.csv").read_text()
+    assert (tmp_path / "d.csv").read_text() == (tmp_path / "d_all.csv").read_text()
+
+
+def test_partitioned_writer_reopens_evicted_partitions(tmp_path):
+    from data_transformation.main import _PartitionedTableWriter
+
+    writer = _PartitionedTableWriter(tmp_path / "parts", ["id", "month"], lambda row: row["month"], -1, max_open=1)
+    for i, month in enumerate(["2024-01", "2024-02", "2024-01", "2024-03", "2024-02"]):
+        writer.writerow({"id": i, "month": month})
+    assert len(writer.open) == 1
+    writer.close()
+    assert (tmp_path / "parts" / "2024-01.csv").read_text().splitlines() == ["id,month", "0,2024-01", "2,2024-01"]
+    assert (tmp_path / "parts" / "2024-02.csv").read_text().splitlines() == ["id,month", "1,2024-02", "4,2024-02"]
+
+
+@pytest.mark.parametrize("max_open", [0, -1, 1.5])
+def test_partitioned_sink_rejects_invalid_max_open_files(tmp_path, max_open):
+    from data_transformation.main import PartitionedCSVSink, _PartitionedTableWriter
+
+    with pytest.raises(ValueError, match="max_open_files"):
+        PartitionedCSVSink({"directory": str(tmp_path / "parts"), "max_open_files": max_open}, ["id"], ["id"])
+    with pytest.raises(ValueError, match="max_open_files"):
+        _PartitionedTableWriter(tmp_path / "parts", ["id"], lambda row: "p", -1, max_open)
+    assert not (tmp_path / "parts").exists()
+
+
+@pytest.mark.parametrize("pipeline_mode", ["sequential", "staged"])
+def test_partitioned_sink_splits_outputs_by_month(tmp_path, pipeline_mode):
+    config = ConfigLoader(Path(config_path))
+    config.config["output"] = {"partitioned": {"directory": str(tmp_path / "parts"), "by": "month", "max_open_files": 2}}
+    with open(data_path, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    (tmp_path / "parts" / "transactions").mkdir(parents=True)
+    (tmp_path / "parts" / "transactions" / "1999-01.csv").write_text("stale\n")
+
+    parse_json_to_csv(records, tmp_path / "t.csv", tmp_path / "d.csv", config, sink=["csv", "partitioned"], pipeline_mode=pipeline_mode)
+
+    def read(path):
+        with path.open(newline="", encoding="utf-8") as f:
+            return list(csv.DictReader(f))
+
+    transactions = read(tmp_path / "t.csv")
+    details = read(tmp_path / "d.csv")
+    partitions = sorted(p.stem for p in (tmp_path / "parts" / "transactions").glob("*.csv"))
+    assert partitions == sorted({row["purchase_date"][:7] for row in transactions})
+    assert sorted(p.stem for p in (tmp_path / "parts" / "details").glob("*.csv")) == sorted(
+        {t["purchase_date"][:7] for t in transactions for d in details if d["transaction_id"] == t["transaction_id"]}
+    )
+    partitioned_transactions = []
+    partitioned_details = []
+    for partition in partitions:
+        month_transactions = read(tmp_path / "parts" / "transactions" / f"{partition}.csv")
+        assert all(row["purchase_date"].startswith(partition) for row in month_transactions)
+        partitioned_transactions += month_transactions
+        month_details = []
+        if (tmp_path / "parts" / "details" / f"{partition}.csv").exists():
+            month_details = read(tmp_path / "parts" / "details" / f"{partition}.csv")
+        assert {row["transaction_id"] for row in month_details} <= {row["transaction_id"] for row in month_transactions}
+        partitioned_details += month_details
+    key = lambda row: tuple(row.values())
+    assert sorted(partitioned_transactions, key=key) == sorted(transactions, key=key)
+    assert sorted(partitioned_details, key=key) == sorted(details, key=key)
+    assert (tmp_path / "parts").is_symlink()
+    first_build = (tmp_path / "parts").resolve()
+
+    # A second run swaps the link to its own build and drops the first one
+    parse_json_to_csv(records, tmp_path / "t.csv", tmp_path / "d.csv", config, sink="partitioned", pipeline_mode=pipeline_mode)
+    assert (tmp_path / "parts").resolve() != first_build
+    assert [p.name for p in tmp_path.iterdir() if p.name.startswith("parts.")] == [(tmp_path / "parts").resolve().name]
+    assert sorted(p.stem for p in (tmp_path / "parts" / "transactions").glob("*.csv")) == partitions